@@ -0,0 +1,145 @@
+# compile_model.py
+"""
+Build step: compila as árvores do modelo XGBoost em um bundle NumPy (.npz)
+
+Converte as árvores do artefato joblib em arrays planos (TreeEnsemble),
+verifica a paridade com o modelo original sobre toda a df_base (linhas como
+chegam à predição e com campos imputados) e só então grava o bundle. Em
+runtime, `INFERENCE_BACKEND=numpy` carrega o bundle sem importar xgboost.
+
+Uso:
+    python -m app.compile_model [--model models/x.pkl] [--out models/x.trees.npz] [--tolerance 1e-6]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from app.config import logger, DEFAULT_MODEL
+
+
+def verify_parity(model_service, ensemble, tolerance: float) -> float:
+    """
+    Compara as probabilidades do TreeEnsemble com as do modelo original na df_base
+    
+    Args:
+        model_service: ModelService carregado com o modelo joblib e a base
+        ensemble: TreeEnsemble compilado
+        tolerance: Diferença absoluta máxima aceita por probabilidade
+    
+    Returns:
+        Maior diferença absoluta encontrada
+    
+    Raises:
+        ValueError: Se a diferença exceder a tolerância ou alguma classe predita divergir
+    """
+    from app.services.prediction_service import PredictionService
+    
+    df = model_service.df_base
+    if df is None:
+        raise ValueError("df_base not available for parity check")
+    
+    artifact = model_service.artifact
+    prediction_service = PredictionService(model_service)
+    columns = {
+        f: df[f].to_numpy(dtype=float)
+        for f in {f for _, f in artifact.input_cols} | {"IDA", "IEG"}
+        if f in df.columns
+    }
+    X, _ = prediction_service.prepare_features_columns(columns, len(df), artifact)
+    
+    # Linhas como chegam ao modelo (NaN nativo) e com os campos imputados
+    variants = [X]
+    if artifact.impute_values is not None:
+        variants.append(prediction_service.impute_matrix(X, artifact))
+    
+    model = model_service.model_pipeline
+    max_diff = 0.0
+    for Xv in variants:
+        expected = np.asarray(model.predict_proba(Xv), dtype=np.float64)
+        actual = np.asarray(ensemble.predict_proba(Xv), dtype=np.float64)
+        max_diff = max(max_diff, float(np.abs(expected - actual).max()))
+        if not np.array_equal(expected.argmax(axis=1), actual.argmax(axis=1)):
+            raise ValueError("Predicted classes differ from the original model")
+    
+    if max_diff > tolerance:
+        raise ValueError(f"Max probability difference {max_diff:.3g} exceeds tolerance {tolerance:g}")
+    return max_diff
+
+
+def compile_model(model_path: str, out_path: str = None, tolerance: float = 1e-6) -> str:
+    """
+    Compila o modelo, verifica a paridade na df_base e grava o bundle
+    
+    Args:
+        model_path: Caminho do modelo joblib
+        out_path: Caminho do bundle (padrão: <modelo>.trees.npz)
+        tolerance: Diferença absoluta máxima aceita por probabilidade
+    
+    Returns:
+        Caminho do bundle gravado
+    """
+    from app.services.model_service import ModelService
+    from app.utils.tree_ensemble import TreeEnsemble, compile_xgb_model, file_sha256, tree_bundle_path
+    
+    model_service = ModelService(backend="sklearn")
+    model_service.load_data()
+    model_service.load_model(model_path)
+    model_service.compute_feature_statistics()
+    
+    model = model_service.model_pipeline
+    if model is None or not hasattr(model, "get_booster"):
+        raise ValueError("Model is not an XGBoost estimator")
+    if model_service.scaler is not None:
+        raise ValueError("Artifacts with a scaler are not supported by the NumPy evaluator")
+    
+    imputer = model_service.imputer
+    stats = getattr(imputer, "statistics_", None) if imputer is not None else None
+    if imputer is not None and (stats is None or getattr(imputer, "add_indicator", False)):
+        raise ValueError("Only SimpleImputer-like imputers (statistics_) are supported")
+    names = getattr(imputer, "feature_names_in_", None) if imputer is not None else None
+    
+    arrays = compile_xgb_model(model)
+    meta = {
+        "version": model_service.model_version,
+        "features": list(model_service.features_list or []),
+        "mapa_classes": {name: int(idx) for idx, name in (model_service.mapa_classes_inv or {}).items()},
+        "imputer_statistics": None if stats is None else [float(v) for v in stats],
+        "imputer_feature_names": None if names is None else [str(n) for n in names],
+        "feature_importances": [float(v) for v in getattr(model, "feature_importances_", [])] or None,
+        "source_file": os.path.basename(model_path),
+        "source_sha256": file_sha256(model_path)
+    }
+    ensemble = TreeEnsemble(arrays, meta)
+    
+    max_diff = verify_parity(model_service, ensemble, tolerance)
+    logger.info(
+        f"Parity OK on df_base ({len(model_service.df_base)} rows): max |diff| = {max_diff:.3g}"
+    )
+    
+    out_path = str(out_path or tree_bundle_path(model_path))
+    ensemble.save(out_path, arrays)
+    logger.info(
+        f"Wrote {out_path}: {len(arrays['roots'])} trees, {len(arrays['feature'])} nodes, "
+        f"max_depth={int(arrays['max_depth'])}"
+    )
+    return out_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compila as árvores do modelo em um bundle NumPy")
+    parser.add_argument("--model", default=os.environ.get("MODEL_JOBLIB_PATH", str(DEFAULT_MODEL)))
+    parser.add_argument("--out", default=None, help="caminho do bundle (padrão: <modelo>.trees.npz)")
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    args = parser.parse_args(argv)
+    
+    try:
+        compile_model(args.model, args.out, args.tolerance)
+    except ValueError as e:
+        logger.error("Compilation failed: %s", e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 """
 Configurações centralizadas da aplicação
 """
+import os
 import pathlib
 import logging
 
@@ -21,6 +22,105 @@ INDEX_HTML = STATIC_DIR / "index.html"
 # ---------- CORS ----------
 ALLOWED_ORIGINS = ["*"]  # ajuste em produção
 
+# ---------- Features ----------
+# Usada quando o artefato do modelo não informa a lista de features
+DEFAULT_FEATURES = [
+    "IAN", "IDA", "IEG", "IAA", "IPS", "IPP", "IPV",
+    "FASE", "Status_DEFA", "consistencia_acad"
+]
+
 # ---------- DEFA Thresholds ----------
 DEFA_LARGE_THRESHOLD = 2
 DEFA_MEDIUM_VALUE = 1
+
+# ---------- Batch Prediction ----------
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "10000"))
+
+# ---------- Prediction Cache ----------
+# Cache LRU de respostas do /predict (0 = desabilitado)
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "0"))
+# Tempo de vida das entradas em segundos (0 = sem expiração)
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "0"))
+
+# ---------- Startup ----------
+# Carga dos serviços (modelo, base, índices) no startup do app: "background"
+# (thread; /health responde enquanto carrega) ou "startup" (bloqueante)
+MODEL_LOAD_MODE = os.environ.get("MODEL_LOAD_MODE", "background").strip().lower()
+
+# ---------- Data Cache ----------
+# Cache colunar memory-mapped da base CSV (reconstruído quando o CSV muda)
+DATA_CACHE = os.environ.get("DATA_CACHE", "1").strip().lower() in ("1", "true", "yes", "on")
+# Diretório dos caches (vazio = data/.cache ao lado do CSV)
+DATA_CACHE_DIR = os.environ.get("DATA_CACHE_DIR", "")
+
+# ---------- Risk Table ----------
+# Quando calcular a tabela de risco da base: "lazy" (primeiro acesso),
+# "startup" (bloqueante no startup) ou "background" (thread no startup)
+RISK_TABLE_MODE = os.environ.get("RISK_TABLE_MODE", "lazy").strip().lower()
+
+# ---------- Student Search ----------
+# Similaridade mínima (Jaccard de trigramas) para a busca aproximada de nomes
+FUZZY_MIN_SIMILARITY = float(os.environ.get("FUZZY_MIN_SIMILARITY", "0.3"))
+
+# ---------- Executors ----------
+# Threads dedicadas à inferência (PredictionService) e às consultas de
+# estudantes (StudentService), separadas do threadpool padrão do Starlette
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1))))
+STUDENT_WORKERS = int(os.environ.get("STUDENT_WORKERS", "2"))
+
+# ---------- Micro-batching ----------
+# Agrupa chamadas concorrentes do /predict em uma única inferência (opt-in)
+PREDICT_MICROBATCH = os.environ.get("PREDICT_MICROBATCH", "0").strip().lower() in ("1", "true", "yes", "on")
+# Janela máxima de espera (ms) após a primeira requisição do lote
+PREDICT_MICROBATCH_WINDOW_MS = float(os.environ.get("PREDICT_MICROBATCH_WINDOW_MS", "2"))
+# Tamanho máximo do lote
+PREDICT_MICROBATCH_MAX_SIZE = int(os.environ.get("PREDICT_MICROBATCH_MAX_SIZE", "64"))
+
+# ---------- XGBoost Threads ----------
+# Threads por inferência de requisição (/predict, micro-batches) em cada worker;
+# com vários workers na mesma máquina, valores > 1 causam oversubscription
+XGB_NTHREAD = int(os.environ.get("XGB_NTHREAD", "1"))
+# Threads no escore em lote/bulk (/predict/batch, tabela de risco); 0 = padrão do XGBoost (todos os cores)
+XGB_BATCH_NTHREAD = int(os.environ.get("XGB_BATCH_NTHREAD", "0"))
+
+# ---------- Inference Backend ----------
+# "auto" (Booster.inplace_predict quando o modelo é XGBoost), "booster", "sklearn" (predict_proba)
+# ou "numpy" (árvores compiladas por `python -m app.compile_model`, sem xgboost em runtime)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "auto").strip().lower()
+
+# ---------- Model Format ----------
+# "auto" (bundle nativo do XGBoost de `python -m app.convert_model`, quando presente e
+# correspondente ao joblib) ou "joblib" (sempre desserializa o pickle)
+MODEL_FORMAT = os.environ.get("MODEL_FORMAT", "auto").strip().lower()
+# Confere o SHA-256 do arquivo do modelo nativo com o registrado no sidecar
+MODEL_VERIFY_HASH = os.environ.get("MODEL_VERIFY_HASH", "1").strip().lower() in ("1", "true", "yes", "on")
+
+# ---------- Drivers (top_drivers) ----------
+# "shap" (TreeSHAP exato da classe predita, app.utils.tree_shap) ou "heuristic" (|z| × importância)
+DRIVERS_METHOD = os.environ.get("DRIVERS_METHOD", "shap").strip().lower()
+# Drivers por predição quando a requisição não informa top_k (e o máximo aceito)
+DRIVERS_TOP_K = int(os.environ.get("DRIVERS_TOP_K", "2"))
+DRIVERS_MAX_TOP_K = int(os.environ.get("DRIVERS_MAX_TOP_K", "10"))
+
+# ---------- Model Hot Reload ----------
+# Token exigido (header X-Admin-Token) pelos endpoints /admin; vazio = endpoints desabilitados
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+# Intervalo (s) de verificação do arquivo do modelo para recarga automática (0 = desligado)
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", "0"))
+# Linhas da base preditas na validação de um modelo novo antes da troca
+MODEL_VALIDATION_ROWS = int(os.environ.get("MODEL_VALIDATION_ROWS", "256"))
+
+# ---------- Model Versions / Shadow Scoring ----------
+# Versões adicionais carregadas no startup: "nome=arquivo.pkl,..." (caminho relativo a models/)
+MODEL_VERSIONS = os.environ.get("MODEL_VERSIONS", "")
+# Versão candidata avaliada em sombra no /predict (vazio = desligado)
+SHADOW_MODEL_VERSION = os.environ.get("SHADOW_MODEL_VERSION", "")
+# Fração das predições também escoradas na versão em sombra
+SHADOW_SAMPLE_RATE = float(os.environ.get("SHADOW_SAMPLE_RATE", "0.1"))
+# Threads do executor de sombra e limite de escores pendentes (excedente é descartado)
+SHADOW_WORKERS = int(os.environ.get("SHADOW_WORKERS", "1"))
+SHADOW_MAX_PENDING = int(os.environ.get("SHADOW_MAX_PENDING", "256"))
+
+# ---------- Production Server (app.server) ----------
+# Workers do servidor pre-fork
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", str(os.cpu_count() or 1)))
@@ -0,0 +1,125 @@
+# convert_model.py
+"""
+Build step: converte o modelo joblib no bundle nativo do XGBoost (UBJSON/JSON)
+
+Grava o booster com `save_model` e um sidecar (<modelo>.bundle.json) com
+features, mapa de classes, versão, valores do imputer, medianas/desvios das
+features na df_base (com a impressão digital do CSV de origem) e os SHA-256 do modelo nativo e do joblib de origem,
+além das tabelas pré-calculadas do TreeSHAP (<modelo>.shap.npz). Relê o
+bundle gravado e verifica a paridade com o modelo original sobre toda a
+df_base; se falhar, o bundle é removido. Em runtime,
+`MODEL_FORMAT=auto` (padrão) carrega o bundle sem desserializar o pickle.
+
+Uso:
+    python -m app.convert_model [--model models/x.pkl] [--out models/x.bundle.json] [--format ubj|json]
+"""
+import argparse
+import os
+import pathlib
+import sys
+
+import numpy as np
+
+from app.config import logger, DEFAULT_MODEL
+
+
+def convert_model(model_path: str, out_path: str = None, fmt: str = "ubj", tolerance: float = 1e-6) -> str:
+    """
+    Converte o modelo, grava o bundle nativo e verifica a paridade na df_base
+    
+    Args:
+        model_path: Caminho do modelo joblib
+        out_path: Caminho do sidecar (padrão: <modelo>.bundle.json)
+        fmt: Formato do booster ("ubj" ou "json")
+        tolerance: Diferença absoluta máxima aceita por probabilidade
+    
+    Returns:
+        Caminho do sidecar gravado
+    
+    Raises:
+        ValueError: Se o artefato não é suportado ou a paridade falha
+    """
+    from app.compile_model import verify_parity
+    from app.services.model_service import ModelService
+    from app.utils.native_bundle import (
+        native_model_path,
+        native_shap_path,
+        native_sidecar_path,
+        read_native_bundle,
+        read_native_explainer,
+        write_native_bundle
+    )
+    from app.utils.tree_ensemble import file_sha256
+    
+    model_service = ModelService(backend="sklearn", model_format="joblib")
+    model_service.load_data()
+    model_service.load_model(model_path)
+    model_service.compute_feature_statistics()
+    
+    model = model_service.model_pipeline
+    if model is None or not hasattr(model, "get_booster"):
+        raise ValueError("Model is not an XGBoost estimator")
+    if model_service.scaler is not None:
+        raise ValueError("Artifacts with a scaler are not supported by the native bundle")
+    
+    imputer = model_service.imputer
+    stats = getattr(imputer, "statistics_", None) if imputer is not None else None
+    if imputer is not None and (stats is None or getattr(imputer, "add_indicator", False)):
+        raise ValueError("Only SimpleImputer-like imputers (statistics_) are supported")
+    names = getattr(imputer, "feature_names_in_", None) if imputer is not None else None
+    
+    medians, stds = model_service.feature_medians, model_service.feature_stds
+    meta = {
+        "version": model_service.model_version,
+        "features": list(model_service.features_list or []),
+        "mapa_classes": {name: int(idx) for idx, name in (model_service.mapa_classes_inv or {}).items()},
+        "imputer_statistics": None if stats is None else [float(v) for v in stats],
+        "imputer_feature_names": None if names is None else [str(n) for n in names],
+        "feature_medians": None if medians is None else {k: float(v) for k, v in medians.items()},
+        "feature_stds": None if stds is None else {k: float(v) for k, v in stds.items()},
+        "data_source": model_service.data_source,
+        "source_file": os.path.basename(model_path),
+        "source_sha256": file_sha256(model_path)
+    }
+    
+    out_path = pathlib.Path(out_path or native_sidecar_path(model_path))
+    write_native_bundle(model, meta, out_path, fmt, model_service.explainer)
+    
+    # Paridade do bundle relido (o que o runtime vai carregar)
+    try:
+        native, sidecar = read_native_bundle(out_path)
+        read_native_explainer(out_path, sidecar)
+        max_diff = verify_parity(model_service, native, tolerance)
+        if not np.array_equal(native.feature_importances_, model.feature_importances_):
+            raise ValueError("Feature importances differ from the original model")
+    except ValueError:
+        for path in (out_path, native_model_path(out_path, fmt), native_shap_path(out_path)):
+            path.unlink(missing_ok=True)
+        raise
+    
+    logger.info(
+        f"Parity OK on df_base ({len(model_service.df_base)} rows): max |diff| = {max_diff:.3g}"
+    )
+    logger.info(
+        f"Wrote {out_path} + {sidecar['model_file']} ({fmt}, sha256={sidecar['model_sha256'][:12]})"
+    )
+    return str(out_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Converte o modelo no bundle nativo do XGBoost")
+    parser.add_argument("--model", default=os.environ.get("MODEL_JOBLIB_PATH", str(DEFAULT_MODEL)))
+    parser.add_argument("--out", default=None, help="caminho do sidecar (padrão: <modelo>.bundle.json)")
+    parser.add_argument("--format", choices=["ubj", "json"], default="ubj")
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    args = parser.parse_args(argv)
+    
+    try:
+        convert_model(args.model, args.out, args.format, args.tolerance)
+    except ValueError as e:
+        logger.error("Conversion failed: %s", e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 # main.py
 """
 Aplicação FastAPI para predição de desempenho de estudantes
+
+Importa só FastAPI e as rotas: os serviços (pandas, NumPy, joblib, XGBoost)
+são importados e carregados no startup, por padrão em uma thread, para que o
+processo aceite conexões e responda ao /health antes do modelo estar pronto.
 """
 from fastapi import FastAPI
 from fastapi.responses import FileResponse, HTMLResponse
@@ -11,16 +15,18 @@ from app.config import (
     logger, 
     STATIC_DIR, 
     INDEX_HTML, 
-    ALLOWED_ORIGINS
+    ALLOWED_ORIGINS,
+    RISK_TABLE_MODE,
+    MODEL_WATCH_INTERVAL,
+    MODEL_LOAD_MODE
 )
-from app.services.model_service import ModelService
-from app.services.student_service import StudentService
-from app.services.prediction_service import PredictionService
-from app.routes import health, students, predictions
+from app.routes import health, students, predictions, interventions, admin
+from app.services.startup_service import ReadinessMiddleware, ServiceLoader
+from app.utils.json_response import FastJSONResponse
 
 
 # ---------- App ----------
-app = FastAPI(title="Student Performance API")
+app = FastAPI(title="Student Performance API", default_response_class=FastJSONResponse)
 
 # Configurar CORS
 app.add_middleware(
@@ -31,6 +37,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Rotas que dependem dos serviços respondem 503 até a carga terminar
+service_loader = ServiceLoader()
+app.state.service_loader = service_loader
+app.add_middleware(ReadinessMiddleware, loader=service_loader)
+
 # Montar arquivos estáticos
 if STATIC_DIR.exists():
     app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
@@ -40,27 +51,83 @@ else:
 
 
 # ---------- Startup ----------
-@app.on_event("startup")
-def startup_event():
+def initialize_services():
     """
-    Inicializa serviços ao iniciar a aplicação
+    Importa, cria e publica os serviços em app.state
+    
+    Os serviços são publicados juntos ao final, já carregados.
     """
-    # Inicializar serviço de modelo
-    model_service = ModelService()
-    model_service.initialize()
-    app.state.model_service = model_service
+    from app.services.model_service import ModelService
+    from app.services.student_service import StudentService
+    from app.services.prediction_service import PredictionService
+    from app.services.risk_service import RiskService
+    from app.services.reload_service import ModelReloader
     
-    # Inicializar serviço de estudantes
-    student_service = StudentService(model_service)
-    app.state.student_service = student_service
+    # Inicializar serviço de modelo (reaproveita o carregado pelo master do
+    # servidor pre-fork, compartilhado copy-on-write entre os workers)
+    model_service = getattr(app.state, "preloaded_model_service", None)
+    if model_service is None:
+        model_service = ModelService()
+        model_service.initialize()
+    elif not model_service.versions:
+        # Versões extras validadas no worker, após o fork (OpenMP não é fork-safe)
+        model_service.load_versions()
     
-    # Inicializar serviço de predição
+    # Inicializar serviços de estudantes e de predição
+    student_service = StudentService(model_service)
     prediction_service = PredictionService(model_service)
-    app.state.prediction_service = prediction_service
     
+    # Inicializar tabela de risco materializada
+    risk_service = RiskService(model_service, prediction_service, student_service)
+    if RISK_TABLE_MODE == "startup":
+        risk_service.get_table()
+    elif RISK_TABLE_MODE == "background":
+        risk_service.start_background()
+    
+    # Recarga do modelo sem reinício (endpoint /admin e watcher do arquivo)
+    model_reloader = ModelReloader(model_service, risk_service)
+    if MODEL_WATCH_INTERVAL > 0:
+        model_reloader.start_watcher()
+    
+    app.state.model_service = model_service
+    app.state.student_service = student_service
+    app.state.prediction_service = prediction_service
+    app.state.risk_service = risk_service
+    app.state.model_reloader = model_reloader
     logger.info("All services initialized successfully")
 
 
+@app.on_event("startup")
+def startup_event():
+    """
+    Inicia a carga dos serviços (em thread com MODEL_LOAD_MODE=background)
+    
+    Com o ModelService pré-carregado pelo master do servidor pre-fork a carga
+    restante é curta e roda direto no startup.
+    """
+    preloaded = getattr(app.state, "preloaded_model_service", None) is not None
+    background = MODEL_LOAD_MODE == "background" and not preloaded
+    service_loader.start(initialize_services, background=background)
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """
+    Encerra os executores dedicados dos serviços e o watcher do modelo
+    """
+    service_loader.join()
+    model_reloader = getattr(app.state, "model_reloader", None)
+    if model_reloader is not None:
+        model_reloader.stop()
+    for name in ("prediction_service", "student_service"):
+        service = getattr(app.state, name, None)
+        if service is not None:
+            service.executor.shutdown()
+    prediction_service = getattr(app.state, "prediction_service", None)
+    if prediction_service is not None:
+        prediction_service.shadow.shutdown()
+
+
 # ---------- Routes ----------
 @app.get("/", response_class=HTMLResponse)
 def serve_index():
@@ -81,3 +148,5 @@ def serve_index():
 app.include_router(health.router, tags=["Health"])
 app.include_router(students.router, tags=["Students"])
 app.include_router(predictions.router, tags=["Predictions"])
+app.include_router(interventions.router, tags=["Interventions"])
+app.include_router(admin.router, tags=["Admin"])
@@ -2,6 +2,8 @@
 """
 Modelos Pydantic para validação de dados
 """
+from typing import List
+
 from pydantic import BaseModel
 
 
@@ -17,3 +19,8 @@ class StudentMetrics(BaseModel):
     FASE: int = None
     DEFA: float = 0.0
     NOME: str = None
+
+
+class StudentLookupRequest(BaseModel):
+    """Lista de nomes para consulta de históricos em lote"""
+    names: List[str]
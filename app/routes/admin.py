@@ -0,0 +1,209 @@
+# routes/admin.py
+"""
+Endpoints administrativos (recarga do modelo, versões e avaliação em sombra)
+"""
+import asyncio
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+
+from app.config import logger, ADMIN_TOKEN, DEFAULT_MODEL
+from app.utils.json_response import FastJSONResponse
+
+router = APIRouter()
+
+
+def check_admin_token(token: Optional[str]):
+    """
+    Valida o header X-Admin-Token
+    
+    Raises:
+        HTTPException: 404 se ADMIN_TOKEN não está configurado, 401 se o token não confere
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints disabled")
+    if token is None or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def check_single_process(request: Request):
+    """
+    Recusa alterações de estado do modelo no servidor pre-fork com mais de um worker
+    
+    Cada worker tem sua cópia do ModelService: uma recarga, versão, promoção ou
+    sombra aplicada pelo endpoint mudaria só o worker que atendeu a requisição.
+    
+    Raises:
+        HTTPException: 409 se o app roda em mais de um worker
+    """
+    workers = getattr(request.app.state, "server_workers", 1)
+    if workers > 1:
+        raise HTTPException(
+            status_code=409,
+            detail=(
+                f"Model changes through /admin are disabled with {workers} workers; "
+                "use MODEL_WATCH_INTERVAL (every worker watches the model file) or restart the server"
+            )
+        )
+
+
+def resolve_admin_model_path(path: Optional[str]) -> Optional[str]:
+    """
+    Resolve o arquivo pedido dentro do diretório de modelos
+    
+    Raises:
+        HTTPException: 400 se o caminho sai do diretório de modelos
+    """
+    if path is None:
+        return None
+    models_dir = DEFAULT_MODEL.parent.resolve()
+    resolved = (models_dir / path).resolve()
+    if resolved.parent != models_dir:
+        raise HTTPException(status_code=400, detail="Model path must be a file in the models directory")
+    return str(resolved)
+
+
+@router.post("/admin/model/reload")
+async def reload_model(
+    request: Request,
+    path: Optional[str] = Query(None, description="Arquivo em models/ (padrão: modelo configurado)"),
+    wait: bool = True,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Carrega, valida e aquece um novo modelo e troca o snapshot publicado
+    
+    Requisições em andamento terminam com o modelo anterior; se o novo modelo
+    falhar na validação, o anterior continua servindo.
+    
+    Args:
+        request: Request object do FastAPI
+        path: Nome do arquivo do modelo dentro de models/
+        wait: Aguarda o fim da recarga (False = responde 202 e recarrega em background)
+        x_admin_token: Token administrativo (ADMIN_TOKEN)
+    
+    Returns:
+        Versões anterior e nova (ou o estado da recarga quando wait=False)
+    
+    Raises:
+        HTTPException: Token inválido, vários workers, arquivo inexistente ou modelo inválido
+    """
+    check_admin_token(x_admin_token)
+    check_single_process(request)
+    model_path = resolve_admin_model_path(path)
+    reloader = request.app.state.model_reloader
+    
+    if not wait:
+        reloader.start(model_path)
+        return FastJSONResponse(status_code=202, content=reloader.stats())
+    
+    # Carga e validação fora do event loop
+    try:
+        result = await asyncio.to_thread(reloader.reload, model_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Model rejected: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {e}")
+    return FastJSONResponse(content=result)
+
+
+@router.get("/admin/model")
+async def model_status(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """
+    Estado da recarga do modelo (versão publicada, contadores, último erro)
+    """
+    check_admin_token(x_admin_token)
+    return FastJSONResponse(content=request.app.state.model_reloader.stats())
+
+
+@router.get("/admin/models")
+async def list_models(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """
+    Versões do modelo, latência de inferência por versão e avaliação em sombra
+    """
+    check_admin_token(x_admin_token)
+    model_service = request.app.state.model_service
+    prediction_service = request.app.state.prediction_service
+    return FastJSONResponse(content={
+        "published": model_service.model_version,
+        "versions": {
+            name: model_service.get_version(name).source
+            for name in model_service.version_names()
+        },
+        "inference_latency": prediction_service.latency_stats(),
+        "shadow": prediction_service.shadow.stats()
+    })
+
+
+@router.post("/admin/models/{name}")
+async def load_model_version(
+    name: str,
+    request: Request,
+    path: str = Query(..., description="Arquivo em models/"),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Carrega, valida e registra uma versão adicional (selecionável por
+    requisição e avaliável em sombra), sem alterar a versão publicada
+    
+    Raises:
+        HTTPException: Token inválido, vários workers, arquivo inexistente, modelo
+            inválido, nome em uso ou falha inesperada na carga (500)
+    """
+    check_admin_token(x_admin_token)
+    check_single_process(request)
+    model_path = resolve_admin_model_path(path)
+    model_service = request.app.state.model_service
+    try:
+        artifact = await asyncio.to_thread(model_service.load_version, name, model_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Model rejected: {e}")
+    except Exception as e:
+        logger.error(f"Model version load failed ('{name}', {model_path}): {e}")
+        raise HTTPException(status_code=500, detail=f"Model version load failed: {e}")
+    return FastJSONResponse(content={"model_version": artifact.version, "source": artifact.source})
+
+
+@router.post("/admin/models/{name}/promote")
+async def promote_model_version(name: str, request: Request, x_admin_token: Optional[str] = Header(None)):
+    """
+    Publica uma versão registrada (a anterior continua registrada para rollback)
+    
+    Raises:
+        HTTPException: 404 se a versão não está registrada, 409 com vários workers
+    """
+    check_admin_token(x_admin_token)
+    check_single_process(request)
+    reloader = request.app.state.model_reloader
+    try:
+        result = await asyncio.to_thread(reloader.promote, name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {name}")
+    return FastJSONResponse(content=result)
+
+
+@router.put("/admin/shadow")
+async def configure_shadow(
+    request: Request,
+    version: Optional[str] = Query(None, description="Versão em sombra (vazio = desligar)"),
+    sample_rate: Optional[float] = Query(None, ge=0.0, le=1.0),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Define a versão avaliada em sombra e a fração amostrada (zera os contadores)
+    
+    Raises:
+        HTTPException: 404 se a versão não está registrada, 409 com vários workers
+    """
+    check_admin_token(x_admin_token)
+    check_single_process(request)
+    prediction_service = request.app.state.prediction_service
+    if version and version not in prediction_service.model_service.versions:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    prediction_service.shadow.configure(version, sample_rate)
+    return FastJSONResponse(content=prediction_service.shadow.stats())
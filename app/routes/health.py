@@ -4,22 +4,75 @@ Endpoints de verificação de saúde da API
 """
 from fastapi import APIRouter, Request
 
+from app.utils.json_response import FastJSONResponse
+
 router = APIRouter()
 
 
 @router.get("/health")
-def health_check(request: Request):
+async def health_check(request: Request):
     """
     Verifica o status da API e disponibilidade de recursos
     
+    Roda direto no event loop (só lê estado), sem disputar threads com a inferência.
+    Responde (liveness) também enquanto os serviços carregam: status "starting",
+    ou "failed" com 503 se a carga falhou.
+    
     Returns:
-        Status da API, modelo e dados
+        Status da API, modelo, dados e contadores do cache, do micro-batching de predição,
+        da recarga do modelo, latência por versão e avaliação em sombra
     """
+    startup = request.app.state.service_loader.stats()
+    if startup["status"] != "ready":
+        return FastJSONResponse(
+            status_code=503 if startup["status"] == "failed" else 200,
+            content={
+                "status": startup["status"],
+                "model_loaded": False,
+                "data_loaded": False,
+                "startup": startup
+            }
+        )
+    
     model_service = request.app.state.model_service
+    prediction_service = request.app.state.prediction_service
+    risk_service = request.app.state.risk_service
     
-    return {
+    return FastJSONResponse(content={
         "status": "ok",
         "model_loaded": model_service.model_pipeline is not None,
         "data_loaded": model_service.df_base is not None,
-        "model_version": model_service.model_version
-    }
+        "model_version": model_service.model_version,
+        "model_versions": model_service.version_names(),
+        "inference_backend": model_service.backend_name,
+        "xgboost_threads": {
+            "request": model_service.nthread,
+            "batch": model_service.batch_nthread
+        },
+        "prediction_cache": prediction_service.cache_stats(),
+        "micro_batching": prediction_service.micro_batching_stats(),
+        "inference_latency": prediction_service.latency_stats(),
+        "shadow": prediction_service.shadow.stats(),
+        "executors": {
+            "inference": prediction_service.executor.stats(),
+            "students": request.app.state.student_service.executor.stats()
+        },
+        "risk_table": risk_service.stats(),
+        "model_reload": request.app.state.model_reloader.stats(),
+        "startup": startup
+    })
+
+
+@router.get("/health/ready")
+async def readiness_check(request: Request):
+    """
+    Readiness: 200 quando os serviços estão carregados, 503 enquanto carregam
+    
+    Returns:
+        Estado da carga dos serviços
+    """
+    startup = request.app.state.service_loader.stats()
+    return FastJSONResponse(
+        status_code=200 if startup["status"] == "ready" else 503,
+        content={"ready": startup["status"] == "ready", "startup": startup}
+    )
@@ -0,0 +1,40 @@
+# routes/interventions.py
+"""
+Endpoints de priorização de intervenções preventivas
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request
+
+from app.utils.json_response import FastJSONResponse
+
+router = APIRouter()
+
+
+@router.get("/interventions/top")
+async def top_interventions(
+    request: Request,
+    n: int = Query(50, ge=1, le=10000),
+    fase: Optional[int] = None,
+    ano: Optional[int] = None
+):
+    """
+    Ranking dos estudantes com maior probabilidade de 'quartzo'
+    
+    Substitui a lista gerada manualmente em notebook
+    (data/lista_intervencao_preventiva_2025.csv).
+    
+    Args:
+        request: Request object do FastAPI
+        n: Quantidade de estudantes no ranking
+        fase: Filtro opcional de FASE
+        ano: Filtro opcional de ANO
+        
+    Returns:
+        Lista ranqueada com NOME, Pedra_Conceito, Prob_Quartzo, IDA, IEG e consistencia_acad
+    """
+    risk_service = request.app.state.risk_service
+    # Pode materializar a tabela de risco (inferência): roda no executor de predição
+    executor = request.app.state.prediction_service.executor
+    result = await executor.run(risk_service.top_at_risk, n=n, fase=fase, ano=ano)
+    return FastJSONResponse(content=result)
@@ -2,26 +2,92 @@
 """
 Endpoints de predição de desempenho
 """
-from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
+from typing import List, Optional
 
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+
+from app.config import MAX_BATCH_SIZE, DRIVERS_MAX_TOP_K
 from app.models import StudentMetrics
+from app.utils.json_response import FastJSONResponse
 
 router = APIRouter()
 
 
 @router.post("/predict")
-def predict_score(metrics: StudentMetrics, request: Request):
+async def predict_score(
+    metrics: StudentMetrics,
+    request: Request,
+    top_k: Optional[int] = Query(None, ge=0, le=DRIVERS_MAX_TOP_K),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    explain: bool = Query(True, description="false omite drivers, sugestões e input_features"),
+    model_version: Optional[str] = Query(None, description="Versão registrada do modelo (padrão: publicada)"),
+    x_model_version: Optional[str] = Header(None)
+):
     """
     Prediz desempenho do estudante e gera recomendações
     
+    A inferência roda no executor dedicado; com PREDICT_MICROBATCH habilitado,
+    requisições concorrentes são agrupadas em uma única chamada ao modelo.
+    Com SHADOW_MODEL_VERSION, uma amostra também é escorada na versão
+    candidata em background, sem afetar a resposta.
+    
     Args:
         metrics: Métricas do estudante
         request: Request object do FastAPI
-        
+        top_k: Quantidade de top_drivers (padrão DRIVERS_TOP_K)
+        fields: Campos da resposta (padrão: todos); etapas não pedidas não rodam
+        explain: False omite drivers, sugestões e input_features
+        model_version: Versão do modelo (query; tem precedência sobre o header)
+        x_model_version: Versão do modelo (header X-Model-Version)
+    
     Returns:
         Predição, probabilidades, risco e ações sugeridas
+    
+    Raises:
+        HTTPException: 404 se a versão pedida não está registrada
+    """
+    prediction_service = request.app.state.prediction_service
+    selected = prediction_service.resolve_fields(fields, explain)
+    artifact = prediction_service.resolve_artifact(model_version or x_model_version)
+    response = await prediction_service.predict_score_async(metrics, top_k, selected, artifact)
+    return FastJSONResponse(content=response)
+
+
+@router.post("/predict/batch")
+async def predict_batch(
+    metrics: List[StudentMetrics],
+    request: Request,
+    top_k: Optional[int] = Query(None, ge=0, le=DRIVERS_MAX_TOP_K),
+    fields: Optional[str] = Query(None, description="Campos da resposta, separados por vírgula"),
+    explain: bool = Query(True, description="false omite drivers, sugestões e input_features"),
+    model_version: Optional[str] = Query(None, description="Versão registrada do modelo (padrão: publicada)"),
+    x_model_version: Optional[str] = Header(None)
+):
     """
+    Prediz desempenho de um lote de estudantes em uma única chamada
+    
+    Args:
+        metrics: Lista de métricas dos estudantes
+        request: Request object do FastAPI
+        top_k: Quantidade de top_drivers por estudante (padrão DRIVERS_TOP_K)
+        fields: Campos de cada resultado (padrão: todos)
+        explain: False omite drivers, sugestões e input_features
+        model_version: Versão do modelo (query; tem precedência sobre o header)
+        x_model_version: Versão do modelo (header X-Model-Version)
+    
+    Returns:
+        Versão do modelo e resultados por estudante, na ordem de entrada
+    """
+    if len(metrics) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {MAX_BATCH_SIZE} items)"
+        )
+    
     prediction_service = request.app.state.prediction_service
-    response = prediction_service.predict_score(metrics)
-    return JSONResponse(content=response)
+    selected = prediction_service.resolve_fields(fields, explain)
+    artifact = prediction_service.resolve_artifact(model_version or x_model_version)
+    response = await prediction_service.executor.run(
+        prediction_service.predict_batch, metrics, top_k, selected, artifact
+    )
+    return FastJSONResponse(content=response)
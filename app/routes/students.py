@@ -1,14 +1,42 @@
 # routes/students.py
 """
 Endpoints relacionados a estudantes
+
+As rotas são async; as consultas rodam no executor dedicado do StudentService.
 """
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from app.config import MAX_BATCH_SIZE
+from app.models import StudentLookupRequest
+from app.utils.json_response import FastJSONResponse
 
 router = APIRouter()
 
 
+@router.get("/students/search")
+async def fuzzy_search_students(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    k: int = Query(10, ge=1, le=50)
+):
+    """
+    Busca aproximada de estudantes por nome (tolerante a erros e acentos)
+    
+    Args:
+        request: Request object do FastAPI
+        q: Texto digitado
+        k: Quantidade máxima de candidatos
+        
+    Returns:
+        Candidatos ranqueados por similaridade
+    """
+    student_service = request.app.state.student_service
+    result = await student_service.executor.run(student_service.fuzzy_search, q, k)
+    return FastJSONResponse(content=result)
+
+
 @router.get("/students/{name}")
-def search_student(name: str, request: Request):
+async def search_student(name: str, request: Request):
     """
     Busca estudante por nome e retorna histórico
     
@@ -20,4 +48,47 @@ def search_student(name: str, request: Request):
         Dados do estudante e histórico
     """
     student_service = request.app.state.student_service
-    return student_service.search_student_by_name(name)
+    result = await student_service.executor.run(student_service.search_student_by_name, name)
+    return FastJSONResponse(content=result)
+
+
+@router.get("/students/{name}/risk")
+async def get_student_risk(name: str, request: Request):
+    """
+    Retorna o risco pré-calculado do estudante a partir da tabela materializada
+    
+    Args:
+        name: Nome do estudante (busca exata ou parcial)
+        request: Request object do FastAPI
+        
+    Returns:
+        Predição, probabilidades, risk_score e tier de cada registro do estudante
+    """
+    risk_service = request.app.state.risk_service
+    # Pode materializar a tabela de risco (inferência): roda no executor de predição
+    executor = request.app.state.prediction_service.executor
+    result = await executor.run(risk_service.get_student_risk, name)
+    return FastJSONResponse(content=result)
+
+
+@router.post("/students/lookup")
+async def lookup_students(body: StudentLookupRequest, request: Request):
+    """
+    Consulta históricos de vários estudantes em uma única requisição
+    
+    Args:
+        body: Lista de nomes (match exato, insensível a maiúsculas e acentos)
+        request: Request object do FastAPI
+        
+    Returns:
+        Um resultado por nome, na ordem de entrada, com os não encontrados reportados por item
+    """
+    if len(body.names) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {MAX_BATCH_SIZE} items)"
+        )
+    
+    student_service = request.app.state.student_service
+    result = await student_service.executor.run(student_service.lookup_students, body.names)
+    return FastJSONResponse(content=result)
@@ -0,0 +1,199 @@
+# server.py
+"""
+Servidor de produção pre-fork
+
+O master carrega o ModelService (modelo, base, índices e estatísticas) uma
+única vez e faz fork dos workers uvicorn, que herdam os artefatos
+copy-on-write em vez de recarregá-los cada um no startup. O master também
+controla a quantidade de workers, as threads do XGBoost e reinicia workers
+que morrerem (com espera crescente quando morrem logo após o fork).
+
+O master não executa inferência: o XGBoost/OpenMP não é fork-safe, então a
+validação das versões extras (MODEL_VERSIONS) roda em cada worker após o
+fork. Com mais de um worker, os endpoints /admin que alteram o modelo ficam
+desabilitados (cada worker tem sua cópia do estado); use o watcher do
+arquivo do modelo (MODEL_WATCH_INTERVAL) ou reinicie o servidor.
+
+Uso:
+    python -m app.server [--host 0.0.0.0] [--port 8080] [--workers 4] [--xgb-threads 1]
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+from app.config import logger, SERVER_WORKERS, XGB_NTHREAD, XGB_BATCH_NTHREAD
+
+# Worker que morre antes deste tempo (s) conta como falha de startup
+RESPAWN_MIN_UPTIME = 10.0
+# Espera inicial e máxima (s) antes de recriar um worker após falhas seguidas
+RESPAWN_BASE_DELAY = 0.5
+RESPAWN_MAX_DELAY = 30.0
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    """
+    Cria o socket de escuta no master (compartilhado pelos workers)
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload(xgb_threads: int, xgb_batch_threads: int):
+    """
+    Carrega o ModelService no master e o registra no app para os workers
+    
+    Args:
+        xgb_threads: Threads do XGBoost por inferência de requisição (<= 0 = padrão do XGBoost)
+        xgb_batch_threads: Threads do XGBoost no escore em lote/bulk
+    
+    Returns:
+        App FastAPI com o ModelService pré-carregado
+    """
+    from app.main import app
+    from app.services.model_service import ModelService
+    
+    started = time.perf_counter()
+    model_service = ModelService(nthread=xgb_threads, batch_nthread=xgb_batch_threads)
+    # Versões extras são validadas com inferência: só nos workers, após o fork
+    model_service.initialize(with_versions=False)
+    app.state.preloaded_model_service = model_service
+    logger.info(f"Master preloaded model and data in {time.perf_counter() - started:.2f}s")
+    
+    # Objetos carregados vão para a geração permanente: o GC dos workers não
+    # toca neles, evitando cópias das páginas compartilhadas
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def _run_worker(app, sock: socket.socket, host: str, port: int):
+    """
+    Processo worker: serve o app uvicorn no socket herdado do master
+    """
+    import uvicorn
+    
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    
+    config = uvicorn.Config(app, host=host, port=port, log_level="info")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def _spawn(app, sock, host, port) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(app, sock, host, port)
+        except Exception:
+            logger.exception("Worker %s crashed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    logger.info(f"Started worker pid={pid}")
+    return pid
+
+
+def respawn_delay(failures: int) -> float:
+    """
+    Espera antes de recriar um worker após `failures` mortes seguidas logo após o fork
+    """
+    if failures <= 0:
+        return 0.0
+    return min(RESPAWN_MAX_DELAY, RESPAWN_BASE_DELAY * 2 ** (failures - 1))
+
+
+def serve(host: str, port: int, workers: int, xgb_threads: int, xgb_batch_threads: int):
+    """
+    Carrega os artefatos no master, faz fork dos workers e os supervisiona
+    
+    Args:
+        host: Endereço de escuta
+        port: Porta de escuta
+        workers: Quantidade de workers
+        xgb_threads: Threads do XGBoost por inferência de requisição
+        xgb_batch_threads: Threads do XGBoost no escore em lote/bulk
+    """
+    app = preload(xgb_threads, xgb_batch_threads)
+    app.state.server_workers = max(1, workers)
+    sock = _bind_socket(host, port)
+    logger.info(f"Master pid={os.getpid()} listening on {host}:{port} with {workers} workers")
+    
+    # pid -> instante do fork
+    children = {}
+    failures = 0
+    stopping = False
+    
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    
+    for _ in range(max(1, workers)):
+        children[_spawn(app, sock, host, port)] = time.monotonic()
+    
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if stopping:
+            continue
+        
+        # Falhas seguidas no startup (ex.: crash ao subir) não viram um loop de fork
+        uptime = time.monotonic() - started if started is not None else RESPAWN_MIN_UPTIME
+        failures = failures + 1 if uptime < RESPAWN_MIN_UPTIME else 0
+        delay = respawn_delay(failures)
+        logger.warning(
+            f"Worker pid={pid} exited (status={status}) after {uptime:.1f}s; "
+            f"restarting in {delay:.1f}s"
+        )
+        deadline = time.monotonic() + delay
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(min(0.1, delay))
+        if not stopping:
+            children[_spawn(app, sock, host, port)] = time.monotonic()
+    
+    sock.close()
+    logger.info("Master stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de produção pre-fork")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="quantidade de workers")
+    parser.add_argument("--xgb-threads", type=int, default=XGB_NTHREAD,
+                        help="threads do XGBoost por inferência de requisição (0 = padrão do XGBoost)")
+    parser.add_argument("--xgb-batch-threads", type=int, default=XGB_BATCH_NTHREAD,
+                        help="threads do XGBoost no escore em lote/bulk (0 = padrão do XGBoost)")
+    args = parser.parse_args(argv)
+    
+    if not hasattr(os, "fork"):
+        sys.exit("app.server requires os.fork (use uvicorn on this platform)")
+    
+    serve(args.host, args.port, args.workers, args.xgb_threads, args.xgb_batch_threads)
+
+
+if __name__ == "__main__":
+    main()
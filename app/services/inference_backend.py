@@ -0,0 +1,154 @@
+# services/inference_backend.py
+"""
+Backends de inferência plugáveis para o modelo carregado
+
+- "booster": extrai o Booster de um modelo XGBoost e usa `inplace_predict`
+  sobre um array float32 contíguo (sem validação de DataFrame, sem DMatrix e
+  com uma única passada)
+- "numpy": avaliador de árvores compilado (app.utils.tree_ensemble), sem
+  xgboost em runtime
+- "sklearn": chama `predict_proba` do objeto desserializado (caminho original,
+  usado como fallback)
+"""
+from typing import Optional
+
+import numpy as np
+
+from app.config import logger
+
+
+class SklearnBackend:
+    """Inferência via `predict_proba` do modelo (qualquer estimador sklearn-like)"""
+    
+    name = "sklearn"
+    
+    def __init__(self, model):
+        self.model = model
+    
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Probabilidades por classe
+        
+        Args:
+            X: Matriz (n, n_features)
+        
+        Returns:
+            Matriz (n, n_classes)
+        """
+        return self.model.predict_proba(X)
+
+
+class NumpyTreeBackend(SklearnBackend):
+    """Inferência pelo TreeEnsemble compilado (somente NumPy)"""
+    
+    name = "numpy"
+
+
+class BoosterBackend:
+    """
+    Inferência direta no Booster do XGBoost com `inplace_predict`
+    
+    Reproduz `XGBClassifier.predict_proba` para os objetivos `multi:softprob` e
+    `binary:logistic` (mesmo intervalo de árvores e tratamento de missing); o
+    XGBoost converte a entrada para float32 internamente, então passar float32
+    contíguo não altera o resultado. Se a inferência falhar, usa o fallback.
+    """
+    
+    name = "booster"
+    
+    # Objetivos cuja saída de inplace_predict já é a probabilidade
+    SUPPORTED_OBJECTIVES = ("multi:softprob", "binary:logistic")
+    
+    def __init__(self, model, booster, iteration_range, missing, binary: bool):
+        self.model = model
+        self.booster = booster
+        self.iteration_range = iteration_range
+        self.missing = missing
+        self.binary = binary
+        self.fallback = SklearnBackend(model)
+    
+    @classmethod
+    def from_model(cls, model) -> Optional["BoosterBackend"]:
+        """
+        Constrói o backend se o modelo for um classificador XGBoost suportado
+        
+        Args:
+            model: Objeto desserializado do artefato
+        
+        Returns:
+            BoosterBackend ou None se o modelo não for compatível
+        """
+        if not (hasattr(model, "get_booster") and hasattr(model, "predict_proba")):
+            return None
+        
+        objective = getattr(model, "objective", None)
+        if objective not in cls.SUPPORTED_OBJECTIVES:
+            return None
+        
+        try:
+            booster = model.get_booster()
+            # Como o predict_proba: até a melhor iteração do early stopping, senão todas as árvores
+            best_iteration = getattr(model, "best_iteration", None)
+            iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+            missing = getattr(model, "missing", np.nan)
+            missing = np.nan if missing is None else missing
+        except Exception as e:
+            logger.warning("Booster backend unavailable: %s", e)
+            return None
+        
+        return cls(model, booster, iteration_range, missing, objective == "binary:logistic")
+    
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Probabilidades por classe
+        
+        Args:
+            X: Matriz (n, n_features)
+        
+        Returns:
+            Matriz (n, n_classes)
+        """
+        try:
+            X32 = np.ascontiguousarray(X, dtype=np.float32)
+            probs = self.booster.inplace_predict(
+                X32,
+                iteration_range=self.iteration_range,
+                missing=self.missing,
+                validate_features=False
+            )
+        except Exception as e:
+            logger.warning("Booster inplace_predict failed, using predict_proba: %s", e)
+            return self.fallback.predict_proba(X)
+        
+        if self.binary:
+            probs = probs.reshape(-1)
+            return np.column_stack([1.0 - probs, probs])
+        return probs
+
+
+def build_backend(model, preference: str = "auto"):
+    """
+    Escolhe o backend de inferência para o modelo
+    
+    Args:
+        model: Objeto desserializado do artefato (ou None)
+        preference: "auto" (booster se possível), "booster" ou "sklearn"; um
+            TreeEnsemble carregado (INFERENCE_BACKEND=numpy) sempre usa "numpy"
+    
+    Returns:
+        Backend com `name` e `predict_proba(X)`, ou None se não houver modelo
+    """
+    if model is None:
+        return None
+    
+    if getattr(model, "backend_name", None) == NumpyTreeBackend.name:
+        return NumpyTreeBackend(model)
+    
+    if preference in ("auto", "booster"):
+        backend = BoosterBackend.from_model(model)
+        if backend is not None:
+            return backend
+        if preference == "booster":
+            logger.warning("INFERENCE_BACKEND=booster but model is not a supported XGBoost classifier; using sklearn")
+    
+    return SklearnBackend(model)
@@ -0,0 +1,222 @@
+# services/micro_batcher.py
+"""
+Micro-batching de inferências: agrupa chamadas concorrentes do /predict em
+um único job no executor (preparo, inferência e montagem das respostas)
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from app.config import logger
+
+
+class _Pending:
+    """Requisição aguardando o job do lote na fila do micro-batcher"""
+    __slots__ = ("item", "artifact", "future", "enqueued_at")
+    
+    def __init__(self, item, artifact, future):
+        self.item = item
+        self.artifact = artifact
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Agrupa requisições enviadas concorrentemente e executa um único job por
+    lote no executor
+    
+    O primeiro item abre uma janela de até `window_ms`; o lote é despachado ao
+    fim da janela ou assim que atingir `max_size` itens. O job roda em um
+    executor e devolve o resultado de cada item: no event loop só os futures
+    são resolvidos. Até `max_in_flight` lotes rodam ao mesmo tempo; com todos
+    ocupados a fila continua acumulando e o próximo lote sai maior.
+    """
+    
+    def __init__(
+        self,
+        process_fn: Callable[[List[Any], Any], List[Any]],
+        window_ms: float = 2.0,
+        max_size: int = 64,
+        executor=None,
+        max_in_flight: int = 1
+    ):
+        """
+        Args:
+            process_fn: Função (itens, artifact) -> resultados, um por item na
+                mesma ordem (uma exceção na lista falha só aquele item)
+            window_ms: Tempo máximo de espera por novos itens após o primeiro
+            max_size: Tamanho máximo do lote
+            executor: Executor dos jobs (None = executor padrão do loop)
+            max_in_flight: Lotes em execução simultânea (tipicamente as threads do executor)
+        """
+        self.process_fn = process_fn
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_size = max(1, int(max_size))
+        self.executor = executor
+        self.max_in_flight = max(1, int(max_in_flight))
+        
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[_Pending] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._worker: Optional[asyncio.Task] = None
+        
+        # Métricas
+        self.requests = 0
+        self.batches = 0
+        self.dispatched = 0
+        self.failed_batches = 0
+        self.max_batch_size = 0
+        self.max_queue_depth = 0
+        self.in_flight = 0
+        self.max_in_flight_seen = 0
+        self.total_wait = 0.0
+        self.batch_size_histogram: Dict[int, int] = {}
+    
+    def _ensure_worker(self):
+        """
+        Inicia o worker no loop corrente (reinicia se o loop mudou, ex.: testes)
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._pending = []
+            self._wakeup = asyncio.Event()
+            self._full = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            self._tasks = set()
+            self._worker = loop.create_task(self._run())
+    
+    async def submit(self, item: Any, artifact) -> Any:
+        """
+        Enfileira um item e aguarda seu resultado
+        
+        Args:
+            item: Requisição repassada a `process_fn`
+            artifact: Artefato do item (lotes são processados por artefato)
+        
+        Returns:
+            Resultado do item devolvido por `process_fn`
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._pending.append(_Pending(item, artifact, future))
+        self.requests += 1
+        
+        depth = len(self._pending)
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        
+        self._wakeup.set()
+        if depth >= self.max_size:
+            self._full.set()
+        
+        return await future
+    
+    async def _run(self):
+        """
+        Loop do worker: espera o primeiro item, segura a janela e despacha lotes
+        
+        O lote só é cortado depois de obtida uma vaga de execução: enquanto os
+        jobs anteriores rodam, as requisições novas entram no mesmo lote.
+        """
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            
+            if len(self._pending) < self.max_size and self.window > 0:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.window)
+                except asyncio.TimeoutError:
+                    pass
+            
+            await self._slots.acquire()
+            batch = self._pending[:self.max_size]
+            del self._pending[:self.max_size]
+            
+            self.in_flight += 1
+            self.max_in_flight_seen = max(self.max_in_flight_seen, self.in_flight)
+            task = self._loop.create_task(self._dispatch_guarded(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _dispatch_guarded(self, batch: List[_Pending]):
+        try:
+            await self._dispatch(batch)
+        except Exception as e:
+            logger.exception("Micro-batch dispatch failed: %s", e)
+            for p in batch:
+                if not p.future.done():
+                    p.future.set_exception(e)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+    
+    async def _dispatch(self, batch: List[_Pending]):
+        """
+        Executa o job do lote (agrupado por artefato) e resolve os futures
+        """
+        now = time.perf_counter()
+        n = len(batch)
+        self.batches += 1
+        self.dispatched += n
+        self.max_batch_size = max(self.max_batch_size, n)
+        self.batch_size_histogram[n] = self.batch_size_histogram.get(n, 0) + 1
+        self.total_wait += sum(now - p.enqueued_at for p in batch)
+        
+        # Um recarregamento do modelo pode deixar linhas de artefatos diferentes na fila
+        groups: Dict[int, List[_Pending]] = {}
+        for p in batch:
+            groups.setdefault(id(p.artifact), []).append(p)
+        
+        loop = asyncio.get_running_loop()
+        for items in groups.values():
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.process_fn, [p.item for p in items], items[0].artifact
+                )
+            except Exception as e:
+                self.failed_batches += 1
+                for p in items:
+                    if not p.future.done():
+                        p.future.set_exception(e)
+                continue
+            
+            for p, result in zip(items, results):
+                if p.future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    p.future.set_exception(result)
+                else:
+                    p.future.set_result(result)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contadores de uso do micro-batcher
+        """
+        return {
+            "enabled": True,
+            "window_ms": self.window * 1000.0,
+            "max_size": self.max_size,
+            "requests": self.requests,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "avg_batch_size": round(self.dispatched / self.batches, 3) if self.batches else None,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": len(self._pending),
+            "max_queue_depth": self.max_queue_depth,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "max_in_flight_seen": self.max_in_flight_seen,
+            "avg_queue_wait_ms": (
+                round(self.total_wait / self.dispatched * 1000.0, 3) if self.dispatched else None
+            ),
+            "batch_size_histogram": {
+                str(k): v for k, v in sorted(self.batch_size_histogram.items())
+            }
+        }
@@ -2,30 +2,340 @@
 """
 Serviço para gerenciamento do modelo de Machine Learning
 """
+import copy
 import os
+import threading
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
 import joblib
+import numpy as np
 import pandas as pd
-from app.config import logger, DEFAULT_CSV, DEFAULT_MODEL
+from app.config import (
+    logger,
+    DEFAULT_CSV,
+    DEFAULT_MODEL,
+    DATA_CACHE,
+    DEFAULT_FEATURES,
+    XGB_NTHREAD,
+    XGB_BATCH_NTHREAD,
+    INFERENCE_BACKEND,
+    DRIVERS_METHOD,
+    MODEL_VALIDATION_ROWS,
+    MODEL_VERSIONS,
+    MODEL_FORMAT,
+    MODEL_VERIFY_HASH
+)
+from app.models import StudentMetrics
+from app.services.inference_backend import build_backend
+from app.utils.columnar_cache import csv_fingerprint, read_csv_cached
+from app.utils.name_index import NameIndex
+from app.utils.native_bundle import native_sidecar_path, read_native_bundle, read_native_explainer
+from app.utils.student_history import StudentHistories
+from app.utils.tree_ensemble import (
+    StaticImputer,
+    TreeEnsemble,
+    compile_xgb_model,
+    file_sha256,
+    tree_bundle_path
+)
+from app.utils.tree_shap import TreeShapExplainer
+
+
+def _readonly(arr: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """Marca um array como somente leitura (artefato imutável)"""
+    if arr is not None:
+        arr.setflags(write=False)
+    return arr
+
+
+def risk_weights_for(n_classes: int, quartzo_idx: Optional[int]) -> np.ndarray:
+    """
+    Vetor de pesos do score de risco: one-hot na classe 'quartzo' se mapeada,
+    senão média ponderada decrescente (classe 0 = maior risco)
+    
+    Args:
+        n_classes: Número de classes do modelo
+        quartzo_idx: Índice da classe 'quartzo' (ou None)
+    
+    Returns:
+        Array de pesos tal que risk_score = probs @ pesos
+    """
+    if quartzo_idx is not None and quartzo_idx < n_classes:
+        weights = np.zeros(n_classes)
+        weights[quartzo_idx] = 1.0
+        return weights
+    if n_classes > 1:
+        weights = 1.0 - np.arange(n_classes) / float(n_classes - 1)
+        return weights / weights.sum()
+    return np.ones(n_classes)
+
+
+def invert_class_map(mapa) -> Optional[dict]:
+    """
+    Inverte o mapa de classes do artefato para {índice: nome}
+    
+    Aceita tanto {nome: índice} quanto {índice: nome}.
+    """
+    inv = {}
+    if mapa:
+        for k, v in mapa.items():
+            try:
+                inv[int(v)] = str(k)
+            except Exception:
+                try:
+                    inv[int(k)] = str(v)
+                except Exception:
+                    continue
+    return inv or None
+
+
+@dataclass(frozen=True)
+class ModelArtifact:
+    """
+    Snapshot imutável do modelo carregado e de seus metadados pré-compilados
+    
+    Tudo que o caminho de requisição precisa fica resolvido aqui como arrays
+    alinhados à ordem de `features`, de modo que a predição faça apenas
+    indexação e álgebra de arrays. Uma requisição usa o mesmo snapshot do
+    início ao fim; recarregar o modelo publica um novo snapshot (troca
+    atômica da referência em ModelService.artifact) sem alterar o anterior.
+    """
+    version: str
+    features: Tuple[str, ...]
+    # (posição, nome) das features vindas de StudentMetrics
+    input_cols: Tuple[Tuple[int, str], ...]
+    consistencia_col: Optional[int]
+    n_classes: Optional[int]
+    # Label por índice de classe (prediction) e chave usada em probabilities
+    class_labels: Optional[np.ndarray]
+    class_names: Optional[Tuple[str, ...]]
+    quartzo_idx: Optional[int]
+    risk_weights: Optional[np.ndarray]
+    # Heurística de drivers: features sem estatística usam 0/1 (z = valor bruto)
+    importances: np.ndarray
+    medians: np.ndarray
+    stds: np.ndarray
+    # Valores de preenchimento para campos ausentes (None = exige imputer.transform)
+    impute_values: Optional[np.ndarray]
+    # Objetos carregados: modelo, pré-processamento, features e mapa de classes
+    # originais do artefato e estatísticas da base
+    model: Any = None
+    imputer: Any = None
+    scaler: Any = None
+    features_list: Optional[Tuple[str, ...]] = None
+    mapa_classes_inv: Optional[Dict[int, str]] = None
+    feature_medians: Optional[pd.Series] = None
+    feature_stds: Optional[pd.Series] = None
+    source: Optional[str] = None
+    # Objetos derivados do modelo (backends, modelo de lote, TreeSHAP), criados
+    # uma vez sob demanda; snapshots do mesmo modelo compartilham o dicionário
+    derived: Dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+
+
+def build_artifact(
+    model=None,
+    imputer=None,
+    scaler=None,
+    features_list=None,
+    mapa_classes_inv=None,
+    version: str = "none",
+    feature_medians=None,
+    feature_stds=None,
+    source: Optional[str] = None,
+    derived: Optional[Dict[str, Any]] = None
+) -> ModelArtifact:
+    """
+    Pré-compila o estado carregado em um ModelArtifact imutável
+    
+    Resolve uma única vez o índice da classe 'quartzo', o vetor de pesos de
+    risco, os labels por classe, as importâncias e medianas/desvios
+    alinhados às features, e o vetor de imputação.
+    
+    Returns:
+        Novo snapshot (não publicado)
+    """
+    features_list = tuple(features_list) if features_list else None
+    features = features_list or tuple(DEFAULT_FEATURES)
+    n_feats = len(features)
+    mapa = mapa_classes_inv or {}
+    
+    provided = StudentMetrics.model_fields
+    input_cols = tuple((j, f) for j, f in enumerate(features) if f in provided)
+    consistencia_col = (
+        features.index("consistencia_acad") if "consistencia_acad" in features else None
+    )
+    
+    # Classes
+    n_classes = None
+    classes = getattr(model, "classes_", None) if model is not None else None
+    if classes is not None:
+        n_classes = len(classes)
+    elif mapa:
+        n_classes = max(mapa) + 1
+    
+    quartzo_idx = None
+    for idx, name in mapa.items():
+        if isinstance(name, str) and name.strip().lower() == "quartzo":
+            quartzo_idx = int(idx)
+            break
+    
+    class_labels = None
+    class_names = None
+    risk_weights = None
+    if n_classes:
+        class_labels = np.array(
+            [mapa.get(i, str(i)) for i in range(n_classes)], dtype=object
+        )
+        class_names = tuple(mapa.get(i, f"Class_{i}") for i in range(n_classes))
+        risk_weights = risk_weights_for(n_classes, quartzo_idx)
+    
+    # Importâncias (1.0 para todas se o modelo não expõe feature_importances_)
+    importances = np.ones(n_feats)
+    try:
+        if hasattr(model, "feature_importances_") and features_list:
+            imp_map = dict(zip(features_list, model.feature_importances_))
+            importances = np.array([float(imp_map.get(f, 0.0)) for f in features])
+    except Exception:
+        importances = np.ones(n_feats)
+    
+    medians = np.zeros(n_feats)
+    stds = np.ones(n_feats)
+    med, std = feature_medians, feature_stds
+    if med is not None and std is not None:
+        for j, f in enumerate(features):
+            if f in med.index:
+                medians[j] = float(med.loc[f])
+                stds[j] = float(std.loc[f])
+    
+    # Imputação vetorial: SimpleImputer alinhado às features, ou medianas/zeros
+    impute_values = None
+    if imputer is not None:
+        try:
+            stats = getattr(imputer, "statistics_", None)
+            names = getattr(imputer, "feature_names_in_", None)
+            if (
+                stats is not None
+                and not getattr(imputer, "add_indicator", False)
+                and len(stats) == n_feats
+                and (names is None or tuple(names) == features)
+            ):
+                stats = np.array(stats, dtype=float)
+                if not np.isnan(stats).any():
+                    impute_values = stats
+        except Exception:
+            impute_values = None
+    elif med is not None:
+        impute_values = np.array(
+            [float(med.loc[f]) if f in med.index else np.nan for f in features]
+        )
+    else:
+        impute_values = np.zeros(n_feats)
+    
+    return ModelArtifact(
+        version=version,
+        features=features,
+        input_cols=input_cols,
+        consistencia_col=consistencia_col,
+        n_classes=n_classes,
+        class_labels=_readonly(class_labels),
+        class_names=class_names,
+        quartzo_idx=quartzo_idx,
+        risk_weights=_readonly(risk_weights),
+        importances=_readonly(importances),
+        medians=_readonly(medians),
+        stds=_readonly(stds),
+        impute_values=_readonly(impute_values),
+        model=model,
+        imputer=imputer,
+        scaler=scaler,
+        features_list=features_list,
+        mapa_classes_inv=mapa_classes_inv,
+        feature_medians=feature_medians,
+        feature_stds=feature_stds,
+        source=source,
+        derived={} if derived is None else derived
+    )
+
+
+# Campos do snapshot que vêm do carregamento (o restante é derivado deles)
+LOADED_FIELDS = (
+    "model", "imputer", "scaler", "features_list", "mapa_classes_inv",
+    "version", "feature_medians", "feature_stds", "source"
+)
+
+
+class _ArtifactField:
+    """
+    Atributo do ModelService lido do snapshot corrente; atribuir publica um
+    novo snapshot com o valor alterado
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __get__(self, service, owner=None):
+        if service is None:
+            return self
+        return getattr(service.artifact, self.name)
+    
+    def __set__(self, service, value):
+        service.publish(**{self.name: value})
 
 
 class ModelService:
     """Gerencia carregamento e estado do modelo de ML"""
     
-    def __init__(self):
+    # Estado do modelo: sempre lido do snapshot publicado em `artifact`
+    model_pipeline = _ArtifactField("model")
+    imputer = _ArtifactField("imputer")
+    scaler = _ArtifactField("scaler")
+    features_list = _ArtifactField("features_list")
+    mapa_classes_inv = _ArtifactField("mapa_classes_inv")
+    model_version = _ArtifactField("version")
+    feature_medians = _ArtifactField("feature_medians")
+    feature_stds = _ArtifactField("feature_stds")
+    
+    def __init__(
+        self,
+        nthread: int = XGB_NTHREAD,
+        batch_nthread: int = XGB_BATCH_NTHREAD,
+        backend: str = INFERENCE_BACKEND,
+        drivers_method: str = DRIVERS_METHOD,
+        model_format: str = MODEL_FORMAT
+    ):
+        """
+        Args:
+            nthread: Threads do XGBoost por inferência de requisição (0 = padrão do XGBoost)
+            batch_nthread: Threads do XGBoost no escore em lote/bulk (0 = padrão do XGBoost)
+            backend: Backend de inferência preferido ("auto", "booster", "sklearn" ou "numpy")
+            drivers_method: "shap" (TreeSHAP exato) ou "heuristic" para os top drivers
+            model_format: "auto" (bundle nativo quando presente) ou "joblib"
+        """
+        self.nthread = nthread
+        self.batch_nthread = batch_nthread
+        self.backend_preference = backend
+        self.drivers_method = drivers_method
+        self.model_format = model_format
+        self._derived_lock = threading.Lock()
+        self._publish_lock = threading.Lock()
         self.df_base = None
-        self.model_pipeline = None
-        self.imputer = None
-        self.scaler = None
-        self.features_list = None
-        self.mapa_classes_inv = None
-        self.model_version = "none"
-        self.feature_medians = None
-        self.feature_stds = None
+        # Impressão digital do CSV da df_base (confere as estatísticas do bundle nativo)
+        self.data_source = None
+        self.name_index = None
+        self.student_histories = None
+        # Snapshot corrente (sem modelo até o load_model)
+        self.artifact = build_artifact()
+        # Versões adicionais selecionáveis por requisição (nome -> snapshot)
+        self.versions: Dict[str, ModelArtifact] = {}
     
     def load_data(self, csv_path: str = None):
         """
         Carrega o CSV com dados base dos estudantes
         
+        Com DATA_CACHE (padrão) lê pelo cache colunar memory-mapped, sem parsing
+        quando o CSV não mudou.
+        
         Args:
             csv_path: Caminho para o arquivo CSV (usa DEFAULT_CSV se não fornecido)
         """
@@ -33,109 +343,685 @@ class ModelService:
         
         try:
             if os.path.exists(csv_path):
-                self.df_base = pd.read_csv(csv_path)
+                self.df_base = read_csv_cached(csv_path) if DATA_CACHE else pd.read_csv(csv_path)
+                self.data_source = csv_fingerprint(csv_path)
                 logger.info(f"Loaded CSV: {csv_path} shape={self.df_base.shape}")
             else:
-                self.df_base = None
+                self.df_base, self.data_source = None, None
                 logger.warning(f"No CSV found at {csv_path} (continuing without df_base)")
         except Exception as e:
-            self.df_base = None
+            self.df_base, self.data_source = None, None
             logger.exception("Error loading CSV: %s", e)
+        
+        self.build_name_index()
+    
+    def build_name_index(self):
+        """
+        Constrói o índice de nomes (exato e por substring) a partir da coluna NOME
+        e os históricos pré-agrupados por estudante
+        """
+        try:
+            if self.df_base is not None and "NOME" in self.df_base.columns:
+                self.name_index = NameIndex(self.df_base["NOME"].tolist())
+                self.student_histories = StudentHistories(self.df_base, self.name_index)
+                logger.info(f"Built name index: {len(self.name_index)} distinct names")
+            else:
+                self.name_index = None
+                self.student_histories = None
+        except Exception as e:
+            self.name_index = None
+            self.student_histories = None
+            logger.exception("Error building name index: %s", e)
+    
+    @staticmethod
+    def resolve_model_path(model_path: str = None) -> str:
+        """
+        Caminho do modelo: argumento, MODEL_JOBLIB_PATH ou DEFAULT_MODEL
+        """
+        return model_path or os.environ.get("MODEL_JOBLIB_PATH", str(DEFAULT_MODEL))
+    
+    @staticmethod
+    def read_model_file(model_path: str) -> Dict[str, Any]:
+        """
+        Lê o artefato joblib (modelo, imputer, scaler, features, mapa de classes, versão)
+        
+        Args:
+            model_path: Caminho do arquivo do modelo
+        
+        Returns:
+            Campos do snapshot carregados do arquivo
+        
+        Raises:
+            FileNotFoundError: Se o arquivo não existe
+            Exception: Erros de desserialização do joblib
+        """
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(model_path)
+        
+        loaded = joblib.load(model_path)
+        
+        # Ser permissivo com as chaves
+        mapa = (
+            loaded.get("mapa_classes") or 
+            loaded.get("mapa_pedras") or 
+            loaded.get("map_classes") or 
+            None
+        )
+        return {
+            "model": (
+                loaded.get("modelo") or 
+                loaded.get("model") or 
+                loaded.get("pipeline") or 
+                loaded
+            ),
+            "imputer": loaded.get("imputer", None),
+            "scaler": loaded.get("scaler", None),
+            "features_list": (
+                loaded.get("features") or 
+                loaded.get("features_list") or 
+                None
+            ),
+            # Inverter mapa de classes se possível
+            "mapa_classes_inv": invert_class_map(mapa),
+            "version": (
+                loaded.get("versao") or 
+                loaded.get("version") or 
+                "unknown"
+            ),
+            "source": str(model_path)
+        }
+    
+    @staticmethod
+    def read_tree_ensemble(model_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Lê o bundle de árvores compilado (app.compile_model) no lugar do joblib
+        
+        Não importa xgboost nem sklearn: o modelo vira um TreeEnsemble e o
+        imputer, um StaticImputer com os valores de preenchimento salvos.
+        
+        Args:
+            model_path: Caminho do modelo joblib de origem
+        
+        Returns:
+            Campos do snapshot, ou None se o bundle não existe, está
+            desatualizado ou é inválido
+        """
+        trees_path = os.environ.get("MODEL_TREES_PATH") or str(tree_bundle_path(model_path))
+        
+        if not os.path.exists(trees_path):
+            logger.warning(f"No compiled tree bundle at {trees_path} (run python -m app.compile_model)")
+            return None
+        
+        try:
+            ensemble = TreeEnsemble.load(trees_path)
+            meta = ensemble.meta
+            
+            source_hash = meta.get("source_sha256")
+            if source_hash and os.path.exists(model_path) and file_sha256(model_path) != source_hash:
+                logger.warning(f"Compiled tree bundle {trees_path} is stale for {model_path}")
+                return None
+            
+            stats = meta.get("imputer_statistics")
+            loaded = {
+                "model": ensemble,
+                "imputer": (
+                    StaticImputer(stats, meta.get("imputer_feature_names")) if stats is not None else None
+                ),
+                "scaler": None,
+                "features_list": meta.get("features") or None,
+                "mapa_classes_inv": invert_class_map(meta.get("mapa_classes")),
+                "version": meta.get("version") or "unknown",
+                "source": str(model_path)
+            }
+        except Exception as e:
+            logger.exception("Error loading compiled tree bundle: %s", e)
+            return None
+        
+        logger.info(f"Loaded compiled tree bundle: {trees_path} version={loaded['version']}")
+        return loaded
+    
+    def read_native_model(self, model_path: str, verify: bool = MODEL_VERIFY_HASH) -> Optional[Dict[str, Any]]:
+        """
+        Lê o bundle nativo do XGBoost (app.convert_model) no lugar do joblib
+        
+        Args:
+            model_path: Caminho do modelo joblib de origem
+            verify: Confere o SHA-256 dos arquivos do bundle
+        
+        Returns:
+            Campos do snapshot (com as estatísticas das features e o TreeSHAP
+            pré-calculado), ou None se o bundle não existe, está desatualizado
+            ou é inválido
+        """
+        sidecar = os.environ.get("MODEL_NATIVE_PATH") or str(native_sidecar_path(model_path))
+        if not os.path.exists(sidecar):
+            logger.info(f"No native model bundle at {sidecar} (run python -m app.convert_model)")
+            return None
+        
+        try:
+            model, meta = read_native_bundle(sidecar, verify=verify)
+            
+            source_hash = meta.get("source_sha256")
+            if source_hash and os.path.exists(model_path) and file_sha256(model_path) != source_hash:
+                logger.warning(f"Native model bundle {sidecar} is stale for {model_path}")
+                return None
+            
+            stats = meta.get("imputer_statistics")
+            medians, stds = meta.get("feature_medians"), meta.get("feature_stds")
+            # Estatísticas do bundle só valem para o mesmo CSV; senão são recalculadas da df_base
+            if medians and not self.same_data_source(meta.get("data_source")):
+                logger.info(f"Native model bundle {sidecar} stats are for another CSV; recomputing")
+                medians, stds = None, None
+            loaded = {
+                "model": model,
+                "imputer": (
+                    StaticImputer(stats, meta.get("imputer_feature_names")) if stats is not None else None
+                ),
+                "scaler": None,
+                "features_list": meta.get("features") or None,
+                "mapa_classes_inv": invert_class_map(meta.get("mapa_classes")),
+                "version": meta.get("version") or "unknown",
+                "feature_medians": pd.Series(medians, dtype=float) if medians else None,
+                "feature_stds": pd.Series(stds, dtype=float) if stds else None,
+                "source": str(model_path)
+            }
+            if self.drivers_method == "shap":
+                explainer = read_native_explainer(sidecar, meta, verify=verify)
+                if explainer is not None:
+                    loaded["derived"] = {"explainer": (model, explainer)}
+        except Exception as e:
+            logger.error(f"Error loading native model bundle {sidecar}: {e}")
+            return None
+        
+        logger.info(f"Loaded native model bundle: {sidecar} version={loaded['version']}")
+        return loaded
+    
+    def same_data_source(self, source: Optional[Dict[str, Any]]) -> bool:
+        """
+        Confere se a impressão digital (csv_fingerprint) é a do CSV carregado em df_base
+        
+        O SHA-256 decide: o mtime muda numa cópia do mesmo arquivo.
+        """
+        current = self.data_source
+        return bool(source and current) and (
+            source.get("size") == current["size"] and source.get("sha256") == current["sha256"]
+        )
+    
+    def read_fast_model(self, model_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Campos do snapshot a partir de um formato pré-compilado, quando disponível:
+        árvores NumPy (backend "numpy") ou bundle nativo do XGBoost (MODEL_FORMAT="auto")
+        
+        Returns:
+            Campos do snapshot, ou None para carregar o joblib
+        """
+        if self.backend_preference == "numpy":
+            loaded = self.read_tree_ensemble(model_path)
+            if loaded is not None:
+                return loaded
+            logger.warning("Compiled tree bundle unavailable; loading joblib model")
+        elif self.model_format == "auto":
+            return self.read_native_model(model_path)
+        return None
     
     def load_model(self, model_path: str = None):
         """
-        Carrega o modelo e artefatos relacionados
+        Carrega o modelo e artefatos relacionados e publica o novo snapshot
         
         Args:
             model_path: Caminho para o arquivo do modelo (usa DEFAULT_MODEL se não fornecido)
         """
-        model_path = model_path or os.environ.get("MODEL_JOBLIB_PATH", str(DEFAULT_MODEL))
+        model_path = self.resolve_model_path(model_path)
+        
+        # Árvores NumPy ou bundle nativo: sem desserializar o pickle do joblib
+        loaded = self.read_fast_model(model_path)
+        if loaded is not None:
+            self.apply_nthread(loaded["model"], self.nthread)
+            self.publish(**loaded)
+            return
         
         try:
-            if os.path.exists(model_path):
-                loaded = joblib.load(model_path)
-                
-                # Ser permissivo com as chaves
-                self.model_pipeline = (
-                    loaded.get("modelo") or 
-                    loaded.get("model") or 
-                    loaded.get("pipeline") or 
-                    loaded
-                )
-                self.imputer = loaded.get("imputer", None)
-                self.scaler = loaded.get("scaler", None)
-                self.features_list = (
-                    loaded.get("features") or 
-                    loaded.get("features_list") or 
-                    None
-                )
-                
-                mapa = (
-                    loaded.get("mapa_classes") or 
-                    loaded.get("mapa_pedras") or 
-                    loaded.get("map_classes") or 
-                    None
-                )
-                
-                self.model_version = (
-                    loaded.get("versao") or 
-                    loaded.get("version") or 
-                    "unknown"
-                )
-                
-                # Inverter mapa de classes se possível
-                inv = {}
-                if mapa:
-                    for k, v in mapa.items():
-                        try:
-                            inv[int(v)] = str(k)
-                        except Exception:
-                            try:
-                                inv[int(k)] = str(v)
-                            except Exception:
-                                continue
-                
-                self.mapa_classes_inv = inv or None
-                logger.info(f"Loaded model joblib: {model_path} version={self.model_version}")
-            else:
-                self.model_pipeline = None
-                self.imputer = None
-                self.scaler = None
-                self.features_list = None
-                self.mapa_classes_inv = None
-                self.model_version = "none"
-                logger.warning(f"No model joblib found at {model_path}")
+            loaded = self.read_model_file(model_path)
+            logger.info(f"Loaded model joblib: {model_path} version={loaded['version']}")
+        except FileNotFoundError:
+            loaded = {
+                "model": None,
+                "imputer": None,
+                "scaler": None,
+                "features_list": None,
+                "mapa_classes_inv": None,
+                "version": "none",
+                "source": None
+            }
+            logger.warning(f"No model joblib found at {model_path}")
         except Exception as e:
-            self.model_pipeline = None
-            self.mapa_classes_inv = None
+            loaded = {"model": None, "mapa_classes_inv": None}
             logger.exception("Error loading model joblib: %s", e)
+        
+        if self.apply_nthread(loaded["model"], self.nthread):
+            logger.info(f"XGBoost nthread set to {self.nthread}")
+        self.publish(**loaded)
+    
+    @staticmethod
+    def feature_statistics(df_base, features_list) -> Tuple[Optional[pd.Series], Optional[pd.Series]]:
+        """
+        Medianas e desvios padrão das features na base (heurística de drivers e imputação)
+        
+        Returns:
+            Tupla (medianas, desvios) ou (None, None) sem base/features
+        """
+        try:
+            if df_base is not None and features_list:
+                feats = [f for f in features_list if f in df_base.columns]
+                if feats:
+                    # Em float64: o cache colunar entrega colunas compactas (int8, float32...)
+                    values = df_base[feats].astype(np.float64)
+                    return values.median(), values.std().replace(0, 1.0)
+        except Exception as e:
+            logger.exception("Error computing medians/stds: %s", e)
+        return None, None
     
     def compute_feature_statistics(self):
         """
         Calcula medianas e desvios padrão das features para heurística de drivers
         """
+        medians, stds = self.feature_statistics(self.df_base, self.features_list)
+        if medians is not None:
+            logger.info("Computed medians/stds for top-driver heuristic.")
+        self.publish(feature_medians=medians, feature_stds=stds)
+    
+    def publish(self, **changes) -> ModelArtifact:
+        """
+        Compila e publica um novo snapshot com `changes` sobre o corrente
+        
+        A publicação é uma única troca de referência: quem já leu o snapshot
+        anterior continua com ele. Os objetos derivados são reaproveitados
+        quando o modelo não muda.
+        
+        Args:
+            changes: Campos de LOADED_FIELDS a alterar (e `derived`, objetos
+                derivados já prontos para o novo modelo)
+        
+        Returns:
+            Snapshot publicado
+        """
+        derived = changes.pop("derived", None)
+        with self._publish_lock:
+            current = self.artifact
+            values = {f: getattr(current, f) for f in LOADED_FIELDS}
+            values.update(changes)
+            if derived is None and values["model"] is current.model:
+                derived = current.derived
+            self.artifact = build_artifact(**values, derived=derived)
+        return self.artifact
+    
+    def compile_artifact(self):
+        """
+        Recompila e publica o snapshot a partir do estado corrente
+        """
+        self.publish()
+    
+    def load_candidate(self, model_path: str = None) -> ModelArtifact:
+        """
+        Carrega, valida e aquece um novo snapshot sem publicá-lo
+        
+        O snapshot corrente continua servindo as requisições durante todo o
+        processo; as estatísticas vêm da base já carregada.
+        
+        Args:
+            model_path: Caminho do novo modelo (usa MODEL_JOBLIB_PATH/DEFAULT_MODEL)
+        
+        Returns:
+            Snapshot pronto para ser publicado (ver swap)
+        
+        Raises:
+            FileNotFoundError: Se o arquivo não existe
+            ValueError: Se o modelo não passa na validação
+            Exception: Erros de desserialização
+        """
+        model_path = self.resolve_model_path(model_path)
+        
+        loaded = self.read_fast_model(model_path) or self.read_model_file(model_path)
+        self.apply_nthread(loaded["model"], self.nthread)
+        
+        if loaded.get("feature_medians") is None:
+            loaded["feature_medians"], loaded["feature_stds"] = self.feature_statistics(
+                self.df_base, loaded["features_list"]
+            )
+        candidate = build_artifact(**loaded)
+        
+        self.warm_up(candidate, self.validate_artifact(candidate))
+        return candidate
+    
+    def validate_artifact(self, artifact: ModelArtifact) -> np.ndarray:
+        """
+        Valida um snapshot antes da publicação
+        
+        Prediz uma amostra da base (campos ausentes preenchidos como no caminho
+        de requisição) e exige probabilidades finitas, uma coluna por classe e
+        somando 1.
+        
+        Args:
+            artifact: Snapshot candidato
+        
+        Returns:
+            Matriz de amostra usada na validação (reaproveitada no aquecimento)
+        
+        Raises:
+            ValueError: Se o snapshot não é utilizável
+        """
+        if artifact.model is None:
+            raise ValueError("Model artifact has no model")
+        if not artifact.input_cols:
+            raise ValueError("Model features do not match the request fields")
+        if not artifact.n_classes or artifact.n_classes < 2:
+            raise ValueError("Model does not expose its classes")
+        
+        df = self.df_base
+        n = min(len(df), MODEL_VALIDATION_ROWS) if df is not None else 1
+        X = np.full((max(n, 1), len(artifact.features)), np.nan)
+        if df is not None:
+            for j, f in enumerate(artifact.features):
+                if f in df.columns:
+                    X[:n, j] = pd.to_numeric(df[f].iloc[:n], errors="coerce").to_numpy(dtype=float)
+        if artifact.impute_values is not None:
+            X = np.where(np.isnan(X), artifact.impute_values, X)
+        if artifact.scaler is not None:
+            X = artifact.scaler.transform(X)
+        
+        probs = np.asarray(artifact.model.predict_proba(X), dtype=float)
+        if probs.shape != (X.shape[0], artifact.n_classes):
+            raise ValueError(f"Unexpected prediction shape {probs.shape}")
+        if not np.isfinite(probs).all() or not np.allclose(probs.sum(axis=1), 1.0, atol=1e-4):
+            raise ValueError("Model returned invalid probabilities")
+        return X
+    
+    def warm_up(self, artifact: ModelArtifact, X: Optional[np.ndarray] = None):
+        """
+        Cria os objetos derivados do snapshot (backends, modelo de lote,
+        TreeSHAP) e executa inferências de aquecimento, para que a primeira
+        requisição após a troca não pague esse custo
+        
+        Args:
+            artifact: Snapshot a aquecer
+            X: Amostra de entrada do modelo (opcional)
+        """
+        backend = self.backend_for(artifact)
+        batch_backend = self.backend_for(artifact, bulk=True)
+        explainer = self.explainer_for(artifact)
+        if X is None or backend is None:
+            return
+        
+        backend.predict_proba(X[:1])
+        batch_backend.predict_proba(X)
+        if explainer is not None:
+            explainer.contributions(X[:1], np.zeros(1, dtype=np.int64))
+    
+    def swap(self, artifact: ModelArtifact) -> ModelArtifact:
+        """
+        Publica atomicamente um snapshot preparado por load_candidate
+        
+        Args:
+            artifact: Novo snapshot
+        
+        Returns:
+            Snapshot anterior
+        """
+        with self._publish_lock:
+            previous = self.artifact
+            self.artifact = artifact
+        logger.info(f"Model snapshot swapped: {previous.version} -> {artifact.version}")
+        return previous
+    
+    def register_version(self, artifact: ModelArtifact, name: str = None) -> ModelArtifact:
+        """
+        Registra um snapshot como versão selecionável (sem publicá-lo)
+        
+        Args:
+            artifact: Snapshot preparado (ex.: load_candidate)
+            name: Nome da versão (padrão: versão do artefato); vira o
+                `model_version` das respostas servidas por ele
+        
+        Returns:
+            Snapshot registrado
+        
+        Raises:
+            ValueError: Se o nome coincide com a versão publicada
+        """
+        if name and name != artifact.version:
+            artifact = replace(artifact, version=name)
+        if artifact.version == self.artifact.version:
+            raise ValueError(f"Version '{artifact.version}' is the published model")
+        self.versions = {**self.versions, artifact.version: artifact}
+        logger.info(f"Registered model version: {artifact.version} ({artifact.source})")
+        return artifact
+    
+    def load_version(self, name: str, model_path: str) -> ModelArtifact:
+        """
+        Carrega, valida, aquece e registra uma versão adicional do modelo
+        
+        Args:
+            name: Nome da versão
+            model_path: Caminho do arquivo do modelo
+        
+        Returns:
+            Snapshot registrado
+        """
+        return self.register_version(self.load_candidate(model_path), name)
+    
+    def load_versions(self, spec: str = MODEL_VERSIONS):
+        """
+        Carrega as versões de MODEL_VERSIONS ("nome=arquivo.pkl,...")
+        
+        Caminhos relativos são resolvidos no diretório de modelos; falhas são
+        registradas no log sem impedir o startup.
+        """
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            name, _, path = item.partition("=")
+            if not path:
+                name, path = "", name
+            if not os.path.isabs(path):
+                path = str(DEFAULT_MODEL.parent / path)
+            try:
+                self.load_version(name.strip(), path)
+            except Exception as e:
+                logger.error(f"Error loading model version '{item}': {e}")
+    
+    def get_version(self, name: Optional[str] = None) -> ModelArtifact:
+        """
+        Snapshot de uma versão (None ou a versão publicada = snapshot publicado)
+        
+        Raises:
+            KeyError: Se a versão não está registrada
+        """
+        artifact = self.artifact
+        if name is None or name == artifact.version:
+            return artifact
+        return self.versions[name]
+    
+    def version_names(self) -> List[str]:
+        """
+        Versão publicada seguida das versões registradas
+        """
+        return [self.artifact.version, *self.versions]
+    
+    def promote(self, name: str) -> ModelArtifact:
+        """
+        Publica uma versão registrada; a anterior passa a ser uma versão registrada
+        
+        Args:
+            name: Nome da versão
+        
+        Returns:
+            Snapshot anterior
+        
+        Raises:
+            KeyError: Se a versão não está registrada
+        """
+        artifact = self.versions[name]
+        previous = self.swap(artifact)
+        versions = {k: v for k, v in self.versions.items() if k != name}
+        if previous.model is not None:
+            versions[previous.version] = previous
+        self.versions = versions
+        return previous
+    
+    @staticmethod
+    def apply_nthread(model, nthread: int) -> bool:
+        """
+        Define o número de threads do XGBoost de um modelo
+        
+        Args:
+            model: XGBClassifier (sklearn) ou Booster
+            nthread: Número de threads (<= 0 mantém o padrão do XGBoost)
+        
+        Returns:
+            True se o modelo suporta a configuração
+        """
+        if model is None or not nthread or nthread <= 0:
+            return False
+        
         try:
-            if self.df_base is not None and self.features_list:
-                feats = [f for f in self.features_list if f in self.df_base.columns]
-                if feats:
-                    self.feature_medians = self.df_base[feats].median()
-                    self.feature_stds = self.df_base[feats].std().replace(0, 1.0)
-                    logger.info("Computed medians/stds for top-driver heuristic.")
-                else:
-                    self.feature_medians = None
-                    self.feature_stds = None
+            if hasattr(model, "get_xgb_params"):
+                model.set_params(n_jobs=int(nthread))
+            elif hasattr(model, "set_param"):
+                model.set_param({"nthread": int(nthread)})
             else:
-                self.feature_medians = None
-                self.feature_stds = None
+                return False
+            return True
         except Exception as e:
-            self.feature_medians = None
-            self.feature_stds = None
-            logger.exception("Error computing medians/stds: %s", e)
+            logger.warning("Could not set XGBoost nthread: %s", e)
+            return False
+    
+    def _derived(self, artifact: ModelArtifact, key: str, source, build):
+        """
+        Objeto derivado do snapshot, construído uma vez por objeto de origem
+        """
+        entry = artifact.derived.get(key)
+        if entry is not None and entry[0] is source:
+            return entry[1]
+        
+        with self._derived_lock:
+            entry = artifact.derived.get(key)
+            if entry is None or entry[0] is not source:
+                entry = (source, build())
+                artifact.derived[key] = entry
+        return entry[1]
+    
+    def batch_model_for(self, artifact: ModelArtifact):
+        """
+        Modelo usado no escore em lote/bulk do snapshot, com `batch_nthread` threads
+        
+        É uma cópia do modelo de requisição (alterar nthread de um booster em uso
+        por outras threads não é seguro). Sem configuração distinta, retorna o
+        próprio modelo.
+        """
+        model = artifact.model
+        if (
+            model is None
+            or not self.batch_nthread
+            or self.batch_nthread <= 0
+            or self.batch_nthread == self.nthread
+            or not (hasattr(model, "get_xgb_params") or hasattr(model, "set_param"))
+        ):
+            return model
+        
+        def build():
+            batch_model = copy.deepcopy(model)
+            if not self.apply_nthread(batch_model, self.batch_nthread):
+                batch_model = model
+            return batch_model
+        
+        return self._derived(artifact, "batch_model", model, build)
     
-    def initialize(self):
+    def backend_for(self, artifact: ModelArtifact, bulk: bool = False):
+        """
+        Backend de inferência do snapshot (de requisição ou de lote/bulk)
+        """
+        model = self.batch_model_for(artifact) if bulk else artifact.model
+        if model is None:
+            return None
+        key = "backend" if model is artifact.model else "batch_backend"
+        return self._derived(artifact, key, model, lambda: build_backend(model, self.backend_preference))
+    
+    def explainer_for(self, artifact: ModelArtifact) -> Optional[TreeShapExplainer]:
+        """
+        TreeSHAP do modelo do snapshot
+        
+        Vem dos arrays do TreeEnsemble (backend numpy) ou das árvores do
+        XGBoost. None com DRIVERS_METHOD=heuristic ou modelo não suportado
+        (os drivers voltam para a heurística).
+        """
+        model = artifact.model
+        if model is None or self.drivers_method != "shap":
+            return None
+        
+        def build():
+            try:
+                if isinstance(model, TreeEnsemble):
+                    arrays = model.arrays
+                elif hasattr(model, "get_booster"):
+                    arrays = compile_xgb_model(model)
+                else:
+                    raise ValueError(f"Unsupported model type: {type(model).__name__}")
+                return TreeShapExplainer(arrays)
+            except Exception as e:
+                logger.warning("TreeSHAP unavailable, using heuristic drivers: %s", e)
+                return None
+        
+        return self._derived(artifact, "explainer", model, build)
+    
+    @property
+    def batch_model(self):
+        """
+        Modelo de lote/bulk do snapshot corrente (ver batch_model_for)
+        """
+        return self.batch_model_for(self.artifact)
+    
+    @property
+    def backend(self):
+        """
+        Backend de inferência do caminho de requisição (snapshot corrente)
+        """
+        return self.backend_for(self.artifact)
+    
+    @property
+    def batch_backend(self):
+        """
+        Backend de inferência do escore em lote/bulk (snapshot corrente)
+        """
+        return self.backend_for(self.artifact, bulk=True)
+    
+    @property
+    def backend_name(self) -> str:
+        """
+        Nome do backend ativo (exposto em /health)
+        """
+        backend = self.backend
+        return backend.name if backend is not None else "none"
+    
+    @property
+    def explainer(self) -> Optional[TreeShapExplainer]:
+        """
+        TreeSHAP do snapshot corrente (ver explainer_for)
+        """
+        return self.explainer_for(self.artifact)
+    
+    def initialize(self, with_versions: bool = True):
         """
         Inicializa o serviço carregando dados e modelo
+        
+        Args:
+            with_versions: Carrega as versões de MODEL_VERSIONS (a validação
+                executa inferência; o master do servidor pre-fork as deixa para os workers)
         """
         self.load_data()
         self.load_model()
-        self.compute_feature_statistics()
+        # O bundle nativo traz as estatísticas calculadas na conversão (se o CSV é o mesmo)
+        if self.feature_medians is None:
+            self.compute_feature_statistics()
+        if with_versions:
+            self.load_versions()
+        # Tabelas do TreeSHAP prontas antes da primeira requisição (e do fork)
+        if self.explainer is not None:
+            logger.info("TreeSHAP explainer ready")
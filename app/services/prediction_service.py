@@ -2,29 +2,120 @@
 """
 Serviço para predições e geração de recomendações
 """
+import threading
+import time
 import numpy as np
 import pandas as pd
 from fastapi import HTTPException
-from typing import Dict, Any
+from typing import Dict, Any, FrozenSet, List, NamedTuple, Optional
 
-from app.config import logger, DEFA_LARGE_THRESHOLD
+from app.config import (
+    logger,
+    DEFA_LARGE_THRESHOLD,
+    DEFAULT_FEATURES,
+    PREDICTION_CACHE_SIZE,
+    PREDICTION_CACHE_TTL,
+    INFERENCE_WORKERS,
+    PREDICT_MICROBATCH,
+    PREDICT_MICROBATCH_WINDOW_MS,
+    PREDICT_MICROBATCH_MAX_SIZE,
+    DRIVERS_TOP_K,
+    DRIVERS_MAX_TOP_K,
+    SHADOW_MODEL_VERSION,
+    SHADOW_SAMPLE_RATE
+)
 from app.models import StudentMetrics
-from app.utils.helpers import risk_tier_from_score, estimate_top_drivers, sanitize_for_json
+from app.services.micro_batcher import MicroBatcher
+from app.services.model_service import ModelArtifact, risk_weights_for
+from app.services.shadow_scorer import ShadowScorer
+from app.utils.cache import LRUCache
+from app.utils.executor import BoundedExecutor
+from app.utils.latency import LatencyHistogram
+from app.utils.helpers import (
+    risk_tier_from_score,
+    risk_tiers_from_scores,
+    estimate_top_drivers_batch,
+    drivers_from_contributions
+)
+from app.utils.suggestion_table import SuggestionTable
+
+
+# Campos da resposta de predição (/predict e itens de /predict/batch)
+RESPONSE_FIELDS = (
+    "prediction",
+    "prediction_index",
+    "probabilities",
+    "risk_score",
+    "risk_tier",
+    "acao_sugerida",
+    "suggested_messages",
+    "top_drivers",
+    "input_features",
+    "defa_int",
+    "model_version"
+)
+# Campos de explicação: omitidos com explain=false (drivers, sugestões e eco da entrada)
+EXPLAIN_FIELDS = frozenset({"acao_sugerida", "suggested_messages", "top_drivers", "input_features"})
+
+
+class PreparedRequest(NamedTuple):
+    """Requisição de predição com features preparadas (caminho rápido)"""
+    input_data: Dict[str, Any]
+    artifact: ModelArtifact
+    defa_int: int
+    # Matriz (1, n_features) própria da requisição (None = usar caminho DataFrame)
+    row: Optional[np.ndarray]
+    needs_impute: bool
+    cache_key: Any
+    top_k: int
+    # Campos pedidos na resposta (None = resposta completa)
+    fields: Optional[FrozenSet[str]]
 
 
 class PredictionService:
     """Gerencia predições e geração de ações sugeridas"""
     
-    def __init__(self, model_service):
+    def __init__(
+        self,
+        model_service,
+        cache_size: int = PREDICTION_CACHE_SIZE,
+        cache_ttl: float = PREDICTION_CACHE_TTL,
+        micro_batch: bool = PREDICT_MICROBATCH,
+        micro_batch_window_ms: float = PREDICT_MICROBATCH_WINDOW_MS,
+        micro_batch_max_size: int = PREDICT_MICROBATCH_MAX_SIZE,
+        workers: int = INFERENCE_WORKERS,
+        shadow_version: str = SHADOW_MODEL_VERSION,
+        shadow_sample_rate: float = SHADOW_SAMPLE_RATE
+    ):
         self.model_service = model_service
+        self._local = threading.local()
+        self.cache = LRUCache(cache_size, cache_ttl) if cache_size > 0 else None
+        self._cache_artifact = model_service.artifact
+        # Regras de sugestão compiladas uma vez (avaliação por lookup, inclusive em lote)
+        self.suggestion_table = SuggestionTable(defa_threshold=DEFA_LARGE_THRESHOLD)
+        # Inferência roda neste pool, nunca no event loop nem no threadpool do Starlette
+        self.executor = BoundedExecutor(workers, "inference")
+        self.batcher = MicroBatcher(
+            self.predict_requests,
+            window_ms=micro_batch_window_ms,
+            max_size=micro_batch_max_size,
+            executor=self.executor.pool,
+            max_in_flight=workers
+        ) if micro_batch else None
+        # Latência de inferência por versão do modelo (servidas e em sombra)
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self._latency_lock = threading.Lock()
+        # Avaliação em sombra de uma versão candidata (executor próprio)
+        self.shadow = ShadowScorer(self, shadow_version, shadow_sample_rate)
     
-    def prepare_features(self, input_data: Dict[str, Any]) -> pd.DataFrame:
+    def prepare_features(self, input_data: Dict[str, Any], artifact: Optional[ModelArtifact] = None) -> pd.DataFrame:
         """
         Prepara features derivadas e constrói DataFrame para predição
         
         Args:
             input_data: Dicionário com métricas do estudante
-            
+            artifact: Snapshot do modelo (None = snapshot corrente)
+        
         Returns:
             DataFrame com features preparadas
         """
@@ -37,10 +128,8 @@ class PredictionService:
             input_data["consistencia_acad"] = 0.0
         
         # Construir vetor de features
-        features = self.model_service.features_list or [
-            "IAN", "IDA", "IEG", "IAA", "IPS", "IPP", "IPV", 
-            "FASE", "Status_DEFA", "consistencia_acad"
-        ]
+        artifact = artifact or self.model_service.artifact
+        features = artifact.features_list or DEFAULT_FEATURES
         
         df_pred = pd.DataFrame([{
             k: input_data.get(k, np.nan) for k in features
@@ -48,17 +137,19 @@ class PredictionService:
         
         return df_pred
     
-    def make_prediction(self, df_pred: pd.DataFrame):
+    def make_prediction(self, df_pred: pd.DataFrame, artifact: Optional[ModelArtifact] = None):
         """
         Executa predição usando o modelo
         
         Args:
             df_pred: DataFrame com features preparadas
-            
+            artifact: Snapshot do modelo (None = snapshot corrente)
+        
         Returns:
             Tupla (probabilidades, índice_predito)
         """
-        model = self.model_service.model_pipeline
+        artifact = artifact or self.model_service.artifact
+        model = artifact.model
         
         if model is None:
             return None, None
@@ -73,8 +164,8 @@ class PredictionService:
             try:
                 X = df_pred.copy()
                 
-                if self.model_service.imputer is not None:
-                    imp = self.model_service.imputer
+                if artifact.imputer is not None:
+                    imp = artifact.imputer
                     try:
                         if hasattr(imp, "feature_names_in_"):
                             X_imp = imp.transform(df_pred[imp.feature_names_in_])
@@ -84,15 +175,15 @@ class PredictionService:
                         X_imp = imp.transform(df_pred.values)
                     X_for_pred = X_imp
                 else:
-                    if self.model_service.feature_medians is not None:
+                    if artifact.feature_medians is not None:
                         X_for_pred = df_pred.fillna(
-                            self.model_service.feature_medians.to_dict()
+                            artifact.feature_medians.to_dict()
                         ).values
                     else:
                         X_for_pred = df_pred.fillna(0.0).values
                 
-                if self.model_service.scaler is not None:
-                    X_for_pred = self.model_service.scaler.transform(X_for_pred)
+                if artifact.scaler is not None:
+                    X_for_pred = artifact.scaler.transform(X_for_pred)
                 
                 probs = model.predict_proba(X_for_pred)[0]
                 pred_idx = int(model.predict(X_for_pred)[0])
@@ -104,41 +195,209 @@ class PredictionService:
                     detail="Prediction failed on server"
                 )
     
-    def calculate_risk_score(self, probs):
+    def prepare_row(self, input_data: Dict[str, Any], artifact: ModelArtifact):
+        """
+        Preenche o vetor de features (sem pandas) em um buffer reutilizado por thread
+        
+        Args:
+            input_data: Dicionário com métricas do estudante
+            artifact: Artefato pré-compilado do modelo (layout de colunas)
+        
+        Returns:
+            Tupla (matriz (1, n_features), True se algum campo informado é None)
+        """
+        n_feats = len(artifact.features)
+        row = getattr(self._local, "row", None)
+        if row is None or row.shape[1] != n_feats:
+            row = np.empty((1, n_feats))
+            self._local.row = row
+        
+        row.fill(np.nan)
+        values = row[0]
+        needs_impute = False
+        
+        for j, f in artifact.input_cols:
+            v = input_data.get(f)
+            if v is None:
+                needs_impute = True
+            else:
+                values[j] = v
+        
+        if artifact.consistencia_col is not None:
+            try:
+                ida = float(input_data.get("IDA") or 0.0)
+                ieg = float(input_data.get("IEG") or 0.0)
+                values[artifact.consistencia_col] = ida / (ieg + 0.1)
+            except Exception:
+                values[artifact.consistencia_col] = 0.0
+        
+        return row, needs_impute
+    
+    def impute_matrix(self, X: np.ndarray, artifact: ModelArtifact) -> np.ndarray:
+        """
+        Preenche campos ausentes e aplica o scaler (mesma semântica do fallback
+        de make_prediction)
+        
+        Args:
+            X: Matriz de features com NaN nos campos ausentes
+            artifact: Artefato pré-compilado do modelo
+        
+        Returns:
+            Matriz pronta para o modelo
+        """
+        if artifact.impute_values is not None:
+            X_for_pred = np.where(np.isnan(X), artifact.impute_values, X)
+        else:
+            imp = artifact.imputer
+            df_imp = pd.DataFrame(X, columns=list(artifact.features))
+            if hasattr(imp, "feature_names_in_"):
+                X_for_pred = imp.transform(df_imp[imp.feature_names_in_])
+            else:
+                X_for_pred = imp.transform(df_imp.values)
+        
+        if artifact.scaler is not None:
+            X_for_pred = artifact.scaler.transform(X_for_pred)
+        
+        return X_for_pred
+    
+    def make_prediction_row(self, row: np.ndarray, needs_impute: bool, artifact: ModelArtifact):
+        """
+        Executa uma única inferência sobre o vetor de features
+        
+        O label é o argmax das probabilidades (equivalente a model.predict
+        para classificadores), evitando uma segunda passada pelo modelo.
+        
+        Args:
+            row: Matriz (1, n_features) preparada por prepare_row
+            needs_impute: Se o vetor tem campos informados ausentes
+            artifact: Artefato pré-compilado do modelo
+        
+        Returns:
+            Tupla (probabilidades, índice_predito)
+        """
+        backend = self.model_service.backend_for(artifact)
+        
+        if backend is None:
+            return None, None
+        
+        X = self.impute_matrix(row, artifact) if needs_impute else row
+        probs = backend.predict_proba(X)[0]
+        return probs, int(np.argmax(probs))
+    
+    def get_cache_key(
+        self,
+        row: np.ndarray,
+        defa_int: int,
+        nome,
+        artifact: ModelArtifact,
+        top_k: int,
+        fields: Optional[FrozenSet[str]] = None
+    ):
+        """
+        Chave canônica do cache de respostas: versão do modelo, vetor de
+        features (NaN -> None), DEFA inteiro, nome, quantidade de drivers e
+        campos pedidos
+        
+        Invalida o cache automaticamente quando o artefato do modelo muda
+        (ex.: modelo ou estatísticas recarregados).
+        
+        Returns:
+            Tupla hashable ou None se o cache estiver desabilitado
+        """
+        if self.cache is None:
+            return None
+        
+        if self._cache_artifact is not artifact:
+            self.cache.clear()
+            self._cache_artifact = artifact
+        
+        features = tuple(None if v != v else v for v in row[0].tolist())
+        return (artifact.version, features, defa_int, nome, top_k, fields)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Contadores do cache de respostas (exposto em /health)
+        """
+        if self.cache is None:
+            return {"enabled": False}
+        return self.cache.stats()
+    
+    def observe_latency(self, version: str, seconds: float):
+        """
+        Registra a latência de inferência de uma versão do modelo
+        """
+        histogram = self.latency.get(version)
+        if histogram is None:
+            with self._latency_lock:
+                histogram = self.latency.setdefault(version, LatencyHistogram())
+        histogram.observe(seconds)
+    
+    def latency_stats(self) -> Dict[str, Any]:
+        """
+        Histogramas de latência de inferência por versão (exposto em /health)
+        """
+        return {version: h.stats() for version, h in list(self.latency.items())}
+    
+    def resolve_artifact(self, version: Optional[str] = None) -> ModelArtifact:
+        """
+        Snapshot da versão pedida na requisição (None = versão publicada)
+        
+        Raises:
+            HTTPException: 404 se a versão não está registrada
+        """
+        try:
+            return self.model_service.get_version(version)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    
+    def micro_batching_stats(self) -> Dict[str, Any]:
+        """
+        Contadores do micro-batcher do /predict (exposto em /health)
+        """
+        if self.batcher is None:
+            return {"enabled": False}
+        return self.batcher.stats()
+    
+    def calculate_risk_score(self, probs, artifact: Optional[ModelArtifact] = None):
         """
         Calcula score de risco a partir das probabilidades
         
         Args:
             probs: Array de probabilidades por classe
-            
+            artifact: Snapshot que produziu as probabilidades (None = snapshot corrente)
+        
         Returns:
             Score de risco (float) ou None se não houver probabilidades
         """
         if probs is None:
             return None
         
-        # Preferir probabilidade da classe 'quartzo' se mapeada
-        quartzo_idx = None
-        if self.model_service.mapa_classes_inv:
-            for idx, name in self.model_service.mapa_classes_inv.items():
-                try:
-                    if isinstance(name, str) and name.strip().lower() == "quartzo":
-                        quartzo_idx = int(idx)
-                        break
-                except Exception:
-                    continue
-        
-        if quartzo_idx is not None and quartzo_idx < len(probs):
-            return float(probs[quartzo_idx])
-        else:
-            # Fallback: média ponderada
-            n = len(probs)
-            if n > 1:
-                weights = np.array([1.0 - (i / float(n - 1)) for i in range(n)])
-                weights = weights / weights.sum()
-                return float(np.dot(probs, weights))
-            else:
-                return float(probs[0])
+        return float(self.calculate_risk_scores(np.asarray(probs)[np.newaxis, :], artifact)[0])
+    
+    def calculate_risk_scores(self, probs: np.ndarray, artifact: Optional[ModelArtifact] = None) -> np.ndarray:
+        """
+        Versão vetorizada de calculate_risk_score para uma matriz de probabilidades
+        
+        Usa o vetor de pesos pré-compilado no artefato: one-hot na classe
+        'quartzo' (probabilidade de quartzo) ou média ponderada como fallback.
+        Os pesos vêm do snapshot que produziu as probabilidades: a ordem das
+        classes pode mudar entre versões e recargas do modelo.
+        
+        Args:
+            probs: Matriz (n, n_classes) de probabilidades
+            artifact: Snapshot que produziu as probabilidades (None = snapshot corrente)
+        
+        Returns:
+            Array com o score de risco de cada linha
+        """
+        artifact = artifact or self.model_service.artifact
+        weights = artifact.risk_weights if artifact is not None else None
+        n = probs.shape[1]
+        
+        if weights is None or len(weights) != n:
+            weights = risk_weights_for(n, artifact.quartzo_idx if artifact else None)
+        
+        return probs @ weights
     
     def generate_suggestions(
         self, 
@@ -150,197 +409,411 @@ class PredictionService:
         """
         Gera ações sugeridas e mensagens baseadas em DEFA e risco
         
+        Consulta a tabela de decisão compilada (app.utils.suggestion_table);
+        o /predict/batch avalia a mesma tabela para o lote inteiro.
+        
         Args:
             defa_int: Valor inteiro de DEFA
             risk_score: Score de risco calculado
             pred_label: Label da predição
             student_name: Nome do estudante (opcional)
-            
+        
         Returns:
             Dicionário com ação sugerida e mensagens
         """
-        suggested_action = "Manutenção do Desempenho"
-        suggested_messages = {"family": "", "professor": ""}
+        return self.suggestion_table.suggest(defa_int, risk_score, pred_label, student_name)
+    
+    def prepare_request(
+        self,
+        metrics: StudentMetrics,
+        top_k: Optional[int] = None,
+        fields: Optional[FrozenSet[str]] = None,
+        artifact: Optional[ModelArtifact] = None
+    ) -> PreparedRequest:
+        """
+        Prepara a requisição: vetor de features, DEFA inteiro e chave de cache
         
-        nome = student_name or "O aluno"
+        Args:
+            metrics: Métricas do estudante
+            top_k: Quantidade de drivers (None = DRIVERS_TOP_K)
+            fields: Campos da resposta (resolve_fields; None = completa)
+            artifact: Versão selecionada (resolve_artifact; None = publicada)
         
-        # DEFA negativo = problema (defasagem)
-        if defa_int < 0:
-            if defa_int <= -DEFA_LARGE_THRESHOLD:
-                suggested_action = "Recuperação Intensiva (grave)"
-                suggested_messages["family"] = (
-                    f"Detectamos defasagem grave (DEFA={defa_int}). "
-                    "Requer reunião imediata com coordenação."
-                )
-                suggested_messages["professor"] = (
-                    "Acionar plano de intervenção intensiva, "
-                    "tutorias diárias, contato família."
-                )
-            else:
-                suggested_action = "Recuperação de Aprendizagem"
-                suggested_messages["family"] = (
-                    f"Detectamos defasagem (DEFA={defa_int}). "
-                    "Recomendamos plano de recuperação de curto prazo."
-                )
-                suggested_messages["professor"] = (
-                    "Atividades focalizadas e monitoramento."
-                )
+        Returns:
+            PreparedRequest (row = None se o caminho rápido não se aplica)
+        """
+        input_data = metrics.model_dump()
+        published = self.model_service.artifact
+        artifact = artifact or published
+        top_k = self.resolve_top_k(top_k)
         
-        # DEFA positivo = aluno adiantado
-        elif defa_int > 0:
-            if defa_int >= DEFA_LARGE_THRESHOLD:
-                suggested_action = "Aprofundamento / Enriquecimento (alto)"
-                suggested_messages["family"] = (
-                    f"{nome} está adiantado (DEFA={defa_int}). "
-                    "Sugerimos aprofundamento/possível aceleração."
-                )
-                suggested_messages["professor"] = (
-                    "Projetos de aprofundamento, mentorias, avaliar aceleração."
-                )
-            else:
-                suggested_action = "Enriquecimento Curricular (moderado)"
-                suggested_messages["family"] = (
-                    f"{nome} está ligeiramente adiantado (DEFA={defa_int}). "
-                    "Sugerimos atividades de extensão."
-                )
-                suggested_messages["professor"] = (
-                    "Desafios adicionais e monitorar engajamento."
-                )
-            
-            # Se modelo indica alto risco apesar de estar adiantado, flag review
-            if risk_score is not None and risk_score >= 0.75:
-                suggested_action += " + Revisão"
-                suggested_messages["family"] += (
-                    " (Nota: modelo indica risco; revisar caso.)"
-                )
-                suggested_messages["professor"] += " (Rever indicador de risco.)"
+        # DEFA integer semantics
+        try:
+            defa_int = int(round(float(input_data.get("DEFA", 0))))
+        except Exception:
+            defa_int = 0
+        
+        try:
+            row, needs_impute = self.prepare_row(input_data, artifact)
+            row = row.copy()
+            # Resposta é função pura das features, NOME e versão do modelo;
+            # versões não publicadas não usam o cache
+            cache_key = None
+            if artifact is published:
+                cache_key = self.get_cache_key(row, defa_int, input_data.get("NOME"), artifact, top_k, fields)
+        except Exception:
+            row, needs_impute, cache_key = None, False, None
         
-        # DEFA = 0: seguir risk_score ou monitoramento padrão
+        return PreparedRequest(input_data, artifact, defa_int, row, needs_impute, cache_key, top_k, fields)
+    
+    @staticmethod
+    def resolve_top_k(top_k: Optional[int]) -> int:
+        """
+        Quantidade de drivers da resposta (padrão DRIVERS_TOP_K, limitada a DRIVERS_MAX_TOP_K)
+        """
+        if top_k is None:
+            top_k = DRIVERS_TOP_K
+        return max(0, min(int(top_k), DRIVERS_MAX_TOP_K))
+    
+    @staticmethod
+    def resolve_fields(fields: Optional[str] = None, explain: bool = True) -> Optional[FrozenSet[str]]:
+        """
+        Campos pedidos na resposta (`fields=` e `explain=` das rotas de predição)
+        
+        Etapas cujos campos não foram pedidos (drivers, sugestões, eco da
+        entrada e a sanitização recursiva) não são executadas.
+        
+        Args:
+            fields: Lista separada por vírgulas de campos de RESPONSE_FIELDS
+            explain: False remove os campos de explicação (EXPLAIN_FIELDS)
+        
+        Returns:
+            Conjunto de campos, ou None para a resposta completa
+        
+        Raises:
+            HTTPException: 422 se algum campo não existe
+        """
+        if fields is None and explain:
+            return None
+        
+        if fields is None:
+            selected = frozenset(RESPONSE_FIELDS)
         else:
-            if risk_score is not None:
-                tier = risk_tier_from_score(risk_score)
-                
-                if tier == "Crítico":
-                    suggested_action = "Intervenção Psicopedagógica"
-                    suggested_messages["family"] = (
-                        "Detectamos risco crítico. "
-                        "Agendar apoio psicopedagógico urgente."
-                    )
-                    suggested_messages["professor"] = (
-                        "Priorizar acompanhamento intensivo e "
-                        "comunicação com a família."
-                    )
-                elif tier == "Alto":
-                    suggested_action = "Acompanhamento Intensivo"
-                    suggested_messages["family"] = (
-                        "Sinais de risco. Recomendamos tutoria "
-                        "1-2x/semana por 4 semanas."
-                    )
-                    suggested_messages["professor"] = (
-                        "Planejar recuperação focalizada e monitorar semanalmente."
-                    )
-                elif isinstance(pred_label, str) and pred_label.strip().lower() in ("topázio", "topazio"):
-                    suggested_action = "Enriquecimento Curricular"
-                    suggested_messages["family"] = (
-                        "Bom desempenho — sugerimos atividades de aprofundamento."
-                    )
-                    suggested_messages["professor"] = "Oferecer desafios e extensão."
-                else:
-                    suggested_action = "Monitoramento e Micro-intervenção"
-                    suggested_messages["family"] = (
-                        "Acompanhamento de rotina; entraremos em contato "
-                        "se houver piora."
-                    )
-                    suggested_messages["professor"] = (
-                        "Monitorar evolução e aplicar micro-intervenção se necessário."
-                    )
-            else:
-                # Sem modelo disponível
-                suggested_action = "Monitoramento"
-                suggested_messages["family"] = (
-                    "Sem modelo disponível: faremos revisão por DEFA e "
-                    "acompanhamento de rotina."
-                )
-                suggested_messages["professor"] = (
-                    "Monitorar presença e desempenho; reportar casos de atenção."
+            selected = frozenset(f.strip() for f in fields.split(",") if f.strip())
+            unknown = sorted(selected.difference(RESPONSE_FIELDS))
+            if unknown:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Unknown response fields: {', '.join(unknown)}"
                 )
         
-        return {
-            "suggested_action": suggested_action,
-            "suggested_messages": suggested_messages
-        }
+        if not explain:
+            selected = selected - EXPLAIN_FIELDS
+        return selected
+    
+    def lookup_cache(self, prepared: PreparedRequest):
+        """
+        Resposta em cache para a requisição preparada (ou None)
+        """
+        if prepared.cache_key is None:
+            return None
+        return self.cache.get(prepared.cache_key)
     
-    def predict_score(self, metrics: StudentMetrics) -> Dict[str, Any]:
+    def predict_score(
+        self,
+        metrics: StudentMetrics,
+        top_k: Optional[int] = None,
+        fields: Optional[FrozenSet[str]] = None,
+        artifact: Optional[ModelArtifact] = None
+    ) -> Dict[str, Any]:
         """
         Executa predição completa e gera resposta
         
         Args:
             metrics: Métricas do estudante
-            
+            top_k: Quantidade de drivers (None = DRIVERS_TOP_K)
+            fields: Campos da resposta (resolve_fields; None = completa)
+            artifact: Versão selecionada (resolve_artifact; None = publicada)
+        
         Returns:
             Dicionário com predição, probabilidades, risco e recomendações
         """
-        input_data = metrics.model_dump()
+        prepared = self.prepare_request(metrics, top_k, fields, artifact)
         
-        # DEFA integer semantics
+        cached = self.lookup_cache(prepared)
+        if cached is not None:
+            return cached
+        
+        # Caminho rápido: vetor NumPy + uma única inferência
         try:
-            defa_int = int(round(float(input_data.get("DEFA", 0))))
+            if prepared.row is None:
+                raise ValueError("fast path unavailable")
+            t0 = time.perf_counter()
+            probs, pred_idx = self.make_prediction_row(
+                prepared.row, prepared.needs_impute, prepared.artifact
+            )
+            if probs is not None:
+                self.observe_latency(prepared.artifact.version, time.perf_counter() - t0)
+                self.shadow.maybe_score(prepared, probs)
+            x_matrix = prepared.row
         except Exception:
-            defa_int = 0
+            # Fallback: caminho com DataFrame (pipelines que exigem nomes de colunas etc.)
+            prepared = prepared._replace(cache_key=None, needs_impute=False)
+            df_pred = self.prepare_features(prepared.input_data, prepared.artifact)
+            probs, pred_idx = self.make_prediction(df_pred, prepared.artifact)
+            x_matrix = df_pred.to_numpy(dtype=float)
         
-        # Preparar features
-        df_pred = self.prepare_features(input_data)
+        return self.build_response(prepared, probs, pred_idx, x_matrix)
+    
+    async def predict_score_async(
+        self,
+        metrics: StudentMetrics,
+        top_k: Optional[int] = None,
+        fields: Optional[FrozenSet[str]] = None,
+        artifact: Optional[ModelArtifact] = None
+    ) -> Dict[str, Any]:
+        """
+        Versão assíncrona de predict_score
         
-        # Fazer predição
-        probs, pred_idx = self.make_prediction(df_pred)
+        Com o micro-batching habilitado, a requisição é enfileirada no
+        MicroBatcher e processada com as concorrentes em um único job no
+        executor (predict_requests); caso contrário predict_score roda no
+        executor dedicado de inferência. O event loop não prepara features
+        nem monta respostas.
         
-        # Mapear label
-        pred_label = str(pred_idx) if pred_idx is not None else "unknown"
-        if self.model_service.mapa_classes_inv and pred_idx is not None:
-            try:
-                pred_label = self.model_service.mapa_classes_inv.get(
-                    int(pred_idx), 
-                    str(pred_idx)
-                )
-            except Exception:
-                pred_label = str(pred_idx)
+        Args:
+            metrics: Métricas do estudante
+            top_k: Quantidade de drivers (None = DRIVERS_TOP_K)
+            fields: Campos da resposta (resolve_fields; None = completa)
+            artifact: Versão selecionada (resolve_artifact; None = publicada)
         
-        # Calcular risk score
-        risk_score = self.calculate_risk_score(probs)
+        Returns:
+            Dicionário com predição, probabilidades, risco e recomendações
+        """
+        artifact = artifact or self.model_service.artifact
+        if self.batcher is None or artifact.model is None:
+            return await self.executor.run(self.predict_score, metrics, top_k, fields, artifact)
         
-        # Gerar sugestões
-        suggestions = self.generate_suggestions(
-            defa_int, 
-            risk_score, 
-            pred_label,
-            input_data.get('NOME')
-        )
-        
-        # Estimar drivers
+        return await self.batcher.submit((metrics, top_k, fields, time.perf_counter()), artifact)
+    
+    def predict_requests(self, requests: List[tuple], artifact: ModelArtifact) -> List[Any]:
+        """
+        Processa um lote do MicroBatcher (roda no executor de inferência)
+        
+        Prepara as requisições, responde as que estão no cache, executa uma
+        única inferência para as demais e monta as respostas com os drivers
+        (TreeSHAP) calculados sobre o lote inteiro. Requisições fora do
+        caminho rápido, ou de um lote cuja inferência falhou, seguem por
+        predict_score.
+        
+        Args:
+            requests: Tuplas (metrics, top_k, fields, instante do submit)
+            artifact: Versão que atende o lote
+        
+        Returns:
+            Resposta de cada requisição, na ordem de entrada (ou a exceção dela)
+        """
+        results: List[Any] = [None] * len(requests)
+        batch = []
+        for i, (metrics, top_k, fields, _) in enumerate(requests):
+            try:
+                prepared = self.prepare_request(metrics, top_k, fields, artifact)
+                cached = self.lookup_cache(prepared)
+                if cached is not None:
+                    results[i] = cached
+                elif prepared.row is None:
+                    results[i] = self.predict_score(metrics, top_k, fields, artifact)
+                else:
+                    batch.append((i, prepared))
+            except Exception as e:
+                results[i] = e
+        if not batch:
+            return results
+        
+        X = np.concatenate([prepared.row for _, prepared in batch], axis=0)
+        needs_impute = np.fromiter((prepared.needs_impute for _, prepared in batch), dtype=bool, count=len(batch))
         try:
-            features = self.model_service.features_list or [
-                "IAN", "IDA", "IEG", "IAA", "IPS", "IPP", "IPV",
-                "FASE", "Status_DEFA", "consistencia_acad"
-            ]
-            drivers = estimate_top_drivers(
-                df_pred.iloc[0].to_dict(), 
-                features,
-                self.model_service
+            probs = self.make_prediction_batch(X, needs_impute, artifact, bulk=False)
+            if probs is None:
+                raise RuntimeError("Model not available")
+        except Exception:
+            for i, _ in batch:
+                metrics, top_k, fields, _ = requests[i]
+                try:
+                    results[i] = self.predict_score(metrics, top_k, fields, artifact)
+                except Exception as e:
+                    results[i] = e
+            return results
+        
+        # Inclui a espera na janela do micro-batching
+        now = time.perf_counter()
+        for (i, prepared), row_probs in zip(batch, probs):
+            self.observe_latency(artifact.version, now - requests[i][3])
+            self.shadow.maybe_score(prepared, row_probs)
+        
+        responses = self.build_responses([prepared for _, prepared in batch], probs, X, needs_impute)
+        for (i, _), response in zip(batch, responses):
+            results[i] = response
+        return results
+    
+    def build_response(self, prepared: PreparedRequest, probs, pred_idx, x_matrix: np.ndarray) -> Dict[str, Any]:
+        """
+        Monta a resposta (label, risco, sugestões, drivers) a partir da inferência
+        
+        Só executa as etapas dos campos pedidos em `prepared.fields`; sem
+        campos de explicação, a sanitização recursiva também é dispensada
+        (os demais valores já saem como tipos JSON nativos).
+        
+        Args:
+            prepared: Requisição preparada
+            probs: Probabilidades por classe (ou None sem modelo)
+            pred_idx: Índice predito (ou None)
+            x_matrix: Matriz (1, n_features) usada na predição
+        
+        Returns:
+            Dicionário de resposta (armazenado no cache, se habilitado)
+        """
+        drivers = None
+        if prepared.fields is None or "top_drivers" in prepared.fields:
+            drivers = self.request_drivers(
+                [prepared], x_matrix, np.array([prepared.needs_impute]),
+                None if pred_idx is None else [pred_idx]
+            )[0]
+        risk_score = self.calculate_risk_score(probs, prepared.artifact)
+        return self._assemble_response(prepared, probs, pred_idx, x_matrix, risk_score, drivers)
+    
+    def build_responses(
+        self,
+        prepared_list: List[PreparedRequest],
+        probs: np.ndarray,
+        X: np.ndarray,
+        needs_impute: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """
+        Versão em lote de build_response (mesmo artefato em todas as linhas)
+        
+        Risco e drivers (TreeSHAP) são calculados de uma vez para as linhas
+        que os pediram; o restante da resposta é montado por linha.
+        
+        Args:
+            prepared_list: Requisições preparadas, na ordem das linhas
+            probs: Matriz (n, n_classes) de probabilidades
+            X: Matriz (n, n_features) usada na predição
+            needs_impute: Máscara de linhas que precisaram de imputação
+        
+        Returns:
+            Lista de respostas (armazenadas no cache, se habilitado)
+        """
+        artifact = prepared_list[0].artifact
+        pred_idx = np.argmax(probs, axis=1)
+        risk_scores = self.calculate_risk_scores(probs, artifact)
+        
+        drivers: List[Any] = [None] * len(prepared_list)
+        explain = [
+            i for i, p in enumerate(prepared_list) if p.fields is None or "top_drivers" in p.fields
+        ]
+        if explain:
+            rows = np.asarray(explain)
+            computed = self.request_drivers(
+                [prepared_list[i] for i in explain], X[rows], needs_impute[rows], pred_idx[rows]
+            )
+            for i, row_drivers in zip(explain, computed):
+                drivers[i] = row_drivers
+        
+        return [
+            self._assemble_response(
+                prepared, probs[i], int(pred_idx[i]), X[i:i + 1], float(risk_scores[i]), drivers[i]
             )
+            for i, prepared in enumerate(prepared_list)
+        ]
+    
+    def request_drivers(
+        self,
+        prepared_list: List[PreparedRequest],
+        X: np.ndarray,
+        needs_impute: np.ndarray,
+        pred_idx
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Drivers das requisições (uma chamada ao TreeSHAP para todas as linhas)
+        
+        O ranking é estável: os drivers de cada linha são os primeiros
+        `top_k` do ranking calculado com o maior `top_k` do lote.
+        
+        Args:
+            prepared_list: Requisições preparadas, na ordem das linhas
+            X: Matriz (n, n_features) usada na predição
+            needs_impute: Máscara de linhas que precisaram de imputação
+            pred_idx: Índice predito por linha (None sem modelo)
+        
+        Returns:
+            Lista (uma por linha) de drivers; [] para todas se o cálculo falha
+        """
+        artifact = prepared_list[0].artifact
+        try:
+            X_model = X
+            if needs_impute.any():
+                X_model = X.copy()
+                X_model[needs_impute] = self.impute_matrix(X[needs_impute], artifact)
+            top_k = max(p.top_k for p in prepared_list)
+            computed = self.compute_drivers(X, X_model, pred_idx, artifact, top_k)
+            return [row[:p.top_k] for p, row in zip(prepared_list, computed)]
         except Exception:
-            drivers = []
+            return [[] for _ in prepared_list]
+    
+    def _assemble_response(
+        self,
+        prepared: PreparedRequest,
+        probs,
+        pred_idx,
+        x_matrix: np.ndarray,
+        risk_score: Optional[float],
+        drivers: Optional[List[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Monta o dicionário de resposta com risco e drivers já calculados
+        """
+        input_data = prepared.input_data
+        artifact = prepared.artifact
+        defa_int = prepared.defa_int
+        fields = prepared.fields
+        
+        features = artifact.features
+        input_features = None
+        if fields is None or "input_features" in fields:
+            x_values = x_matrix[0].tolist()
+            input_features = {
+                f: (input_data.get(f) if f in input_data else (None if v != v else v))
+                for f, v in zip(features, x_values)
+            }
+        
+        # Mapear label
+        labels = artifact.class_labels
+        if pred_idx is None:
+            pred_label = "unknown"
+        elif labels is not None and pred_idx < len(labels):
+            pred_label = labels[pred_idx]
+        else:
+            pred_label = str(pred_idx)
+        
+        # Gerar sugestões
+        suggestions = {"suggested_action": None, "suggested_messages": None}
+        if fields is None or "acao_sugerida" in fields or "suggested_messages" in fields:
+            suggestions = self.generate_suggestions(
+                defa_int, 
+                risk_score, 
+                pred_label,
+                input_data.get('NOME')
+            )
         
         # Construir mapa de probabilidades
         probs_map = {}
         if probs is not None:
-            if self.model_service.mapa_classes_inv:
-                for i, p in enumerate(probs):
-                    probs_map[
-                        self.model_service.mapa_classes_inv.get(int(i), f"Class_{i}")
-                    ] = float(p)
-            else:
-                for i, p in enumerate(probs):
-                    probs_map[f"Class_{i}"] = float(p)
+            probs_list = np.asarray(probs, dtype=float).tolist()
+            names = artifact.class_names
+            if names is None or len(names) != len(probs_list):
+                names = [f"Class_{i}" for i in range(len(probs_list))]
+            probs_map = dict(zip(names, probs_list))
         
         response = {
             "prediction": pred_label,
@@ -351,9 +824,279 @@ class PredictionService:
             "acao_sugerida": suggestions["suggested_action"],
             "suggested_messages": suggestions["suggested_messages"],
             "top_drivers": drivers,
-            "input_features": df_pred.to_dict(orient="records")[0],
+            "input_features": input_features,
             "defa_int": int(defa_int),
-            "model_version": self.model_service.model_version
+            "model_version": artifact.version
         }
         
-        return sanitize_for_json(response)
+        # NaN/Inf e tipos NumPy ficam para a serialização (FastJSONResponse)
+        if fields is not None:
+            response = {k: v for k, v in response.items() if k in fields}
+        
+        # Requisições iniciadas antes de uma troca de modelo não entram no cache novo
+        if prepared.cache_key is not None and artifact is self._cache_artifact:
+            self.cache.put(prepared.cache_key, response)
+        
+        return response
+    
+    def prepare_features_batch(self, records: List[Dict[str, Any]], artifact: ModelArtifact):
+        """
+        Versão em lote de prepare_features: monta a matriz de features
+        de uma vez, na ordem do artefato
+        
+        Args:
+            records: Lista de dicionários com métricas dos estudantes
+            artifact: Artefato pré-compilado do modelo (layout de colunas)
+        
+        Returns:
+            Tupla (matriz float (n, n_features), máscara de linhas que
+            precisam de imputação)
+        """
+        keys = {f for _, f in artifact.input_cols} | {"IDA", "IEG"}
+        columns = {
+            f: np.array([r.get(f) for r in records], dtype=float) for f in keys
+        }
+        return self.prepare_features_columns(columns, len(records), artifact)
+    
+    def prepare_features_columns(self, columns: Dict[str, np.ndarray], n: int, artifact: ModelArtifact):
+        """
+        Monta a matriz de features a partir de colunas (ex.: de um DataFrame)
+        
+        Args:
+            columns: Mapa nome -> array float (NaN = ausente); colunas
+                faltantes são tratadas como ausentes
+            n: Número de linhas
+            artifact: Artefato pré-compilado do modelo (layout de colunas)
+        
+        Returns:
+            Tupla (matriz float (n, n_features), máscara de linhas que
+            precisam de imputação)
+        """
+        X = np.full((n, len(artifact.features)), np.nan)
+        
+        for j, f in artifact.input_cols:
+            if f in columns:
+                X[:, j] = columns[f]
+        
+        # Feature derivada: consistência acadêmica (ausente/0 -> 0.0, divisão por zero -> 0.0)
+        if artifact.consistencia_col is not None:
+            ida = np.nan_to_num(columns.get("IDA", np.zeros(n)), nan=0.0)
+            ieg = np.nan_to_num(columns.get("IEG", np.zeros(n)), nan=0.0)
+            denom = ieg + 0.1
+            with np.errstate(divide="ignore", invalid="ignore"):
+                X[:, artifact.consistencia_col] = np.where(denom == 0, 0.0, ida / denom)
+        
+        # Campos informados como None não são aceitos pelo modelo direto e
+        # seguem o caminho do imputer (mesmo comportamento de make_prediction)
+        provided_cols = [j for j, _ in artifact.input_cols]
+        needs_impute = np.isnan(X[:, provided_cols]).any(axis=1)
+        
+        return X, needs_impute
+    
+    def make_prediction_batch(
+        self,
+        X: np.ndarray,
+        needs_impute: np.ndarray,
+        artifact: ModelArtifact,
+        bulk: bool = True
+    ):
+        """
+        Executa predição em lote com uma única chamada ao modelo por caminho
+        
+        Args:
+            X: Matriz de features preparada
+            needs_impute: Máscara de linhas que precisam de imputação
+            artifact: Artefato pré-compilado do modelo
+            bulk: True para escore em lote/bulk (usa as threads de XGB_BATCH_NTHREAD);
+                False para lotes do caminho de requisição (micro-batches)
+        
+        Returns:
+            Matriz de probabilidades (n, n_classes) ou None se não houver modelo
+        """
+        backend = self.model_service.backend_for(artifact, bulk=bulk)
+        
+        if backend is None:
+            return None
+        
+        try:
+            probs = None
+            direct = ~needs_impute
+            
+            if direct.any():
+                p_direct = np.asarray(backend.predict_proba(X[direct]), dtype=float)
+                probs = np.empty((X.shape[0], p_direct.shape[1]))
+                probs[direct] = p_direct
+            
+            if needs_impute.any():
+                X_for_pred = self.impute_matrix(X[needs_impute], artifact)
+                p_imp = np.asarray(backend.predict_proba(X_for_pred), dtype=float)
+                if probs is None:
+                    probs = np.empty((X.shape[0], p_imp.shape[1]))
+                probs[needs_impute] = p_imp
+            
+            return probs
+        except Exception as e:
+            logger.exception("Batch prediction failed: %s", e)
+            raise HTTPException(
+                status_code=500,
+                detail="Prediction failed on server"
+            )
+    
+    def compute_drivers(
+        self,
+        X: np.ndarray,
+        X_model: np.ndarray,
+        pred_idx,
+        artifact: ModelArtifact,
+        top_k: int
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Top drivers por linha
+        
+        Usa as contribuições exatas (TreeSHAP) da classe predita quando o
+        explainer está disponível; caso contrário (ou se falhar), a heurística
+        |z| × importância.
+        
+        Args:
+            X: Matriz (n, n_features) como recebida (NaN = ausente)
+            X_model: Matriz efetivamente passada ao modelo (após imputação)
+            pred_idx: Índice predito por linha (None sem modelo)
+            artifact: Snapshot do modelo usado na predição
+            top_k: Quantidade de drivers por linha
+        
+        Returns:
+            Lista (uma por linha) de drivers
+        """
+        features = artifact.features
+        explainer = self.model_service.explainer_for(artifact)
+        if explainer is not None and pred_idx is not None:
+            try:
+                contributions = explainer.contributions(X_model, pred_idx)
+                return drivers_from_contributions(
+                    contributions, X, features, artifact, top_k
+                )
+            except Exception as e:
+                logger.warning("TreeSHAP drivers failed, using heuristic: %s", e)
+        return estimate_top_drivers_batch(X, features, artifact, top_k)
+    
+    def predict_batch(
+        self,
+        metrics_list: List[StudentMetrics],
+        top_k: Optional[int] = None,
+        fields: Optional[FrozenSet[str]] = None,
+        artifact: Optional[ModelArtifact] = None
+    ) -> Dict[str, Any]:
+        """
+        Executa predição completa para um lote de estudantes
+        
+        Preparação de features, inferência, risco, tiers e drivers são
+        calculados sobre o lote inteiro; os resultados mantêm a ordem de entrada
+        e têm o mesmo formato da resposta de predict_score (restrito a
+        `fields`, sem executar as etapas dos campos omitidos).
+        
+        Args:
+            metrics_list: Lista de métricas de estudantes
+            top_k: Quantidade de drivers por estudante (None = DRIVERS_TOP_K)
+            fields: Campos de cada resultado (resolve_fields; None = completo)
+            artifact: Versão selecionada (resolve_artifact; None = publicada)
+        
+        Returns:
+            Dicionário com versão do modelo e lista de resultados
+        """
+        records = [m.model_dump() for m in metrics_list]
+        artifact = artifact or self.model_service.artifact
+        model_version = artifact.version
+        
+        if not records:
+            return {"model_version": model_version, "count": 0, "results": []}
+        
+        features = artifact.features
+        
+        # DEFA integer semantics (None/NaN -> 0, arredondamento bancário como round())
+        defa = np.array([r.get("DEFA") for r in records], dtype=float)
+        defa_int = np.rint(np.nan_to_num(defa, nan=0.0, posinf=0.0, neginf=0.0)).astype(int)
+        
+        X, needs_impute = self.prepare_features_batch(records, artifact)
+        probs = self.make_prediction_batch(X, needs_impute, artifact)
+        
+        if probs is not None:
+            n_classes = probs.shape[1]
+            labels = artifact.class_labels
+            names = artifact.class_names
+            if labels is None or len(labels) != n_classes:
+                labels = np.array([str(i) for i in range(n_classes)], dtype=object)
+                names = tuple(f"Class_{i}" for i in range(n_classes))
+            pred_idx = probs.argmax(axis=1)
+            risk = self.calculate_risk_scores(probs, artifact)
+            tiers = risk_tiers_from_scores(risk).tolist()
+            pred_labels = labels[pred_idx].tolist()
+            probs_maps = [dict(zip(names, p)) for p in probs.tolist()]
+            pred_idx = pred_idx.tolist()
+            risk_scores = risk
+            risk = risk.tolist()
+        else:
+            n = len(records)
+            risk_scores = None
+            pred_idx = [None] * n
+            pred_labels = ["unknown"] * n
+            risk = [None] * n
+            tiers = [None] * n
+            probs_maps = [{} for _ in range(n)]
+        
+        want_drivers = fields is None or "top_drivers" in fields
+        want_suggestions = fields is None or not fields.isdisjoint(("acao_sugerida", "suggested_messages"))
+        want_inputs = fields is None or "input_features" in fields
+        
+        drivers = [None] * len(records)
+        if want_drivers:
+            try:
+                X_model = X
+                if probs is not None and needs_impute.any():
+                    X_model = X.copy()
+                    X_model[needs_impute] = self.impute_matrix(X[needs_impute], artifact)
+                drivers = self.compute_drivers(
+                    X,
+                    X_model,
+                    None if probs is None else pred_idx,
+                    artifact,
+                    self.resolve_top_k(top_k)
+                )
+            except Exception:
+                drivers = [[] for _ in records]
+        
+        X_rows = X.tolist() if want_inputs else None
+        defa_int = defa_int.tolist()
+        no_suggestions = {"suggested_action": None, "suggested_messages": None}
+        suggestions = [no_suggestions] * len(records)
+        if want_suggestions:
+            suggestions = self.suggestion_table.evaluate(
+                defa_int, risk_scores, pred_labels, [rec.get("NOME") for rec in records]
+            )
+        
+        results = []
+        for i, rec in enumerate(records):
+            result = {
+                "prediction": pred_labels[i],
+                "prediction_index": pred_idx[i],
+                "probabilities": probs_maps[i],
+                "risk_score": None if risk[i] is None else round(risk[i], 4),
+                "risk_tier": tiers[i],
+                "acao_sugerida": suggestions[i]["suggested_action"],
+                "suggested_messages": suggestions[i]["suggested_messages"],
+                "top_drivers": drivers[i],
+                "input_features": {
+                    f: (rec.get(f) if f in rec else (None if v != v else v))
+                    for f, v in zip(features, X_rows[i])
+                } if want_inputs else None,
+                "defa_int": defa_int[i],
+                "model_version": model_version
+            }
+            if fields is not None:
+                result = {k: v for k, v in result.items() if k in fields}
+            results.append(result)
+        
+        return {
+            "model_version": model_version,
+            "count": len(results),
+            "results": results
+        }
@@ -0,0 +1,221 @@
+# services/reload_service.py
+"""
+Recarga do modelo em produção sem reinício (troca atômica de snapshot)
+
+O novo modelo é carregado, validado e aquecido fora do caminho de requisição
+(ModelService.load_candidate) e a tabela de risco é calculada para ele antes
+da publicação; só então o snapshot é trocado com uma atribuição. Requisições
+em andamento terminam com o snapshot com que começaram.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import logger, MODEL_WATCH_INTERVAL
+
+
+class ModelReloader:
+    """
+    Recarrega o modelo sob demanda (endpoint /admin) ou quando o arquivo do
+    modelo muda em disco (watcher por polling)
+    """
+    
+    def __init__(self, model_service, risk_service=None, watch_interval: float = MODEL_WATCH_INTERVAL):
+        """
+        Args:
+            model_service: Instância do ModelService
+            risk_service: Instância do RiskService (tabela pré-calculada antes da troca)
+            watch_interval: Intervalo (s) de verificação do arquivo (0 = sem watcher)
+        """
+        self.model_service = model_service
+        self.risk_service = risk_service
+        self.watch_interval = watch_interval
+        
+        # Uma recarga por vez; requisições não disputam este lock
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self.watched_path: Optional[str] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        
+        # Métricas
+        self.reloads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_reload_ms: Optional[float] = None
+        self.in_progress = False
+    
+    def reload(self, model_path: str = None) -> Dict[str, Any]:
+        """
+        Carrega, valida, aquece e publica um novo modelo
+        
+        Em caso de erro o snapshot corrente continua publicado.
+        
+        Args:
+            model_path: Caminho do modelo (usa MODEL_JOBLIB_PATH/DEFAULT_MODEL)
+        
+        Returns:
+            Versões anterior e nova e duração da recarga
+        
+        Raises:
+            FileNotFoundError: Se o arquivo não existe
+            ValueError: Se o modelo não passa na validação
+            Exception: Erros de desserialização
+        """
+        model_path = self.model_service.resolve_model_path(model_path)
+        with self._lock:
+            self.in_progress = True
+            t0 = time.perf_counter()
+            try:
+                signature = self.file_signature(model_path)
+                candidate = self.model_service.load_candidate(model_path)
+                if self.risk_service is not None:
+                    self.risk_service.prepare(candidate)
+                previous = self.model_service.swap(candidate)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.error(f"Model reload failed ({model_path}): {self.last_error}")
+                raise
+            finally:
+                self.in_progress = False
+            
+            if model_path == self.watched_path:
+                self._signature = signature
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload_ms = (time.perf_counter() - t0) * 1000.0
+        
+        return {
+            "previous_version": previous.version,
+            "model_version": candidate.version,
+            "source": str(model_path),
+            "duration_ms": round(self.last_reload_ms, 2)
+        }
+    
+    def promote(self, name: str) -> Dict[str, Any]:
+        """
+        Publica uma versão registrada (ModelService.versions), com a tabela de
+        risco calculada antes da troca
+        
+        Args:
+            name: Nome da versão
+        
+        Returns:
+            Versões anterior e nova
+        
+        Raises:
+            KeyError: Se a versão não está registrada
+        """
+        with self._lock:
+            candidate = self.model_service.versions[name]
+            if self.risk_service is not None:
+                self.risk_service.prepare(candidate)
+            previous = self.model_service.promote(name)
+        return {"previous_version": previous.version, "model_version": candidate.version}
+    
+    def start(self, model_path: str = None) -> threading.Thread:
+        """
+        Executa a recarga em uma thread de background (erros ficam em stats())
+        """
+        thread = threading.Thread(
+            target=self._reload_quietly, args=(model_path,), name="model-reload", daemon=True
+        )
+        thread.start()
+        return thread
+    
+    def _reload_quietly(self, model_path: str = None):
+        try:
+            self.reload(model_path)
+        except Exception:
+            pass  # já registrado em reload()
+    
+    @staticmethod
+    def file_signature(model_path) -> Optional[Tuple[int, int]]:
+        """
+        Assinatura (mtime_ns, tamanho) do arquivo, ou None se ele não existe
+        """
+        try:
+            st = os.stat(model_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+    
+    def start_watcher(self, model_path: str = None) -> Optional[threading.Thread]:
+        """
+        Inicia a verificação periódica do arquivo do modelo
+        
+        A recarga só ocorre quando a assinatura nova se repete em duas
+        verificações seguidas, para não ler um arquivo ainda sendo copiado.
+        
+        Args:
+            model_path: Arquivo observado (usa MODEL_JOBLIB_PATH/DEFAULT_MODEL)
+        
+        Returns:
+            Thread do watcher (None se watch_interval <= 0)
+        """
+        if self.watch_interval <= 0 or self._watcher is not None:
+            return self._watcher
+        
+        self.watched_path = self.model_service.resolve_model_path(model_path)
+        self._signature = self.file_signature(self.watched_path)
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+        logger.info(f"Watching model file: {self.watched_path} (every {self.watch_interval}s)")
+        return self._watcher
+    
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.watch_interval):
+            pending = self.check(pending)
+    
+    def check(self, pending: Optional[Tuple[int, int]] = None) -> Optional[Tuple[int, int]]:
+        """
+        Uma verificação do watcher
+        
+        Args:
+            pending: Assinatura vista na verificação anterior e ainda não carregada
+        
+        Returns:
+            Assinatura pendente para a próxima verificação
+        """
+        signature = self.file_signature(self.watched_path)
+        if signature is None or signature == self._signature:
+            return None
+        if signature != pending:
+            return signature
+        
+        logger.info(f"Model file changed, reloading: {self.watched_path}")
+        try:
+            self.reload(self.watched_path)
+        except Exception:
+            # Não tenta de novo até o arquivo mudar outra vez
+            self._signature = signature
+        return None
+    
+    def stop(self):
+        """
+        Encerra o watcher
+        """
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contadores de recarga do modelo
+        """
+        return {
+            "model_version": self.model_service.model_version,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "in_progress": self.in_progress,
+            "last_error": self.last_error,
+            "last_reload_ms": (
+                round(self.last_reload_ms, 2) if self.last_reload_ms is not None else None
+            ),
+            "watching": self.watched_path if self._watcher is not None else None
+        }
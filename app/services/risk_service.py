@@ -0,0 +1,368 @@
+# services/risk_service.py
+"""
+Serviço de tabela de risco materializada para toda a base de estudantes
+"""
+import threading
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+
+from app.config import logger
+from app.utils.helpers import risk_tiers_from_scores
+
+
+class RiskTableState(NamedTuple):
+    """Tabela de risco e índices calculados para um artefato/base"""
+    artifact: Any
+    df_base: Any
+    table: Optional[pd.DataFrame]
+    class_names: Tuple[str, ...]
+    # Posições (ordenadas, um registro por aluno) de toda a tabela e por
+    # valor de FASE, ANO e (FASE, ANO)
+    indexes: Dict[str, Dict[Any, np.ndarray]]
+    risk: Optional[np.ndarray]
+    # Índice de nomes de df_base (NameIndex) capturado junto com a base
+    name_index: Any = None
+
+
+class RiskService:
+    """
+    Mantém a predição de todas as linhas de df_base pré-calculada
+    
+    A tabela é calculada em lote uma única vez (no startup, em background ou
+    no primeiro acesso) e recalculada automaticamente quando o artefato do
+    modelo ou a base mudam.
+    """
+    
+    def __init__(self, model_service, prediction_service, student_service):
+        self.model_service = model_service
+        self.prediction_service = prediction_service
+        self.student_service = student_service
+        self._lock = threading.Lock()
+        # RiskTableState do último cálculo
+        self._state = None
+        # Tabela já calculada para um modelo que ainda vai ser publicado (prepare)
+        self._next_state = None
+    
+    def materialize(self) -> Optional[pd.DataFrame]:
+        """
+        Calcula em lote predição, probabilidades, risk_score e tier de cada linha
+        
+        Returns:
+            DataFrame alinhado ao índice de df_base (ou None sem dados/modelo)
+        """
+        self._state = self.build_state(self.model_service.artifact, *self.base_snapshot())
+        return self._state.table
+    
+    def prepare(self, artifact) -> Optional[RiskTableState]:
+        """
+        Calcula a tabela para um snapshot antes da sua publicação (recarga do
+        modelo), para que a troca não recalcule a tabela no caminho de requisição
+        
+        Args:
+            artifact: Snapshot candidato (ModelService.load_candidate)
+        
+        Returns:
+            Estado calculado (promovido quando o snapshot for publicado), ou None
+            se a tabela ainda não foi materializada (modo lazy)
+        """
+        if self._state is None:
+            return None
+        state = self.build_state(artifact, *self.base_snapshot())
+        self._next_state = state
+        return state
+    
+    def base_snapshot(self) -> Tuple[Any, Any]:
+        """
+        Base atual e seu índice de nomes (o índice é lido depois da base e
+        descartado se a base trocou no meio)
+        """
+        df = self.model_service.df_base
+        index = self.model_service.name_index
+        if self.model_service.df_base is not df:
+            index = None
+        return df, index
+    
+    def build_state(self, artifact, df, name_index=None) -> RiskTableState:
+        """
+        Calcula a tabela de risco e os índices de um snapshot sobre a base
+        
+        Args:
+            artifact: Snapshot do modelo
+            df: Base de estudantes
+            name_index: Índice de nomes de `df` (usado por get_student_risk)
+        
+        Returns:
+            RiskTableState (tabela None sem dados/modelo)
+        """
+        table = None
+        class_names = ()
+        indexes = {}
+        risk = None
+        
+        if df is not None and artifact.model is not None:
+            columns = {
+                f: df[f].to_numpy(dtype=float)
+                for f in {f for _, f in artifact.input_cols} | {"IDA", "IEG"}
+                if f in df.columns
+            }
+            X, needs_impute = self.prediction_service.prepare_features_columns(
+                columns, len(df), artifact
+            )
+            probs = self.prediction_service.make_prediction_batch(X, needs_impute, artifact)
+            
+            n_classes = probs.shape[1]
+            labels = artifact.class_labels
+            class_names = artifact.class_names
+            if labels is None or len(labels) != n_classes:
+                labels = np.array([str(i) for i in range(n_classes)], dtype=object)
+                class_names = tuple(f"Class_{i}" for i in range(n_classes))
+            
+            pred_idx = probs.argmax(axis=1)
+            risk = self.prediction_service.calculate_risk_scores(probs, artifact)
+            
+            data = {
+                c: df[c].to_numpy() for c in ("NOME", "ANO", "FASE", "IDA", "IEG")
+                if c in df.columns
+            }
+            if artifact.consistencia_col is not None:
+                data["consistencia_acad"] = X[:, artifact.consistencia_col]
+            data["prediction"] = labels[pred_idx]
+            data["prediction_index"] = pred_idx
+            for i, name in enumerate(class_names):
+                data[f"prob_{name}"] = probs[:, i]
+            data["risk_score"] = risk
+            data["risk_tier"] = risk_tiers_from_scores(risk)
+            
+            table = pd.DataFrame(data, index=df.index)
+            indexes = self.build_indexes(table)
+            logger.info(
+                f"Materialized risk table: rows={len(table)} version={artifact.version}"
+            )
+        
+        return RiskTableState(artifact, df, table, class_names, indexes, risk, name_index)
+    
+    @staticmethod
+    def build_indexes(table: pd.DataFrame) -> Dict[str, Dict[Any, np.ndarray]]:
+        """
+        Índices de posições da tabela inteira ("ALL") e por FASE, ANO e
+        (FASE, ANO) para filtros sem varredura
+        
+        Cada aluno entra uma vez por chave, com o registro de ANO mais
+        recente entre os da chave: o ranking não deduplica por requisição.
+        """
+        codes = None
+        if "NOME" in table.columns:
+            # Nomes ausentes recebem códigos únicos (não são agrupados)
+            codes, uniques = pd.factorize(table["NOME"])
+            missing = codes < 0
+            codes[missing] = len(uniques) + np.arange(int(missing.sum()))
+        anos = table["ANO"].to_numpy() if "ANO" in table.columns else np.zeros(len(table))
+        
+        indexes = {"ALL": {None: RiskService.latest_per_name(np.arange(len(table)), codes, anos)}}
+        for key, cols in (("FASE", ["FASE"]), ("ANO", ["ANO"]), ("FASE_ANO", ["FASE", "ANO"])):
+            if all(c in table.columns for c in cols):
+                groups = table.reset_index(drop=True).groupby(cols if len(cols) > 1 else cols[0]).indices
+                indexes[key] = {
+                    k: RiskService.latest_per_name(np.sort(v), codes, anos) for k, v in groups.items()
+                }
+        return indexes
+    
+    @staticmethod
+    def latest_per_name(positions: np.ndarray, codes: Optional[np.ndarray], anos: np.ndarray) -> np.ndarray:
+        """
+        Uma posição por aluno: o registro de ANO mais recente entre as posições
+        (empate no ANO: a última linha da base)
+        
+        Args:
+            positions: Posições candidatas (ordenadas)
+            codes: Código inteiro do NOME por linha (None = sem coluna NOME)
+            anos: ANO por linha
+        
+        Returns:
+            Posições selecionadas, ordenadas
+        """
+        if codes is None or len(positions) == 0:
+            return positions
+        group_codes = codes[positions]
+        # Ordena por (nome, ANO, posição) e fica com o último registro de cada nome
+        order = np.lexsort((positions, anos[positions], group_codes))
+        group_codes = group_codes[order]
+        last = np.append(group_codes[1:] != group_codes[:-1], True)
+        return np.sort(positions[order][last])
+    
+    def is_current(self, state: Optional[RiskTableState]) -> bool:
+        """
+        Indica se o estado corresponde ao snapshot do modelo e à base atuais
+        """
+        return (
+            state is not None
+            and state.artifact is self.model_service.artifact
+            and state.df_base is self.model_service.df_base
+        )
+    
+    def current_state(self) -> RiskTableState:
+        """
+        Estado atualizado da tabela, recalculando se o modelo ou a base mudaram
+        (ou promovendo a tabela preparada para o modelo recém-publicado)
+        """
+        state = self._state
+        if not self.is_current(state):
+            with self._lock:
+                state = self._state
+                if not self.is_current(state):
+                    if self.is_current(self._next_state):
+                        self._state, self._next_state = self._next_state, None
+                    else:
+                        self.materialize()
+                state = self._state
+        return state
+    
+    def get_table(self) -> Optional[pd.DataFrame]:
+        """
+        Retorna a tabela de risco, recalculando se o modelo ou a base mudaram
+        """
+        return self.current_state().table
+    
+    def start_background(self) -> threading.Thread:
+        """
+        Materializa a tabela em uma thread de background
+        """
+        thread = threading.Thread(target=self.get_table, name="risk-table", daemon=True)
+        thread.start()
+        return thread
+    
+    def get_student_risk(self, name: str) -> Dict[str, Any]:
+        """
+        Retorna o risco pré-calculado de cada registro do estudante (sem chamar o modelo)
+        
+        A busca usa a base e o índice de nomes do mesmo estado da tabela: uma
+        troca da base durante a requisição não desalinha posições e linhas.
+        
+        Args:
+            name: Nome do estudante (busca exata ou parcial)
+            
+        Returns:
+            Dicionário com nome, versão do modelo e risco por registro
+            
+        Raises:
+            HTTPException: Se dados/modelo não disponíveis ou estudante não encontrado
+        """
+        state = self.current_state()
+        positions = self.student_service.find_matches(name, state.df_base, state.name_index)
+        table = state.table
+        class_names = state.class_names
+        
+        if table is None:
+            raise HTTPException(status_code=503, detail="Model not available")
+        
+        rows = table.iloc[positions]
+        
+        historico = []
+        for rec in rows.to_dict(orient="records"):
+            historico.append({
+                "ANO": rec.get("ANO"),
+                "FASE": rec.get("FASE"),
+                "prediction": rec["prediction"],
+                "prediction_index": rec["prediction_index"],
+                "probabilities": {c: rec[f"prob_{c}"] for c in class_names},
+                "risk_score": round(float(rec["risk_score"]), 4),
+                "risk_tier": rec["risk_tier"]
+            })
+        
+        return {
+            "nome": state.df_base["NOME"].iloc[positions[0]],
+            "model_version": state.artifact.version,
+            "historico": historico
+        }
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Estado da tabela materializada (exposto em /health)
+        """
+        state = self._state
+        if state is None or state.table is None:
+            return {"materialized": False}
+        return {
+            "materialized": True,
+            "rows": int(len(state.table)),
+            "model_version": state.artifact.version,
+            "stale": state.artifact is not self.model_service.artifact
+        }
+    
+    def top_at_risk(self, n: int = 50, fase: Optional[int] = None, ano: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Ranking dos N estudantes com maior probabilidade de 'quartzo'
+        
+        Usa a tabela materializada, os índices de FASE/ANO para filtrar e
+        np.argpartition para selecionar os N maiores sem ordenar tudo. Cada
+        aluno aparece uma vez, com o registro de ANO mais recente entre os
+        que passam nos filtros.
+        
+        Args:
+            n: Quantidade de estudantes no ranking
+            fase: Filtro opcional de FASE
+            ano: Filtro opcional de ANO (2 dígitos como na base; 2024 também é aceito)
+            
+        Returns:
+            Dicionário com versão do modelo, filtros e lista ranqueada
+            
+        Raises:
+            HTTPException: Se dados/modelo não disponíveis
+        """
+        state = self.current_state()
+        table = state.table
+        
+        if table is None:
+            raise HTTPException(status_code=503, detail="Model not available")
+        
+        if ano is not None and ano >= 2000:
+            ano -= 2000
+        
+        if fase is not None and ano is not None:
+            positions = state.indexes.get("FASE_ANO", {}).get((fase, ano))
+        elif fase is not None:
+            positions = state.indexes.get("FASE", {}).get(fase)
+        elif ano is not None:
+            positions = state.indexes.get("ANO", {}).get(ano)
+        else:
+            positions = state.indexes.get("ALL", {}).get(None)
+        
+        if positions is None:
+            positions = np.arange(0)
+        
+        scores = state.risk[positions]
+        k = min(n, len(positions))
+        if 0 < k < len(positions):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(positions))[:k]
+        # Ordenar apenas os k selecionados (desempate pela posição na base)
+        top = top[np.lexsort((positions[top], -scores[top]))]
+        
+        selected = positions[top]
+        columns = [
+            c for c in ("NOME", "ANO", "FASE", "risk_tier", "IDA", "IEG", "consistencia_acad")
+            if c in table.columns
+        ]
+        values = [table[c].to_numpy()[selected].tolist() for c in columns]
+        pedras = table["prediction"].to_numpy()[selected].tolist()
+        
+        ranking = []
+        for i, rank in enumerate(range(1, len(selected) + 1)):
+            item = {"rank": rank}
+            for c, col_values in zip(columns, values):
+                item[c] = col_values[i]
+            item["Pedra_Conceito"] = pedras[i]
+            item["Prob_Quartzo"] = round(float(scores[top[i]]), 4)
+            ranking.append(item)
+        
+        return {
+            "model_version": state.artifact.version,
+            "filters": {"fase": fase, "ano": ano},
+            "total_candidates": int(len(positions)),
+            "count": len(ranking),
+            "students": ranking
+        }
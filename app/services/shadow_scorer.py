@@ -0,0 +1,191 @@
+# services/shadow_scorer.py
+"""
+Avaliação em sombra de uma versão candidata do modelo no tráfego real
+
+Uma amostra das predições do /predict é escorada também na versão
+candidata, em um executor próprio e fora do caminho de requisição: a
+resposta nunca espera nem depende do resultado. Os contadores comparam a
+predição servida com a da candidata.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.config import (
+    logger,
+    SHADOW_MODEL_VERSION,
+    SHADOW_SAMPLE_RATE,
+    SHADOW_WORKERS,
+    SHADOW_MAX_PENDING
+)
+
+
+class ShadowScorer:
+    """
+    Escora uma amostra das requisições na versão em sombra e acumula a
+    concordância com a versão que respondeu
+    """
+    
+    def __init__(
+        self,
+        prediction_service,
+        version: str = SHADOW_MODEL_VERSION,
+        sample_rate: float = SHADOW_SAMPLE_RATE,
+        workers: int = SHADOW_WORKERS,
+        max_pending: int = SHADOW_MAX_PENDING
+    ):
+        """
+        Args:
+            prediction_service: PredictionService (inferência e histogramas de latência)
+            version: Versão registrada avaliada em sombra (vazio = desligado)
+            sample_rate: Fração das predições escoradas também na sombra (0..1)
+            workers: Threads do executor de sombra
+            max_pending: Escores pendentes acima dos quais novas amostras são descartadas
+        """
+        self.prediction_service = prediction_service
+        self.max_pending = max(1, int(max_pending))
+        self.pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="shadow")
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        # Escores enfileirados e ainda não concluídos
+        self.pending = 0
+        self.configure(version, sample_rate)
+    
+    def configure(self, version: Optional[str], sample_rate: Optional[float] = None):
+        """
+        Troca a versão em sombra e/ou a taxa de amostragem, zerando os contadores
+        
+        Args:
+            version: Versão registrada (vazio/None = desligado)
+            sample_rate: Fração amostrada (None = mantém a atual)
+        """
+        with self._lock:
+            self.version = version or None
+            if sample_rate is not None:
+                self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+            self.sampled = 0
+            self.dropped = 0
+            self.compared = 0
+            self.agreed = 0
+            self.errors = 0
+            self.risk_abs_diff = 0.0
+            # Predição servida -> predição da sombra -> contagem
+            self.transitions: Dict[str, Dict[str, int]] = {}
+    
+    def maybe_score(self, prepared, probs) -> bool:
+        """
+        Agenda o escore em sombra de uma requisição já respondida (amostrada)
+        
+        Chamado após a inferência da versão servida; só enfileira a tarefa.
+        
+        Args:
+            prepared: PreparedRequest da requisição (vetor de features e snapshot)
+            probs: Probabilidades da versão servida
+        
+        Returns:
+            True se a requisição foi enviada à sombra
+        """
+        version = self.version
+        if (
+            version is None
+            or probs is None
+            or prepared.row is None
+            or self._random.random() >= self.sample_rate
+        ):
+            return False
+        
+        try:
+            shadow = self.prediction_service.model_service.get_version(version)
+        except KeyError:
+            return False
+        if shadow is prepared.artifact:
+            return False
+        
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.dropped += 1
+                return False
+            self.pending += 1
+            self.sampled += 1
+        try:
+            self.pool.submit(self._score, prepared, np.asarray(probs), shadow)
+        except RuntimeError:
+            # Executor encerrado (shutdown)
+            with self._lock:
+                self.pending -= 1
+            return False
+        return True
+    
+    def _score(self, prepared, probs: np.ndarray, shadow):
+        """
+        Escora a requisição na sombra e compara com a predição servida
+        """
+        ps = self.prediction_service
+        try:
+            t0 = time.perf_counter()
+            shadow_probs, shadow_idx = ps.make_prediction_row(prepared.row, prepared.needs_impute, shadow)
+            ps.observe_latency(shadow.version, time.perf_counter() - t0)
+            
+            served = self.label(prepared.artifact, int(np.argmax(probs)))
+            candidate = self.label(shadow, shadow_idx)
+            risk_diff = abs(
+                ps.calculate_risk_score(probs, prepared.artifact)
+                - ps.calculate_risk_score(shadow_probs, shadow)
+            )
+            with self._lock:
+                self.compared += 1
+                self.agreed += served == candidate
+                self.risk_abs_diff += risk_diff
+                row = self.transitions.setdefault(served, {})
+                row[candidate] = row.get(candidate, 0) + 1
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning(f"Shadow scoring failed ({shadow.version}): {e}")
+        finally:
+            with self._lock:
+                self.pending -= 1
+    
+    @staticmethod
+    def label(artifact, idx) -> str:
+        """
+        Label da classe predita (compara versões por label, não por índice)
+        """
+        labels = artifact.class_labels
+        if idx is None:
+            return "unknown"
+        if labels is not None and idx < len(labels):
+            return str(labels[idx])
+        return str(idx)
+    
+    def shutdown(self):
+        """
+        Encerra o executor sem aguardar escores pendentes
+        """
+        self.pool.shutdown(wait=False, cancel_futures=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contadores da avaliação em sombra (expostos em /health e /admin/models)
+        """
+        if self.version is None:
+            return {"enabled": False}
+        compared = self.compared
+        return {
+            "enabled": True,
+            "version": self.version,
+            "sample_rate": self.sample_rate,
+            "sampled": self.sampled,
+            "pending": self.pending,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "compared": compared,
+            "agreed": self.agreed,
+            "agreement_rate": round(self.agreed / compared, 4) if compared else None,
+            "mean_risk_abs_diff": round(self.risk_abs_diff / compared, 4) if compared else None,
+            "transitions": {k: dict(v) for k, v in self.transitions.items()}
+        }
@@ -0,0 +1,145 @@
+# services/startup_service.py
+"""
+Carga dos serviços no startup sem bloquear o processo
+
+O app sobe e responde ao /health (liveness) antes de o modelo, a base e os
+índices estarem carregados: a carga roda em uma thread e só depois os
+serviços são publicados em `app.state`. Até lá as demais rotas respondem
+503 (ReadinessMiddleware) e /health/ready indica que o app ainda não está
+pronto para receber tráfego.
+
+Não importa pandas, NumPy, joblib nem XGBoost: os imports pesados ficam
+dentro da função de carga.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.config import logger
+from app.utils.json_response import FastJSONResponse
+
+# Rotas que respondem antes da carga (liveness, página inicial e documentação)
+ALWAYS_AVAILABLE = ("/health", "/static", "/docs", "/redoc", "/openapi.json")
+
+
+class ServiceLoader:
+    """
+    Executa a carga dos serviços (em thread ou bloqueante) e expõe o estado
+    """
+    
+    def __init__(self):
+        self.ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.load_ms: Optional[float] = None
+    
+    def start(self, load: Callable[[], None], background: bool = True):
+        """
+        Inicia a carga dos serviços
+        
+        Args:
+            load: Função que cria os serviços e os publica no app
+            background: Carrega em thread (True) ou bloqueia até terminar (False)
+        
+        Raises:
+            Exception: Erro da carga, somente quando background=False
+        """
+        self.join()
+        self.ready.clear()
+        self.error = None
+        self.load_ms = None
+        self.started_at = time.perf_counter()
+        if not background:
+            self._run(load, raise_errors=True)
+            return
+        self._thread = threading.Thread(
+            target=self._run, args=(load,), name="service-loader", daemon=True
+        )
+        self._thread.start()
+    
+    def _run(self, load: Callable[[], None], raise_errors: bool = False):
+        try:
+            load()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logger.exception("Service initialization failed")
+            if raise_errors:
+                raise
+            return
+        self.load_ms = (time.perf_counter() - self.started_at) * 1000
+        self.ready.set()
+        logger.info(f"Services ready in {self.load_ms:.0f} ms")
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda a carga terminar
+        
+        Args:
+            timeout: Espera máxima em segundos (None = sem limite)
+        
+        Returns:
+            True se os serviços estão prontos
+        """
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.ready.is_set()
+    
+    def join(self):
+        """
+        Aguarda uma carga em andamento (usado no shutdown e antes de recarregar)
+        """
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    @property
+    def status(self) -> str:
+        """
+        "starting", "ready" ou "failed"
+        """
+        if self.ready.is_set():
+            return "ready"
+        return "failed" if self.error is not None else "starting"
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Estado da carga (exposto em /health e /health/ready)
+        """
+        elapsed = self.load_ms
+        if elapsed is None and self.started_at is not None:
+            elapsed = (time.perf_counter() - self.started_at) * 1000
+        return {
+            "status": self.status,
+            "elapsed_ms": round(elapsed, 1) if elapsed is not None else None,
+            "error": self.error
+        }
+
+
+class ReadinessMiddleware:
+    """
+    Middleware ASGI: responde 503 nas rotas que dependem dos serviços
+    enquanto a carga não termina
+    """
+    
+    def __init__(self, app, loader: ServiceLoader, retry_after: int = 5):
+        self.app = app
+        self.loader = loader
+        self.retry_after = str(retry_after)
+    
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] == "http"
+            and not self.loader.ready.is_set()
+            and scope["path"] != "/"
+            and not scope["path"].startswith(ALWAYS_AVAILABLE)
+        ):
+            response = FastJSONResponse(
+                status_code=503,
+                content={"detail": "Service is starting", "startup": self.loader.stats()},
+                headers={"Retry-After": self.retry_after}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -2,65 +2,180 @@
 """
 Serviço para operações relacionadas a estudantes
 """
+from typing import Any, Dict, List
+
+import numpy as np
 from fastapi import HTTPException
-from app.utils.helpers import sanitize_for_json
+from app.config import FUZZY_MIN_SIMILARITY, STUDENT_WORKERS
+from app.utils.executor import BoundedExecutor
 
 
 class StudentService:
     """Gerencia operações de busca e consulta de estudantes"""
     
-    def __init__(self, model_service):
+    def __init__(self, model_service, workers: int = STUDENT_WORKERS):
         self.model_service = model_service
+        # Consultas (pandas/NumPy) rodam neste pool, fora do event loop
+        self.executor = BoundedExecutor(workers, "students")
     
-    def search_student_by_name(self, name: str):
+    def find_matches(self, name: str, df=None, index=None) -> np.ndarray:
         """
-        Busca estudante por nome e retorna histórico
+        Localiza as linhas de df_base do estudante (match exato, depois parcial)
+        
+        A busca é literal (o nome não é interpretado como regex), insensível a
+        maiúsculas e acentos, e resolvida pelo índice de nomes construído no
+        carregamento, sem varrer a coluna NOME.
         
         Args:
             name: Nome do estudante (busca exata ou parcial)
+            df: Base consultada (None = df_base atual); com `index`, permite
+                buscar em um snapshot já capturado (ex.: tabela de risco)
+            index: Índice de nomes de `df` (None = name_index atual)
             
         Returns:
-            Dicionário com nome e histórico do estudante
+            Array com as posições das linhas encontradas (ordem da base)
             
         Raises:
             HTTPException: Se dados não disponíveis ou estudante não encontrado
         """
-        df = self.model_service.df_base
+        if df is None:
+            df, index = self.model_service.df_base, self.model_service.name_index
         
         if df is None:
             raise HTTPException(status_code=503, detail="Data not available")
         
-        if "NOME" not in df.columns:
+        if index is None:
             raise HTTPException(
                 status_code=404, 
                 detail="Student name column 'NOME' not available"
             )
         
-        # Tentar match exato primeiro
-        matches = df[df["NOME"].str.fullmatch(name, case=False, na=False)]
+        positions = index.lookup(name)
+        if len(positions) == 0:
+            raise HTTPException(status_code=404, detail="Student not found")
+        
+        return positions
+    
+    def fuzzy_search(self, query: str, k: int = 10):
+        """
+        Busca aproximada de estudantes (tolerante a erros de digitação e acentos)
         
-        # Se não encontrar, tentar busca parcial
-        if matches.empty:
-            matches = df[df["NOME"].str.contains(name, case=False, na=False)]
-            if matches.empty:
-                raise HTTPException(status_code=404, detail="Student not found")
+        Args:
+            query: Texto digitado (ex.: "joao" para "João")
+            k: Quantidade máxima de candidatos
+            
+        Returns:
+            Dicionário com a consulta e candidatos ranqueados por similaridade
+            
+        Raises:
+            HTTPException: Se dados não disponíveis
+        """
+        if self.model_service.df_base is None:
+            raise HTTPException(status_code=503, detail="Data not available")
+        
+        index = self.model_service.name_index
+        if index is None:
+            raise HTTPException(
+                status_code=404, 
+                detail="Student name column 'NOME' not available"
+            )
+        
+        results = []
+        for key_id, score in index.search_fuzzy(query, k=k, min_score=FUZZY_MIN_SIMILARITY):
+            results.append({
+                "nome": index.display_names[key_id],
+                "score": round(score, 4),
+                "registros": int(len(index.exact[index.keys[key_id]]))
+            })
+        
+        return {"query": query, "count": len(results), "results": results}
+    
+    def search_student_by_name(self, name: str):
+        """
+        Busca estudante por nome e retorna histórico
+        
+        O histórico sai direto dos arrays pré-agrupados por estudante
+        (ordenados por ANO, NaN já mapeado para null), sem percorrer a base.
+        
+        Args:
+            name: Nome do estudante (busca exata ou parcial)
+            
+        Returns:
+            Dicionário com nome e histórico do estudante
+            
+        Raises:
+            HTTPException: Se dados não disponíveis ou estudante não encontrado
+        """
+        if self.model_service.df_base is None:
+            raise HTTPException(status_code=503, detail="Data not available")
         
-        first_match = matches.iloc[0]
+        index = self.model_service.name_index
+        histories = self.model_service.student_histories
+        if index is None or histories is None:
+            raise HTTPException(
+                status_code=404, 
+                detail="Student name column 'NOME' not available"
+            )
         
-        # Campos esperados pelo frontend
-        fields_to_return = [
-            'ANO', 'FASE', 'IAN', 'IDA', 'IEG', 'IAA', 
-            'IPS', 'IPP', 'IPV', 'DEFA'
-        ]
+        key_ids = index.lookup_keys(name)
+        if len(key_ids) == 0:
+            raise HTTPException(status_code=404, detail="Student not found")
         
         historico = []
-        for _, row in matches.iterrows():
-            item = {}
-            for f in fields_to_return:
-                item[f] = row.get(f)
-            historico.append(item)
-        
-        return sanitize_for_json({
-            "nome": first_match.get("NOME"),
+        for key_id in key_ids:
+            historico.extend(histories.history(key_id))
+        
+        return {
+            "nome": index.display_names[key_ids[0]],
             "historico": historico
-        })
+        }
+    
+    def lookup_students(self, names: List[str]) -> Dict[str, Any]:
+        """
+        Consulta em lote: históricos de vários estudantes em uma resposta
+        
+        Cada nome é resolvido por match exato (insensível a maiúsculas e
+        acentos) no índice de nomes; nomes não encontrados são reportados
+        por item, sem falhar a requisição inteira.
+        
+        Args:
+            names: Lista de nomes
+            
+        Returns:
+            Dicionário com um resultado por nome, na ordem de entrada
+            
+        Raises:
+            HTTPException: Se dados não disponíveis
+        """
+        if self.model_service.df_base is None:
+            raise HTTPException(status_code=503, detail="Data not available")
+        
+        index = self.model_service.name_index
+        histories = self.model_service.student_histories
+        if index is None or histories is None:
+            raise HTTPException(
+                status_code=404, 
+                detail="Student name column 'NOME' not available"
+            )
+        
+        results = []
+        not_found = []
+        for name in names:
+            key_id = index.key_id(name)
+            if key_id is None:
+                not_found.append(name)
+                results.append({"query": name, "found": False, "nome": None, "historico": []})
+            else:
+                results.append({
+                    "query": name,
+                    "found": True,
+                    "nome": index.display_names[key_id],
+                    "historico": histories.history(key_id)
+                })
+        
+        return {
+            "count": len(results),
+            "found": len(results) - len(not_found),
+            "not_found": not_found,
+            "results": results
+        }
@@ -0,0 +1,89 @@
+"""
+Cache LRU em memória com expiração opcional (TTL)
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """Cache LRU limitado por tamanho, com TTL opcional e contadores de uso"""
+    
+    def __init__(self, maxsize: int, ttl: float = 0.0):
+        """
+        Args:
+            maxsize: Número máximo de entradas (as menos usadas são removidas)
+            ttl: Tempo de vida de cada entrada em segundos (0 = sem expiração)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Retorna o valor associado à chave (ou None) e o marca como mais recente
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key: Hashable, value: Any):
+        """
+        Armazena o valor, removendo a entrada menos recente se o cache estiver cheio
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """
+        Invalida todas as entradas (ex.: ao recarregar o modelo)
+        """
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contadores de uso do cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
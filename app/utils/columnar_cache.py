@@ -0,0 +1,324 @@
+"""
+Cache colunar da base CSV (um .npy por coluna, memory-mapped)
+
+Na primeira carga o CSV é lido com `pd.read_csv` e cada coluna é gravada em
+um `.npy` com dtype compacto explícito: inteiros no menor tipo que comporta
+os valores e floats em float32 quando a conversão é exata. Nas cargas
+seguintes o array aberto com `np.load(mmap_mode="c")` entra no DataFrame
+nesse dtype compacto, sem cópia nem `astype`: os valores são os do
+`read_csv`, os dtypes numéricos são os compactos (int8/int16/float32...).
+Textos são codificados por dicionário (códigos inteiros no menor tipo +
+categorias em UTF-8); só os códigos são mapeados, e a coluna `str` é
+materializada na carga (um objeto por linha, sem parsing). Um manifesto JSON
+guarda o dtype original e o armazenado de cada coluna e a impressão digital
+do CSV (tamanho, mtime e SHA-256).
+
+O cache é reconstruído quando o CSV muda: tamanho ou mtime diferentes
+levam à comparação do SHA-256 (mesmo conteúdo só atualiza o manifesto).
+
+Uso (pré-constrói o cache, p.ex. no build da imagem):
+    python -m app.utils.columnar_cache [--csv data/df_Base_final.csv]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.config import logger, DEFAULT_CSV, DATA_CACHE_DIR
+from app.utils.tree_ensemble import file_sha256
+
+# Versão do layout do cache (mudanças invalidam caches antigos)
+CACHE_FORMAT = 3
+MANIFEST = "manifest.json"
+# Separador das categorias de texto no arquivo UTF-8 (textos com ele não são cacheados)
+CATEGORY_SEP = "\x00"
+
+
+def data_cache_dir(csv_path, cache_root: str = None) -> pathlib.Path:
+    """
+    Diretório do cache do CSV (<cache_root>/<csv>; padrão: .cache/ ao lado do CSV)
+    """
+    csv_path = pathlib.Path(csv_path)
+    root = pathlib.Path(cache_root) if cache_root else csv_path.parent / ".cache"
+    return root / csv_path.stem
+
+
+def _stat(csv_path) -> Dict[str, int]:
+    st = os.stat(csv_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _smallest_int(low: int, high: int) -> np.dtype:
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _compact(values: np.ndarray) -> np.ndarray:
+    """
+    Menor dtype que reproduz os valores exatamente ao voltar ao original
+    """
+    if values.dtype.kind in "iu" and len(values):
+        return values.astype(_smallest_int(int(values.min()), int(values.max())))
+    if values.dtype == np.float64:
+        narrow = values.astype(np.float32)
+        if np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+            return narrow
+    return values
+
+
+def _encode_column(series: pd.Series, prefix: str, out_dir: pathlib.Path) -> Dict[str, Any]:
+    """
+    Grava uma coluna e devolve sua entrada no manifesto
+    
+    Raises:
+        ValueError: Se o dtype da coluna não é suportado
+    """
+    entry = {"name": series.name, "dtype": str(series.dtype)}
+    if series.dtype.kind in "iufb":
+        values = np.ascontiguousarray(_compact(series.to_numpy()))
+        np.save(out_dir / f"{prefix}.npy", values)
+        entry.update(encoding="plain", file=f"{prefix}.npy", stored=str(values.dtype))
+        return entry
+    
+    if not (pd.api.types.is_string_dtype(series.dtype) or series.dtype == object):
+        raise ValueError(f"Unsupported dtype for column {series.name!r}: {series.dtype}")
+    codes, categories = pd.factorize(series, use_na_sentinel=True)
+    categories = np.asarray(categories, dtype=object)
+    if not all(isinstance(v, str) and CATEGORY_SEP not in v for v in categories):
+        raise ValueError(f"Column {series.name!r} mixes text and non-text values")
+    codes = codes.astype(_smallest_int(-1, max(len(categories) - 1, 0)))
+    np.save(out_dir / f"{prefix}.codes.npy", codes)
+    (out_dir / f"{prefix}.categories.bin").write_bytes(CATEGORY_SEP.join(categories).encode("utf-8"))
+    entry.update(
+        encoding="dictionary",
+        codes=f"{prefix}.codes.npy",
+        categories=f"{prefix}.categories.bin",
+        n_categories=len(categories),
+        stored=str(codes.dtype)
+    )
+    return entry
+
+
+def _decode_column(entry: Dict[str, Any], cache_dir: pathlib.Path, rows: int):
+    """
+    Abre uma coluna do cache
+    
+    Numéricas: o próprio array memory-mapped no dtype compacto armazenado
+    (sem cópia). Texto: códigos mapeados e coluna `str` (dtype original)
+    materializada a partir das categorias.
+    """
+    dtype = pd.api.types.pandas_dtype(entry["dtype"])
+    if entry["encoding"] == "plain":
+        values = np.load(cache_dir / entry["file"], mmap_mode="c")
+        if len(values) != rows:
+            raise ValueError(f"Column {entry['name']!r} has {len(values)} rows, expected {rows}")
+        if values.dtype != np.dtype(entry["stored"]):
+            raise ValueError(f"Column {entry['name']!r} is stored as {values.dtype}, expected {entry['stored']}")
+        # View ndarray do mesmo buffer (o DataFrame não carrega a subclasse np.memmap)
+        return values.view(np.ndarray)
+    
+    codes = np.load(cache_dir / entry["codes"], mmap_mode="c")
+    if len(codes) != rows:
+        raise ValueError(f"Column {entry['name']!r} has {len(codes)} rows, expected {rows}")
+    text = (cache_dir / entry["categories"]).read_bytes().decode("utf-8")
+    categories = text.split(CATEGORY_SEP) if entry["n_categories"] else []
+    if len(categories) != entry["n_categories"]:
+        raise ValueError(f"Column {entry['name']!r} has a corrupted category table")
+    # Sentinela -1 (ausente) aponta para o NaN acrescentado ao fim das categorias
+    values = np.array(categories + [np.nan], dtype=object).take(codes)
+    return pd.array(values, dtype=dtype)
+
+
+def write_data_cache(df: pd.DataFrame, cache_dir, source: Dict[str, Any]) -> pathlib.Path:
+    """
+    Grava o cache colunar do DataFrame (substitui o anterior por inteiro)
+    
+    As colunas e o manifesto são gravados em um diretório temporário que
+    depois toma o lugar do cache: leitores nunca veem um cache parcial.
+    
+    Args:
+        df: DataFrame lido do CSV
+        cache_dir: Diretório do cache
+        source: Impressão digital do CSV (file, size, mtime_ns, sha256)
+    
+    Returns:
+        Diretório do cache
+    
+    Raises:
+        ValueError: Se alguma coluna tem dtype não suportado
+        OSError: Se o diretório não pode ser gravado
+    """
+    cache_dir = pathlib.Path(cache_dir)
+    cache_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix=f".{cache_dir.name}.", dir=cache_dir.parent))
+    try:
+        columns = [
+            _encode_column(df[name], f"c{i:03d}", tmp) for i, name in enumerate(df.columns)
+        ]
+        manifest = {"format": CACHE_FORMAT, "source": source, "rows": len(df), "columns": columns}
+        (tmp / MANIFEST).write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+        
+        if cache_dir.exists():
+            stale = cache_dir.with_name(tmp.name + ".old")
+            os.replace(cache_dir, stale)
+            os.replace(tmp, cache_dir)
+            shutil.rmtree(stale, ignore_errors=True)
+        else:
+            os.replace(tmp, cache_dir)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return cache_dir
+
+
+def _read_manifest(cache_dir: pathlib.Path) -> Optional[Dict[str, Any]]:
+    try:
+        manifest = json.loads((cache_dir / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("format") == CACHE_FORMAT else None
+
+
+def _is_fresh(manifest: Dict[str, Any], csv_path, cache_dir: pathlib.Path) -> bool:
+    """
+    Confere se o cache corresponde ao CSV atual
+    
+    Tamanho e mtime iguais bastam; se diferem, o SHA-256 decide (mesmo
+    conteúdo com outro mtime, p.ex. após uma cópia, só atualiza o manifesto).
+    """
+    source = manifest.get("source", {})
+    stat = _stat(csv_path)
+    if source.get("size") == stat["size"] and source.get("mtime_ns") == stat["mtime_ns"]:
+        return True
+    if source.get("size") != stat["size"]:
+        return False
+    if file_sha256(csv_path) != source.get("sha256"):
+        return False
+    manifest["source"] = {**source, **stat}
+    try:
+        tmp = cache_dir / (MANIFEST + ".tmp")
+        tmp.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, cache_dir / MANIFEST)
+    except OSError as e:
+        logger.warning(f"Could not update data cache manifest: {e}")
+    return True
+
+
+def csv_fingerprint(csv_path, cache_dir=None) -> Dict[str, Any]:
+    """
+    Impressão digital do CSV (file, size, mtime_ns, sha256), a mesma do manifesto do cache
+    
+    Reaproveita o SHA-256 do manifesto quando tamanho e mtime conferem; caso
+    contrário lê o arquivo.
+    
+    Args:
+        csv_path: Caminho do CSV
+        cache_dir: Diretório do cache (padrão: data_cache_dir(csv_path, DATA_CACHE_DIR))
+    
+    Returns:
+        Dicionário com file, size, mtime_ns e sha256
+    """
+    stat = _stat(csv_path)
+    manifest = _read_manifest(pathlib.Path(cache_dir or data_cache_dir(csv_path, DATA_CACHE_DIR)))
+    source = (manifest or {}).get("source", {})
+    fresh = source.get("size") == stat["size"] and source.get("mtime_ns") == stat["mtime_ns"]
+    return {
+        "file": os.path.basename(csv_path),
+        **stat,
+        "sha256": source.get("sha256") if fresh and source.get("sha256") else file_sha256(csv_path)
+    }
+
+
+def load_data_cache(csv_path, cache_dir) -> Optional[pd.DataFrame]:
+    """
+    Abre o cache do CSV se existe e está atualizado
+    
+    Args:
+        csv_path: Caminho do CSV de origem
+        cache_dir: Diretório do cache
+    
+    Returns:
+        DataFrame com as colunas numéricas memory-mapped (dtypes compactos),
+        ou None (ausente, desatualizado ou inválido)
+    """
+    cache_dir = pathlib.Path(cache_dir)
+    manifest = _read_manifest(cache_dir)
+    if manifest is None:
+        return None
+    try:
+        if not _is_fresh(manifest, csv_path, cache_dir):
+            logger.info(f"Data cache is stale ({csv_path} changed); rebuilding")
+            return None
+        rows = manifest["rows"]
+        columns = {
+            entry["name"]: _decode_column(entry, cache_dir, rows) for entry in manifest["columns"]
+        }
+        return pd.DataFrame(columns, copy=False)
+    except Exception as e:
+        logger.warning(f"Data cache at {cache_dir} is unreadable ({e}); rebuilding")
+        return None
+
+
+def read_csv_cached(csv_path, cache_dir=None) -> pd.DataFrame:
+    """
+    Lê o CSV pelo cache colunar, construindo-o quando ausente ou desatualizado
+    
+    Logo após gravar o cache o DataFrame é aberto a partir dele (mesmos
+    dtypes compactos de todas as cargas). Falhas ao gravar o cache (diretório
+    somente leitura, dtype não suportado) só são registradas no log: o
+    DataFrame do CSV é devolvido do mesmo jeito.
+    
+    Args:
+        csv_path: Caminho do CSV
+        cache_dir: Diretório do cache (padrão: data_cache_dir(csv_path, DATA_CACHE_DIR))
+    
+    Returns:
+        DataFrame com os valores de `pd.read_csv(csv_path)` (dtypes numéricos
+        compactos quando vem do cache)
+    """
+    cache_dir = pathlib.Path(cache_dir or data_cache_dir(csv_path, DATA_CACHE_DIR))
+    df = load_data_cache(csv_path, cache_dir)
+    if df is not None:
+        logger.info(f"Loaded data cache: {cache_dir}")
+        return df
+    
+    # Hash e parsing sobre os mesmos bytes (o CSV pode mudar durante a leitura)
+    stat = _stat(csv_path)
+    raw = pathlib.Path(csv_path).read_bytes()
+    df = pd.read_csv(io.BytesIO(raw))
+    source = {
+        "file": os.path.basename(csv_path),
+        **stat,
+        "sha256": hashlib.sha256(raw).hexdigest()
+    }
+    try:
+        write_data_cache(df, cache_dir, source)
+        logger.info(f"Wrote data cache: {cache_dir}")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not write data cache at {cache_dir}: {e}")
+        return df
+    cached = load_data_cache(csv_path, cache_dir)
+    return cached if cached is not None else df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Constrói o cache colunar da base CSV")
+    parser.add_argument("--csv", default=os.environ.get("DF_CSV_PATH", str(DEFAULT_CSV)))
+    args = parser.parse_args(argv)
+    
+    df = read_csv_cached(args.csv)
+    logger.info(f"Data cache ready for {args.csv} shape={df.shape}")
+
+
+if __name__ == "__main__":
+    main()
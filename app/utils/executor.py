@@ -0,0 +1,64 @@
+"""
+Executor dedicado e limitado para trabalho CPU-bound (modelo, pandas, NumPy)
+fora do event loop
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class BoundedExecutor:
+    """
+    Pool de threads de tamanho fixo usado pelas rotas async
+    
+    Isola a inferência do threadpool padrão do Starlette (usado por arquivos
+    estáticos e rotas sync), de modo que endpoints leves nunca fiquem na fila
+    atrás de predições.
+    """
+    
+    def __init__(self, max_workers: int, name: str):
+        """
+        Args:
+            max_workers: Número máximo de threads (mínimo 1)
+            name: Prefixo do nome das threads (aparece em logs/profilers)
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.name = name
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        # Contadores atualizados apenas no event loop
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+    
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Executa fn(*args, **kwargs) no pool e aguarda o resultado
+        """
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        if self.in_flight > self.max_in_flight:
+            self.max_in_flight = self.in_flight
+        try:
+            return await loop.run_in_executor(self.pool, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+    
+    def shutdown(self):
+        """
+        Encerra o pool sem aguardar tarefas pendentes
+        """
+        self.pool.shutdown(wait=False, cancel_futures=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Ocupação do executor (exposto em /health)
+        """
+        return {
+            "workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.max_workers),
+            "max_in_flight": self.max_in_flight,
+            "completed": self.completed
+        }
@@ -2,6 +2,7 @@
 """
 Funções auxiliares reutilizáveis
 """
+import unicodedata
 import numpy as np
 from typing import Dict, Any, List
 
@@ -23,13 +24,28 @@ def sanitize_for_json(obj):
     return obj
 
 
+def normalize_text(text: str) -> str:
+    """
+    Normaliza texto para comparação: remove acentos, casefold e espaços extras
+    
+    Args:
+        text: Texto original (ex.: nome do estudante)
+    
+    Returns:
+        Texto normalizado ("  João  Silva" -> "joao silva")
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
 def risk_tier_from_score(p: float) -> str:
     """
     Classifica o nível de risco baseado no score de probabilidade
     
     Args:
         p: Score de risco (0-1)
-        
+    
     Returns:
         Classificação do risco: Crítico, Alto, Moderado ou Baixo
     """
@@ -42,6 +58,59 @@ def risk_tier_from_score(p: float) -> str:
     return "Baixo"
 
 
+RISK_TIER_BINS = np.array([0.25, 0.50, 0.75])
+RISK_TIER_LABELS = np.array(["Baixo", "Moderado", "Alto", "Crítico"], dtype=object)
+
+
+def risk_tiers_from_scores(scores: np.ndarray) -> np.ndarray:
+    """
+    Versão vetorizada de risk_tier_from_score para um lote de scores
+    
+    Args:
+        scores: Array de scores de risco (0-1)
+    
+    Returns:
+        Array com a classificação de risco de cada score
+    """
+    return RISK_TIER_LABELS[np.digitize(scores, RISK_TIER_BINS)]
+
+
+def _driver_arrays(features: List[str], app_state):
+    """
+    Importâncias, medianas e desvios alinhados a `features`
+    
+    Usa o artefato pré-compilado do modelo quando as features coincidem;
+    caso contrário monta os arrays a partir do estado da aplicação.
+    `app_state` pode ser o próprio ModelArtifact (snapshot da requisição).
+    """
+    artifact = app_state if hasattr(app_state, "impute_values") else getattr(app_state, "artifact", None)
+    if artifact is not None and tuple(features) == artifact.features:
+        return artifact.importances, artifact.medians, artifact.stds
+    
+    n_feats = len(features)
+    importances = np.ones(n_feats)
+    try:
+        clf = app_state.model_pipeline
+        feats_model = getattr(app_state, "features_list", None)
+        if hasattr(clf, "feature_importances_") and feats_model:
+            imp_map = dict(zip(feats_model, clf.feature_importances_))
+            importances = np.array([float(imp_map.get(f, 0.0)) for f in features])
+    except Exception:
+        importances = np.ones(n_feats)
+    
+    med = getattr(app_state, "feature_medians", None)
+    std = getattr(app_state, "feature_stds", None)
+    center = np.zeros(n_feats)
+    scale = np.ones(n_feats)
+    if med is not None and std is not None:
+        for j, f in enumerate(features):
+            if f in med.index:
+                center[j] = float(med.loc[f])
+                scale[j] = float(std.loc[f])
+    
+    return importances, center, scale
+
+
 def estimate_top_drivers(x_row: Dict[str, Any], features: List[str], app_state) -> List[Dict]:
     """
     Estima os principais fatores (drivers) que contribuem para a predição
@@ -50,50 +119,97 @@ def estimate_top_drivers(x_row: Dict[str, Any], features: List[str], app_state)
         x_row: Dicionário com os valores das features
         features: Lista de nomes das features
         app_state: Estado da aplicação com modelo e estatísticas
-        
+    
     Returns:
         Lista com os top 2 drivers e suas contribuições
     """
-    contributions = []
-    importances = None
+    X = np.array([[x_row.get(f, None) for f in features]], dtype=float)
+    return estimate_top_drivers_batch(X, features, app_state)[0]
+
+
+def estimate_top_drivers_batch(X: np.ndarray, features: List[str], app_state, k: int = 2) -> List[List[Dict]]:
+    """
+    Versão vetorizada de estimate_top_drivers para uma matriz de features
     
-    # Tentar obter importâncias das features do modelo
-    try:
-        clf = app_state.model_pipeline
-        if hasattr(clf, "feature_importances_") and getattr(app_state, "features_list", None):
-            importances = dict(zip(app_state.features_list, clf.feature_importances_))
-    except Exception:
-        importances = None
+    Score de cada feature = |z| × importância, com z relativo à mediana/desvio
+    da base; features ausentes (NaN) são ignoradas.
     
-    med = getattr(app_state, "feature_medians", None)
-    std = getattr(app_state, "feature_stds", None)
+    Args:
+        X: Matriz (n_amostras, n_features) na ordem de `features` (NaN = ausente)
+        features: Lista de nomes das features
+        app_state: Estado da aplicação com modelo e estatísticas
+        k: Quantidade de drivers por linha
+    
+    Returns:
+        Lista (uma por linha) com os top k drivers e suas contribuições
+    """
+    importances, center, scale = _driver_arrays(features, app_state)
+    
+    with np.errstate(invalid="ignore", divide="ignore"):
+        Z = (X - center) / scale
+    scores = np.abs(Z) * importances
+    
+    return _rank_drivers(scores, ~np.isnan(X), Z, importances, features, k)
+
+
+def drivers_from_contributions(
+    contributions: np.ndarray,
+    X: np.ndarray,
+    features: List[str],
+    app_state,
+    k: int = 2
+) -> List[List[Dict]]:
+    """
+    Top drivers a partir das contribuições exatas (TreeSHAP) da classe predita
+    
+    Score de cada feature = |contribuição|; o sinal fica em `contribution`
+    (positivo = empurra para a classe predita). Mantém `z` e `importance` no
+    mesmo formato de estimate_top_drivers_batch; features ausentes (NaN na
+    entrada) são ignoradas.
+    
+    Args:
+        contributions: Matriz (n_amostras, n_features) na escala da margem
+        X: Matriz (n_amostras, n_features) como recebida (NaN = ausente)
+        features: Lista de nomes das features
+        app_state: Estado da aplicação com modelo e estatísticas
+        k: Quantidade de drivers por linha
+    
+    Returns:
+        Lista (uma por linha) com os top k drivers e suas contribuições
+    """
+    importances, center, scale = _driver_arrays(features, app_state)
+    
+    with np.errstate(invalid="ignore", divide="ignore"):
+        Z = (X - center) / scale
+    
+    return _rank_drivers(
+        np.abs(contributions), ~np.isnan(X), Z, importances, features, k, contributions
+    )
+
+
+def _rank_drivers(scores, present, Z, importances, features, k, contributions=None):
+    """
+    Ordena as features por score (desc.) e monta os dicionários de drivers
+    """
+    # Ordenação estável descendente (mesmo desempate do sort do Python)
+    ranked = np.where(present, -scores, np.inf)
+    order = np.argsort(ranked, axis=1, kind="stable")[:, :k]
+    
+    top_all = []
+    for i, row in enumerate(order):
+        top = []
+        for j in row:
+            if not present[i, j]:
+                break
+            driver = {
+                "feature": features[j],
+                "score": round(float(scores[i, j]), 6),
+                "z": round(float(Z[i, j]), 3),
+                "importance": round(float(importances[j]), 6)
+            }
+            if contributions is not None:
+                driver["contribution"] = round(float(contributions[i, j]), 6)
+            top.append(driver)
+        top_all.append(top)
     
-    for f in features:
-        val = x_row.get(f, None)
-        if val is None or (isinstance(val, float) and np.isnan(val)):
-            continue
-        
-        try:
-            if med is not None and std is not None and f in med.index:
-                z = (float(val) - float(med.loc[f])) / float(std.loc[f])
-            else:
-                z = float(val)
-        except Exception:
-            z = 0.0
-        
-        imp = importances.get(f, 0.0) if importances else 1.0
-        score = abs(z) * float(imp)
-        contributions.append((f, float(score), float(z), float(imp)))
-    
-    contributions.sort(key=lambda x: x[1], reverse=True)
-    
-    top = []
-    for f, score, z, imp in contributions[:2]:
-        top.append({
-            "feature": f,
-            "score": round(score, 6),
-            "z": round(z, 3),
-            "importance": round(float(imp), 6)
-        })
-    
-    return top
+    return top_all
@@ -0,0 +1,71 @@
+"""
+Resposta JSON rápida usada por todas as rotas
+
+Serializa o conteúdo em uma única passada nativa com orjson: escalares e
+arrays NumPy são aceitos direto e NaN/Inf viram null, sem a cópia recursiva
+de `sanitize_for_json` nem o `jsonable_encoder` do FastAPI (as rotas
+devolvem a resposta pronta, que o FastAPI não reprocessa). Sem orjson
+instalado, cai para o json da stdlib sobre o conteúdo sanitizado.
+
+Importado por todas as rotas, não importa NumPy no nível do módulo: só
+chega aqui objeto NumPy depois que os serviços o importaram.
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+_ORJSON_OPTIONS = (
+    orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+)
+
+
+def _default(obj: Any) -> Any:
+    """
+    Tipos que o serializador nativo não cobre (arrays não contíguos, escalares NumPy)
+    """
+    import numpy as np
+    from app.utils.helpers import sanitize_for_json
+    
+    if isinstance(obj, np.ndarray):
+        return sanitize_for_json(obj.tolist())
+    if isinstance(obj, np.generic):
+        return sanitize_for_json(obj.item())
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serializa para JSON (UTF-8, compacto) com NaN/Inf como null
+    
+    Args:
+        content: Dicionários, listas, escalares Python/NumPy e arrays NumPy
+    
+    Returns:
+        Bytes do documento JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+    from app.utils.helpers import sanitize_for_json
+    
+    return json.dumps(
+        sanitize_for_json(content),
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serializada por `dumps` (NumPy nativo, NaN/Inf -> null)"""
+    
+    media_type = "application/json"
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
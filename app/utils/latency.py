@@ -0,0 +1,73 @@
+"""
+Histogramas de latência com faixas fixas (contadores baratos no caminho de
+requisição, percentis estimados pelo limite superior da faixa)
+"""
+import bisect
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+# Limites superiores das faixas, em ms (a última faixa é aberta)
+LATENCY_BUCKETS_MS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0)
+
+
+class LatencyHistogram:
+    """Contagem de observações por faixa de latência"""
+    
+    def __init__(self, buckets_ms: Sequence[float] = LATENCY_BUCKETS_MS):
+        """
+        Args:
+            buckets_ms: Limites superiores das faixas em ms, crescentes
+        """
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, seconds: float):
+        """
+        Registra uma observação
+        
+        Args:
+            seconds: Duração em segundos
+        """
+        ms = seconds * 1000.0
+        i = bisect.bisect_left(self.buckets_ms, ms)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Limite superior da faixa que contém o quantil q (max_ms na faixa aberta)
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.buckets_ms[i] if i < len(self.buckets_ms) else round(self.max_ms, 3)
+        return round(self.max_ms, 3)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contagem, média, percentis estimados e contagem por faixa ("<=limite")
+        """
+        with self._lock:
+            counts = list(self.counts)
+        labels = [f"<={b:g}" for b in self.buckets_ms] + [f">{self.buckets_ms[-1]:g}"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": {label: n for label, n in zip(labels, counts) if n}
+        }
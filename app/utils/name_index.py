@@ -0,0 +1,236 @@
+"""
+Índice de nomes de estudantes para busca literal sem varredura da base
+
+Requer Python >= 3.10 (`bisect` com `key=`).
+"""
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.utils.helpers import normalize_text
+
+# Limite de tamanho da consulta fuzzy (limita o número de trigramas por busca)
+MAX_FUZZY_QUERY_LENGTH = 64
+# Listas de trigramas com menos de 1/DENSE_COUNT_RATIO ids por nome da base são
+# contadas por ordenação (sem o vetor denso de contadores)
+DENSE_COUNT_RATIO = 4
+# Separador dos nomes no texto do suffix array (menor que qualquer caractere)
+KEY_SEP = "\x00"
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Trigramas de um texto já normalizado (cada palavra com padding, estilo pg_trgm)
+    
+    Args:
+        text: Texto normalizado
+        
+    Returns:
+        Conjunto de trigramas ("ana" -> {"  a", " an", "ana", "na "})
+    """
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def suffix_array(codes: np.ndarray) -> np.ndarray:
+    """
+    Suffix array por prefix doubling: a cada rodada as posições são ordenadas
+    pelo par (rank do prefixo de tamanho h, rank dos h caracteres seguintes),
+    empacotado em um único int64, sem materializar os sufixos
+    
+    Args:
+        codes: Códigos (inteiros) dos caracteres do texto
+        
+    Returns:
+        Posições iniciais dos sufixos em ordem lexicográfica (sufixo que é
+        prefixo de outro vem antes)
+    """
+    n = len(codes)
+    _, rank = np.unique(codes, return_inverse=True)
+    rank = rank.astype(np.int64).ravel()
+    h = 1
+    while True:
+        # Rank da segunda metade + 1 (0 além do fim: sufixo mais curto vem antes)
+        second = np.zeros(n, dtype=np.int64)
+        second[:max(n - h, 0)] = rank[h:] + 1
+        key = rank * (n + 1) + second
+        sa = np.argsort(key)
+        key = key[sa]
+        changed = np.empty(n, dtype=np.int64)
+        changed[:1] = 0
+        changed[1:] = key[1:] != key[:-1]
+        rank = np.empty(n, dtype=np.int64)
+        rank[sa] = np.cumsum(changed)
+        # Ranks distintos: ordem final (em O(log do maior prefixo comum) rodadas)
+        if n == 0 or rank[sa[-1]] == n - 1:
+            return sa
+        h *= 2
+
+
+class NameIndex:
+    """
+    Índice construído uma vez a partir da coluna NOME
+    
+    - Match exato: hash map nome normalizado (sem acento, casefold) -> posições
+    - Match parcial: suffix array sobre os nomes normalizados distintos
+      (concatenados com KEY_SEP); cada busca por substring é uma busca
+      binária, O(log S + resultados)
+    - Busca aproximada: índice invertido de trigramas -> ids dos nomes; a
+      similaridade (Jaccard de trigramas) é contada só sobre os ids das
+      listas dos trigramas da consulta
+    
+    As posições retornadas são as posições das linhas na base (ordem original).
+    """
+    
+    def __init__(self, names: Sequence):
+        groups: Dict[str, List[int]] = {}
+        display: Dict[str, str] = {}
+        for pos, name in enumerate(names):
+            if isinstance(name, str):
+                key = normalize_text(name)
+                if key:
+                    groups.setdefault(key, []).append(pos)
+                    display.setdefault(key, name)
+        
+        self.keys = list(groups)
+        self._key_ids = {k: i for i, k in enumerate(self.keys)}
+        # Nome original (primeira ocorrência na base) de cada nome normalizado
+        self.display_names = [display[k] for k in self.keys]
+        self.exact = {k: np.array(v, dtype=np.int64) for k, v in groups.items()}
+        
+        # Suffix array sobre "nome0<SEP>nome1<SEP>...": só sufixos que começam
+        # dentro de um nome; o separador termina a comparação no fim do nome
+        self._text = "".join(key + KEY_SEP for key in self.keys)
+        codes = np.frombuffer(self._text.encode("utf-32-le"), dtype=np.uint32)
+        sa = suffix_array(codes)
+        self._sa = sa[codes[sa] != ord(KEY_SEP)]
+        starts = np.cumsum([0] + [len(key) + 1 for key in self.keys[:-1]], dtype=np.int64)
+        self._sa_ids = np.searchsorted(starts, self._sa, side="right") - 1
+        
+        # Índice invertido de trigramas
+        postings: Dict[str, List[int]] = {}
+        counts = np.zeros(len(self.keys), dtype=np.int64)
+        for key_id, key in enumerate(self.keys):
+            grams = trigrams(key)
+            counts[key_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(key_id)
+        self._trigram_postings = {g: np.array(v, dtype=np.int64) for g, v in postings.items()}
+        self._trigram_counts = counts
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def lookup_exact(self, name: str) -> np.ndarray:
+        """
+        Posições das linhas cujo nome normalizado é igual ao informado
+        """
+        return self.exact.get(normalize_text(name), np.empty(0, dtype=np.int64))
+    
+    def lookup_substring(self, name: str) -> np.ndarray:
+        """
+        Posições (ordenadas) das linhas cujo nome normalizado contém o texto literal
+        """
+        query = normalize_text(name)
+        if not query:
+            return np.empty(0, dtype=np.int64)
+        
+        key_ids = self.matching_key_ids(query)
+        if len(key_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        
+        positions = np.concatenate([self.exact[self.keys[i]] for i in key_ids])
+        positions.sort()
+        return positions
+    
+    def matching_key_ids(self, query: str) -> np.ndarray:
+        """
+        Ids dos nomes distintos que contêm `query` (já normalizada)
+        """
+        text, sa = self._text, self._sa
+        n = len(query)
+        
+        def prefix(i):
+            start = sa[i]
+            return text[start:start + n]
+        
+        lo = bisect_left(range(len(sa)), query, key=prefix)
+        hi = bisect_right(range(len(sa)), query, lo=lo, key=prefix)
+        return np.unique(self._sa_ids[lo:hi])
+    
+    def key_id(self, name: str):
+        """
+        Id do nome distinto igual (após normalização) ao informado, ou None
+        """
+        return self._key_ids.get(normalize_text(name))
+    
+    def lookup_keys(self, name: str) -> np.ndarray:
+        """
+        Ids dos nomes distintos que casam com `name` (exato primeiro, depois
+        parcial), em ordem de primeira aparição na base
+        """
+        query = normalize_text(name)
+        if not query:
+            return np.empty(0, dtype=np.int64)
+        
+        if query in self.exact:
+            return np.array([self._key_ids[query]], dtype=np.int64)
+        return self.matching_key_ids(query)
+    
+    def lookup(self, name: str) -> np.ndarray:
+        """
+        Match exato primeiro; se não houver, match parcial (mesma semântica da busca por nome)
+        """
+        positions = self.lookup_exact(name)
+        if len(positions) == 0:
+            positions = self.lookup_substring(name)
+        return positions
+    
+    def search_fuzzy(self, query: str, k: int = 10, min_score: float = 0.3) -> List[Tuple[int, float]]:
+        """
+        Top-k nomes mais parecidos com a consulta (tolerante a erros e acentos)
+        
+        O custo é limitado à soma das listas dos trigramas da consulta (que
+        tem no máximo MAX_FUZZY_QUERY_LENGTH caracteres), independente do
+        número de nomes da base, mais uma seleção parcial dos k melhores.
+        
+        Args:
+            query: Texto digitado
+            k: Quantidade máxima de candidatos
+            min_score: Similaridade mínima (0-1)
+            
+        Returns:
+            Lista de (id do nome, similaridade) em ordem decrescente
+        """
+        q_grams = trigrams(normalize_text(query)[:MAX_FUZZY_QUERY_LENGTH])
+        lists = [self._trigram_postings[g] for g in q_grams if g in self._trigram_postings]
+        if not lists or k <= 0:
+            return []
+        
+        # Trigramas em comum por candidato (ids em ordem crescente). Listas
+        # curtas: contagem por ordenação, O(m log m) sem depender do número de
+        # nomes; só quando as listas já somam uma fração da base compensa o
+        # bincount denso (O(m + N))
+        ids = np.concatenate(lists)
+        if len(ids) * DENSE_COUNT_RATIO < len(self.keys):
+            candidates, inter = np.unique(ids, return_counts=True)
+        else:
+            shared = np.bincount(ids, minlength=len(self.keys))
+            candidates = np.flatnonzero(shared)
+            inter = shared[candidates]
+        scores = inter / (len(q_grams) + self._trigram_counts[candidates] - inter)
+        
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        
+        # Ordem: maior similaridade, depois ordem de aparição na base
+        order = np.lexsort((candidates, -scores))
+        return [(int(candidates[i]), float(scores[i])) for i in order]
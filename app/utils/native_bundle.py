@@ -0,0 +1,157 @@
+"""
+Bundle do modelo no formato nativo do XGBoost (UBJSON/JSON) + sidecar JSON
+
+O booster é gravado com `save_model` e carregado com `load_model` a partir
+dos bytes do arquivo, sem desserializar o pickle do joblib. O sidecar
+(<modelo>.bundle.json) guarda o que o joblib carregava além do modelo
+(features, mapa de classes, versão, valores do imputer), as estatísticas
+das features da base e os SHA-256 do arquivo do modelo e do joblib de origem.
+As tabelas do TreeSHAP, caras de pré-calcular, vão junto em <modelo>.shap.npz.
+"""
+import hashlib
+import io
+import json
+import os
+import pathlib
+from typing import Any, Dict, Optional, Tuple
+
+from app.utils.tree_shap import TreeShapExplainer
+
+# Extensão do arquivo do modelo por formato
+NATIVE_FORMATS = {"ubj": ".ubj", "json": ".json"}
+
+
+def native_sidecar_path(model_path) -> pathlib.Path:
+    """
+    Caminho padrão do sidecar ao lado do modelo (<modelo>.bundle.json)
+    """
+    path = pathlib.Path(model_path)
+    return path.with_name(path.stem + ".bundle.json")
+
+
+def native_model_path(sidecar_path, fmt: str = "ubj") -> pathlib.Path:
+    """
+    Arquivo do booster descrito pelo sidecar (<modelo>.ubj ou <modelo>.json)
+    """
+    sidecar_path = pathlib.Path(sidecar_path)
+    name = sidecar_path.name
+    stem = name[: -len(".bundle.json")] if name.endswith(".bundle.json") else sidecar_path.stem
+    return sidecar_path.with_name(stem + NATIVE_FORMATS[fmt])
+
+
+def native_shap_path(sidecar_path) -> pathlib.Path:
+    """
+    Arquivo das tabelas do TreeSHAP do bundle (<modelo>.shap.npz)
+    """
+    model_path = native_model_path(sidecar_path)
+    return model_path.with_name(model_path.stem + ".shap.npz")
+
+
+def _write_atomic(path: pathlib.Path, data: bytes):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def write_native_bundle(
+    model,
+    meta: Dict[str, Any],
+    sidecar_path,
+    fmt: str = "ubj",
+    explainer: Optional[TreeShapExplainer] = None
+) -> pathlib.Path:
+    """
+    Grava o modelo no formato nativo e o sidecar com metadados e hashes
+    
+    O sidecar é gravado por último: um bundle só é visível quando completo.
+    
+    Args:
+        model: Estimador XGBoost (sklearn API)
+        meta: Metadados do sidecar (features, mapa de classes, versão, ...)
+        sidecar_path: Caminho do sidecar (<modelo>.bundle.json)
+        fmt: "ubj" (binário, padrão) ou "json"
+        explainer: TreeSHAP do modelo (tabelas gravadas junto, opcional)
+    
+    Returns:
+        Caminho do sidecar gravado
+    
+    Raises:
+        ValueError: Se o formato não é suportado
+    """
+    if fmt not in NATIVE_FORMATS:
+        raise ValueError(f"Unsupported native format: {fmt}")
+    
+    sidecar_path = pathlib.Path(sidecar_path)
+    model_path = native_model_path(sidecar_path, fmt)
+    
+    # save_model (e não Booster.save_raw) preserva os atributos do wrapper sklearn;
+    # o formato segue a extensão do arquivo
+    tmp = model_path.with_name(model_path.stem + ".tmp" + model_path.suffix)
+    model.save_model(str(tmp))
+    raw = tmp.read_bytes()
+    os.replace(tmp, model_path)
+    
+    sidecar = {
+        **meta,
+        "format": fmt,
+        "model_file": model_path.name,
+        "model_sha256": hashlib.sha256(raw).hexdigest()
+    }
+    if explainer is not None:
+        buffer = io.BytesIO()
+        explainer.save(buffer)
+        shap_path = native_shap_path(sidecar_path)
+        _write_atomic(shap_path, buffer.getvalue())
+        sidecar["shap_file"] = shap_path.name
+        sidecar["shap_sha256"] = hashlib.sha256(buffer.getvalue()).hexdigest()
+    
+    _write_atomic(sidecar_path, json.dumps(sidecar, indent=2, ensure_ascii=False).encode("utf-8"))
+    return sidecar_path
+
+
+def read_native_bundle(sidecar_path, verify: bool = True) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Carrega o modelo de um bundle nativo
+    
+    Args:
+        sidecar_path: Caminho do sidecar (<modelo>.bundle.json)
+        verify: Confere o SHA-256 do arquivo do modelo com o do sidecar
+    
+    Returns:
+        Tupla (XGBClassifier, metadados do sidecar)
+    
+    Raises:
+        FileNotFoundError: Se o sidecar ou o arquivo do modelo não existem
+        ValueError: Se o hash do modelo não confere
+    """
+    sidecar_path = pathlib.Path(sidecar_path)
+    meta = json.loads(sidecar_path.read_text(encoding="utf-8"))
+    raw = _read_verified(sidecar_path.with_name(meta["model_file"]), meta.get("model_sha256"), verify)
+    
+    import xgboost as xgb
+    
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(raw))
+    return model, meta
+
+
+def read_native_explainer(sidecar_path, meta: Dict[str, Any], verify: bool = True) -> Optional[TreeShapExplainer]:
+    """
+    Carrega as tabelas do TreeSHAP do bundle (None se o bundle não as tem)
+    
+    Raises:
+        FileNotFoundError: Se o arquivo das tabelas não existe
+        ValueError: Se o hash das tabelas não confere
+    """
+    if not meta.get("shap_file"):
+        return None
+    path = pathlib.Path(sidecar_path).with_name(meta["shap_file"])
+    raw = _read_verified(path, meta.get("shap_sha256"), verify)
+    return TreeShapExplainer.load(io.BytesIO(raw))
+
+
+def _read_verified(path: pathlib.Path, expected: Optional[str], verify: bool) -> bytes:
+    raw = path.read_bytes()
+    if verify and hashlib.sha256(raw).hexdigest() != expected:
+        raise ValueError(f"Hash mismatch for {path}")
+    return raw
@@ -0,0 +1,58 @@
+"""
+Históricos de estudantes pré-agrupados para resposta sem varrer a base
+"""
+import math
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Campos do histórico esperados pelo frontend
+HISTORY_FIELDS = ['ANO', 'FASE', 'IAN', 'IDA', 'IEG', 'IAA', 'IPS', 'IPP', 'IPV', 'DEFA']
+
+
+def _json_values(values: np.ndarray) -> List[Any]:
+    """
+    Converte um array em lista de valores nativos, com NaN/Inf -> None
+    """
+    out = values.tolist()
+    if values.dtype.kind in "fcO":
+        out = [None if isinstance(v, float) and not math.isfinite(v) else v for v in out]
+    return out
+
+
+class StudentHistories:
+    """
+    Registros de cada estudante agrupados e ordenados por ANO (layout CSR)
+    
+    As linhas de df_base são reordenadas por (estudante, ANO) e cada campo
+    vira uma lista de valores já prontos para JSON; `offsets[k]:offsets[k+1]`
+    delimita os registros do nome k do NameIndex. Montar um histórico custa
+    apenas o número de registros do estudante.
+    """
+    
+    def __init__(self, df, name_index):
+        ano = df["ANO"].to_numpy() if "ANO" in df.columns else None
+        
+        groups = []
+        offsets = [0]
+        for key in name_index.keys:
+            positions = name_index.exact[key]
+            if ano is not None:
+                positions = positions[np.argsort(ano[positions], kind="stable")]
+            groups.append(positions)
+            offsets.append(offsets[-1] + len(positions))
+        
+        order = np.concatenate(groups) if groups else np.empty(0, dtype=np.int64)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.columns: Dict[str, List[Any]] = {
+            f: (_json_values(df[f].to_numpy()[order]) if f in df.columns else [None] * len(order))
+            for f in HISTORY_FIELDS
+        }
+    
+    def history(self, key_id: int) -> List[Dict[str, Any]]:
+        """
+        Histórico (ordenado por ANO) do nome `key_id` do NameIndex
+        """
+        start, end = self.offsets[key_id], self.offsets[key_id + 1]
+        columns = [self.columns[f][start:end] for f in HISTORY_FIELDS]
+        return [dict(zip(HISTORY_FIELDS, values)) for values in zip(*columns)]
@@ -0,0 +1,255 @@
+"""
+Tabela de decisão das ações sugeridas (acao_sugerida / suggested_messages)
+
+As regras são dados (SUGGESTION_RULES): a primeira regra que casa com a chave
+(faixa de DEFA, tier de risco, predição topázio, risco alto) define a ação e os
+modelos de mensagem para a família e o professor. Na inicialização,
+`SuggestionTable` expande as regras em um array denso indexado pela chave;
+avaliar um lote é atribuir as faixas com operações de array e indexar a tabela.
+"""
+import math
+from bisect import bisect_right
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+# Faixas de DEFA (índice 0..4 da chave)
+DEFA_BUCKETS = ("grave", "defasagem", "zero", "adiantado", "adiantado_alto")
+# Tiers de risco; "sem_modelo" quando não há risk_score
+TIER_KEYS = ("Baixo", "Moderado", "Alto", "Crítico", "sem_modelo")
+TIER_BINS = (0.25, 0.50, 0.75)
+# Score a partir do qual um aluno adiantado tem o caso revisado
+HIGH_RISK_SCORE = 0.75
+TOPAZIO_LABELS = ("topázio", "topazio")
+# Nome usado nas mensagens quando o aluno não é identificado
+DEFAULT_NAME = "O aluno"
+
+_REVIEW_ACTION = " + Revisão"
+_REVIEW_FAMILY = " (Nota: modelo indica risco; revisar caso.)"
+_REVIEW_PROFESSOR = " (Rever indicador de risco.)"
+
+_HIGH_FAMILY = "{nome} está adiantado (DEFA={defa}). Sugerimos aprofundamento/possível aceleração."
+_HIGH_PROFESSOR = "Projetos de aprofundamento, mentorias, avaliar aceleração."
+_MODERATE_FAMILY = "{nome} está ligeiramente adiantado (DEFA={defa}). Sugerimos atividades de extensão."
+_MODERATE_PROFESSOR = "Desafios adicionais e monitorar engajamento."
+
+# Regras em ordem de prioridade; chaves omitidas casam com qualquer valor.
+# Mensagens aceitam {nome} e {defa}.
+SUGGESTION_RULES: List[Dict[str, Any]] = [
+    # DEFA negativo = problema (defasagem)
+    {
+        "defa": "grave",
+        "action": "Recuperação Intensiva (grave)",
+        "family": "Detectamos defasagem grave (DEFA={defa}). Requer reunião imediata com coordenação.",
+        "professor": "Acionar plano de intervenção intensiva, tutorias diárias, contato família."
+    },
+    {
+        "defa": "defasagem",
+        "action": "Recuperação de Aprendizagem",
+        "family": "Detectamos defasagem (DEFA={defa}). Recomendamos plano de recuperação de curto prazo.",
+        "professor": "Atividades focalizadas e monitoramento."
+    },
+    # DEFA positivo = aluno adiantado; risco alto apesar disso pede revisão
+    {
+        "defa": "adiantado_alto",
+        "high_risk": True,
+        "action": "Aprofundamento / Enriquecimento (alto)" + _REVIEW_ACTION,
+        "family": _HIGH_FAMILY + _REVIEW_FAMILY,
+        "professor": _HIGH_PROFESSOR + _REVIEW_PROFESSOR
+    },
+    {
+        "defa": "adiantado_alto",
+        "action": "Aprofundamento / Enriquecimento (alto)",
+        "family": _HIGH_FAMILY,
+        "professor": _HIGH_PROFESSOR
+    },
+    {
+        "defa": "adiantado",
+        "high_risk": True,
+        "action": "Enriquecimento Curricular (moderado)" + _REVIEW_ACTION,
+        "family": _MODERATE_FAMILY + _REVIEW_FAMILY,
+        "professor": _MODERATE_PROFESSOR + _REVIEW_PROFESSOR
+    },
+    {
+        "defa": "adiantado",
+        "action": "Enriquecimento Curricular (moderado)",
+        "family": _MODERATE_FAMILY,
+        "professor": _MODERATE_PROFESSOR
+    },
+    # DEFA = 0: seguir o tier de risco ou monitoramento padrão
+    {
+        "defa": "zero",
+        "tier": "sem_modelo",
+        "action": "Monitoramento",
+        "family": "Sem modelo disponível: faremos revisão por DEFA e acompanhamento de rotina.",
+        "professor": "Monitorar presença e desempenho; reportar casos de atenção."
+    },
+    {
+        "defa": "zero",
+        "tier": "Crítico",
+        "action": "Intervenção Psicopedagógica",
+        "family": "Detectamos risco crítico. Agendar apoio psicopedagógico urgente.",
+        "professor": "Priorizar acompanhamento intensivo e comunicação com a família."
+    },
+    {
+        "defa": "zero",
+        "tier": "Alto",
+        "action": "Acompanhamento Intensivo",
+        "family": "Sinais de risco. Recomendamos tutoria 1-2x/semana por 4 semanas.",
+        "professor": "Planejar recuperação focalizada e monitorar semanalmente."
+    },
+    {
+        "defa": "zero",
+        "topazio": True,
+        "action": "Enriquecimento Curricular",
+        "family": "Bom desempenho — sugerimos atividades de aprofundamento.",
+        "professor": "Oferecer desafios e extensão."
+    },
+    {
+        "defa": "zero",
+        "action": "Monitoramento e Micro-intervenção",
+        "family": "Acompanhamento de rotina; entraremos em contato se houver piora.",
+        "professor": "Monitorar evolução e aplicar micro-intervenção se necessário."
+    }
+]
+
+
+class CompiledRule(NamedTuple):
+    """Ação e modelos de mensagem de uma regra"""
+    action: str
+    family: str
+    professor: str
+    templated: bool
+
+
+def is_topazio(label: Any) -> bool:
+    """
+    Indica se o label predito é 'topázio' (com ou sem acento)
+    """
+    return isinstance(label, str) and label.strip().lower() in TOPAZIO_LABELS
+
+
+class SuggestionTable:
+    """Regras de sugestão compiladas em uma tabela (faixa DEFA, tier, topázio, risco alto)"""
+    
+    def __init__(self, rules: Sequence[Dict[str, Any]] = SUGGESTION_RULES, defa_threshold: int = 2):
+        """
+        Args:
+            rules: Regras em ordem de prioridade (ver SUGGESTION_RULES)
+            defa_threshold: |DEFA| a partir do qual a defasagem é grave / o adiantamento é alto
+        
+        Raises:
+            ValueError: Se alguma combinação da chave não casa com nenhuma regra
+        """
+        # Limites de faixa para bisect/np.digitize: <= -T, < 0, 0, < T, >= T
+        self.defa_bins = (1 - defa_threshold, 0, 1, defa_threshold)
+        self.rules = [
+            CompiledRule(
+                r["action"], r["family"], r["professor"],
+                any("{" in r[k] for k in ("family", "professor"))
+            )
+            for r in rules
+        ]
+        
+        self.table = np.full((len(DEFA_BUCKETS), len(TIER_KEYS), 2, 2), -1, dtype=np.int64)
+        for key in np.ndindex(*self.table.shape):
+            values = {
+                "defa": DEFA_BUCKETS[key[0]],
+                "tier": TIER_KEYS[key[1]],
+                "topazio": bool(key[2]),
+                "high_risk": bool(key[3])
+            }
+            for i, rule in enumerate(rules):
+                if all(rule[k] == v for k, v in values.items() if k in rule):
+                    self.table[key] = i
+                    break
+            else:
+                raise ValueError(f"No suggestion rule matches {values}")
+    
+    def suggest(
+        self,
+        defa_int: int,
+        risk_score: Optional[float],
+        pred_label: str,
+        student_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Ação sugerida e mensagens de um estudante
+        
+        Args:
+            defa_int: Valor inteiro de DEFA
+            risk_score: Score de risco (None = sem modelo)
+            pred_label: Label da predição
+            student_name: Nome do estudante (opcional)
+        
+        Returns:
+            Dicionário com suggested_action e suggested_messages
+        """
+        defa_bucket = bisect_right(self.defa_bins, defa_int)
+        if risk_score is None:
+            tier, high_risk = 4, False
+        elif math.isnan(risk_score):
+            tier, high_risk = 0, False
+        else:
+            tier, high_risk = bisect_right(TIER_BINS, risk_score), risk_score >= HIGH_RISK_SCORE
+        
+        rule = self.table[defa_bucket, tier, int(is_topazio(pred_label)), int(high_risk)]
+        return self._render(self.rules[rule], defa_int, student_name)
+    
+    def evaluate(
+        self,
+        defa_int: np.ndarray,
+        risk: Optional[np.ndarray],
+        labels: Sequence[str],
+        names: Sequence[Optional[str]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Versão em lote de `suggest`: faixas atribuídas com np.digitize e uma
+        indexação da tabela para todos os estudantes
+        
+        Args:
+            defa_int: Array de DEFA inteiro
+            risk: Array de scores de risco (None = sem modelo para o lote)
+            labels: Label predito de cada estudante
+            names: Nome de cada estudante (ou None)
+        
+        Returns:
+            Lista de dicionários (suggested_action, suggested_messages), na ordem de entrada
+        """
+        defa_int = np.asarray(defa_int, dtype=np.int64)
+        n = defa_int.shape[0]
+        defa_bucket = np.digitize(defa_int, self.defa_bins)
+        
+        if risk is None:
+            tier = np.full(n, 4)
+            high_risk = np.zeros(n, dtype=np.int64)
+        else:
+            risk = np.asarray(risk, dtype=np.float64)
+            valid = ~np.isnan(risk)
+            tier = np.where(valid, np.digitize(risk, TIER_BINS), 0)
+            high_risk = (valid & (risk >= HIGH_RISK_SCORE)).astype(np.int64)
+        
+        flags = {label: is_topazio(label) for label in set(labels)}
+        topazio = np.fromiter((flags[label] for label in labels), dtype=np.int64, count=n)
+        
+        rule_idx = self.table[defa_bucket, tier, topazio, high_risk].tolist()
+        defa_values = defa_int.tolist()
+        return [
+            self._render(self.rules[r], defa_values[i], names[i])
+            for i, r in enumerate(rule_idx)
+        ]
+    
+    @staticmethod
+    def _render(rule: CompiledRule, defa_int: int, student_name: Optional[str]) -> Dict[str, Any]:
+        """
+        Preenche os modelos de mensagem da regra
+        """
+        family, professor = rule.family, rule.professor
+        if rule.templated:
+            values = {"nome": student_name or DEFAULT_NAME, "defa": defa_int}
+            family = family.format(**values)
+            professor = professor.format(**values)
+        return {
+            "suggested_action": rule.action,
+            "suggested_messages": {"family": family, "professor": professor}
+        }
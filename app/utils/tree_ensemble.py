@@ -0,0 +1,253 @@
+"""
+Avaliador vetorizado (somente NumPy) de ensembles de árvores compilados do XGBoost
+
+O passo de build (`python -m app.compile_model`) converte as árvores do modelo
+em arrays planos (feature, threshold, filhos esquerdo/direito, direção do
+missing e valor da folha) salvos em um `.npz`. Em runtime, `TreeEnsemble`
+avalia lotes percorrendo todas as árvores nível a nível com operações de
+array, sem importar xgboost nem sklearn.
+"""
+import hashlib
+import json
+import pathlib
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Linhas avaliadas por vez: mantém a matriz (linhas, árvores) de nós correntes
+# no cache da CPU (blocos maiores ficam limitados pela memória)
+CHUNK_ROWS = 256
+
+
+def tree_bundle_path(model_path) -> pathlib.Path:
+    """
+    Caminho padrão do bundle compilado ao lado do modelo (<modelo>.trees.npz)
+    """
+    path = pathlib.Path(model_path)
+    return path.with_name(path.stem + ".trees.npz")
+
+
+def file_sha256(path) -> str:
+    """
+    SHA-256 do arquivo (identifica o modelo de origem do bundle)
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compile_xgb_model(model) -> Dict[str, np.ndarray]:
+    """
+    Converte as árvores de um classificador XGBoost em arrays planos
+    
+    Usa o dump JSON do Booster. Nós de todas as árvores ficam concatenados;
+    folhas apontam para si mesmas (a travessia converge nelas).
+    
+    Args:
+        model: XGBClassifier treinado (ou Booster)
+    
+    Returns:
+        Dicionário de arrays (feature, threshold, left, right, default, value,
+        cover, roots, tree_class, base_margin) e metadados do objetivo
+    
+    Raises:
+        ValueError: Se o modelo usa algo não suportado (splits categóricos,
+            objetivo diferente de multi:softprob/binary:logistic, gblinear, ...)
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    raw = json.loads(booster.save_raw("json"))
+    learner = raw["learner"]
+    
+    objective = learner["objective"]["name"]
+    if objective not in ("multi:softprob", "binary:logistic"):
+        raise ValueError(f"Unsupported objective: {objective}")
+    
+    gbm = learner["gradient_booster"]
+    if gbm.get("name") != "gbtree":
+        raise ValueError(f"Unsupported booster: {gbm.get('name')}")
+    
+    missing = getattr(model, "missing", np.nan)
+    if missing is not None and not np.isnan(missing):
+        raise ValueError("Only NaN as missing value is supported")
+    
+    trees = gbm["model"]["trees"]
+    tree_info = gbm["model"]["tree_info"]
+    n_classes = max(1, int(learner["learner_model_param"].get("num_class", "0") or 0))
+    
+    base_score = learner["learner_model_param"]["base_score"].strip("[]")
+    base_margin = np.array([float(v) for v in base_score.split(",")], dtype=np.float64)
+    if objective == "binary:logistic":
+        # base_score é probabilidade no binário; a margem é o logit
+        base_margin = np.log(base_margin / (1.0 - base_margin))
+    
+    feature, threshold, left, right, default, value, cover, roots = [], [], [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        if any(tree.get("split_type", [])) or tree.get("categories_nodes"):
+            raise ValueError("Categorical splits are not supported")
+        
+        lc = np.asarray(tree["left_children"], dtype=np.int64)
+        rc = np.asarray(tree["right_children"], dtype=np.int64)
+        cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+        n_nodes = len(lc)
+        nodes = np.arange(n_nodes)
+        leaf = lc == -1
+        
+        feature.append(np.where(leaf, 0, np.asarray(tree["split_indices"], dtype=np.int64)))
+        threshold.append(np.where(leaf, np.float32(0.0), cond))
+        left.append(np.where(leaf, nodes, lc) + offset)
+        right.append(np.where(leaf, nodes, rc) + offset)
+        default.append(np.where(
+            leaf, nodes, np.where(np.asarray(tree["default_left"], dtype=bool), lc, rc)
+        ) + offset)
+        value.append(np.where(leaf, cond, np.float32(0.0)))
+        cover.append(np.asarray(tree["sum_hessian"], dtype=np.float32))
+        roots.append(offset)
+        
+        # Profundidade máxima: percorre pais a partir das folhas
+        parents = np.asarray(tree["parents"], dtype=np.int64)
+        depth = np.zeros(n_nodes, dtype=np.int64)
+        for i in range(1, n_nodes):
+            depth[i] = depth[parents[i]] + 1
+        max_depth = max(max_depth, int(depth.max()))
+        
+        offset += n_nodes
+    
+    return {
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float32),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "default": np.concatenate(default).astype(np.int32),
+        "value": np.concatenate(value).astype(np.float32),
+        "cover": np.concatenate(cover).astype(np.float32),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "tree_class": np.asarray(tree_info, dtype=np.int32),
+        "base_margin": base_margin,
+        "max_depth": np.int64(max_depth),
+        "n_classes": np.int64(n_classes),
+        "objective": np.array(objective),
+        "num_feature": np.int64(int(learner["learner_model_param"]["num_feature"]))
+    }
+
+
+class StaticImputer:
+    """Imputer somente com os valores de preenchimento (substitui o SimpleImputer em runtime)"""
+    
+    def __init__(self, statistics, feature_names=None):
+        self.statistics_ = np.asarray(statistics, dtype=float)
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+    
+    def transform(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        return np.where(np.isnan(X), self.statistics_, X)
+
+
+class TreeEnsemble:
+    """
+    Ensemble de árvores em arrays planos com interface sklearn-like
+    (predict_proba, predict, classes_, feature_importances_)
+    """
+    
+    backend_name = "numpy"
+    
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.default = arrays["default"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.tree_class = arrays["tree_class"]
+        self.base_margin = np.asarray(arrays["base_margin"], dtype=np.float64)
+        self.max_depth = int(arrays["max_depth"])
+        self.n_classes = int(arrays["n_classes"])
+        self.objective = str(arrays["objective"])
+        self.n_features_in_ = int(arrays["num_feature"])
+        self.meta = meta or {}
+        # Arrays originais (o TreeShapExplainer é construído a partir deles)
+        self.arrays = arrays
+        
+        n_out = 1 if self.objective == "binary:logistic" else self.n_classes
+        self.n_outputs = n_out
+        self.classes_ = np.arange(max(2, n_out))
+        # Próximo nó por (nó, direção): 0 = esquerda (x < threshold),
+        # 1 = direita (x >= threshold), 2 = missing (NaN)
+        self._next = np.stack([self.left, self.right, self.default], axis=1).ravel()
+        # Árvores de cada saída, na ordem de treino
+        self._trees_by_output = [np.flatnonzero(self.tree_class == c) for c in range(n_out)]
+        
+        importances = self.meta.get("feature_importances")
+        if importances is not None:
+            self.feature_importances_ = np.asarray(importances, dtype=np.float32)
+    
+    def predict_margin(self, X) -> np.ndarray:
+        """
+        Margens (base + soma das folhas) por saída
+        
+        Args:
+            X: Matriz (n, n_features); NaN segue a direção de missing do nó
+        
+        Returns:
+            Matriz (n, n_saídas) em float32 (mesma margem do XGBoost)
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected (n, {self.n_features_in_}) input, got {X.shape}")
+        
+        out = np.empty((X.shape[0], self.n_outputs), dtype=np.float32)
+        base = self.base_margin.astype(np.float32)
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            Xc = X[start:start + CHUNK_ROWS]
+            n = Xc.shape[0]
+            rows = np.arange(n)[:, None]
+            idx = np.broadcast_to(self.roots, (n, len(self.roots))).copy()
+            
+            # Um nível por iteração para todas as linhas e árvores; folhas apontam para si
+            for _ in range(self.max_depth):
+                x = Xc[rows, self.feature[idx]]
+                thr = self.threshold[idx]
+                direction = 2 - 2 * (x < thr).astype(np.int32) - (x >= thr)
+                idx = self._next[idx * 3 + direction]
+            
+            # Acumulação sequencial em float32 a partir da base, como o XGBoost
+            leaves = self.value[idx]
+            for c, trees in enumerate(self._trees_by_output):
+                acc = np.concatenate([np.full((n, 1), base[c], dtype=np.float32), leaves[:, trees]], axis=1)
+                out[start:start + n, c] = np.cumsum(acc, axis=1, dtype=np.float32)[:, -1]
+        return out
+    
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Probabilidades por classe (softmax no multiclasse, sigmoide no binário)
+        """
+        margin = self.predict_margin(X)
+        if self.objective == "binary:logistic":
+            p = np.float32(1.0) / (np.float32(1.0) + np.exp(-margin[:, 0]))
+            return np.column_stack([np.float32(1.0) - p, p])
+        e = np.exp(margin - margin.max(axis=1, keepdims=True))
+        return e / e.sum(axis=1, keepdims=True)
+    
+    def predict(self, X) -> np.ndarray:
+        return np.argmax(self.predict_proba(X), axis=1)
+    
+    def save(self, path, arrays: Dict[str, np.ndarray]):
+        """
+        Grava arrays + metadados (JSON) em um .npz sem pickle
+        """
+        np.savez(path, meta=np.array(json.dumps(self.meta)), **arrays)
+    
+    @classmethod
+    def load(cls, path) -> "TreeEnsemble":
+        """
+        Carrega um bundle gravado por `save` (sem pickle, sem xgboost)
+        """
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {k: data[k] for k in data.files if k != "meta"}
+            meta = json.loads(str(data["meta"])) if "meta" in data.files else {}
+        return cls(arrays, meta)
@@ -0,0 +1,267 @@
+"""
+TreeSHAP exato (path-dependent, mesmo algoritmo do `pred_contribs` do XGBoost)
+vetorizado em NumPy sobre o ensemble compilado (app.utils.tree_ensemble)
+
+Para uma folha com caminho de m features distintas, z_k é a fração de cobertura
+(cover do filho / cover do pai, multiplicada quando a feature se repete) e
+o_k(x) indica se a amostra segue todas as arestas da feature k no caminho. A
+contribuição da folha para a feature j é
+
+    v * (o_j - z_j) * sum_{S ⊆ P\\{j}} |S|!(m-|S|-1)!/m! * prod_{k∈S} o_k * prod_{k∉S} z_k
+
+Como o é binário, o somatório depende só do padrão de bits de o: ele é
+pré-calculado por folha para os 2^m padrões, e a explicação de um lote vira
+comparar a amostra com os nós de cada caminho, montar o padrão e somar valores
+tabelados.
+"""
+from math import factorial
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Amostras por bloco na avaliação (limita a matriz (amostras, folhas, profundidade))
+CHUNK_ROWS = 64
+# As tabelas têm 2^profundidade padrões por folha (e o padrão cabe em um byte)
+MAX_DEPTH = 8
+
+
+class TreeShapExplainer:
+    """Contribuições SHAP exatas por feature para a classe (saída) de cada amostra"""
+    
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        """
+        Args:
+            arrays: Arrays do ensemble compilado (compile_xgb_model), incluindo `cover`
+        
+        Raises:
+            KeyError: Se o ensemble não tem as coberturas dos nós
+            ValueError: Se as árvores são mais profundas que MAX_DEPTH
+        """
+        cover = np.asarray(arrays["cover"], dtype=np.float64)
+        left = arrays["left"]
+        right = arrays["right"]
+        default = arrays["default"]
+        feature = arrays["feature"]
+        value = arrays["value"]
+        roots = arrays["roots"]
+        tree_class = arrays["tree_class"]
+        threshold = arrays["threshold"]
+        self.n_features = int(arrays["num_feature"])
+        if int(arrays["max_depth"]) > MAX_DEPTH:
+            raise ValueError(f"TreeSHAP tables support max_depth <= {MAX_DEPTH}")
+        
+        n_out = 1 if str(arrays["objective"]) == "binary:logistic" else int(arrays["n_classes"])
+        self.n_outputs = n_out
+        
+        # Caminhos raiz -> folha de cada árvore, agrupados por saída
+        paths_by_output: List[list] = [[] for _ in range(n_out)]
+        for t, root in enumerate(roots):
+            stack = [(int(root), [])]
+            while stack:
+                node, path = stack.pop()
+                if left[node] == node:
+                    if path:
+                        paths_by_output[int(tree_class[t])].append((node, path))
+                    continue
+                for child in (int(left[node]), int(right[node])):
+                    stack.append((child, path + [(node, child)]))
+        
+        self._groups = [
+            self._build_group(paths, self.n_features, cover, feature, threshold, left, default, value)
+            for paths in paths_by_output
+        ]
+    
+    @staticmethod
+    def _build_group(paths, n_features, cover, feature, threshold, left, default, value) -> Optional[dict]:
+        """
+        Pré-calcula caminhos e tabelas de contribuição das folhas de uma saída
+        """
+        if not paths:
+            return None
+        
+        n_leaves = len(paths)
+        depth = max(len(p) for _, p in paths)
+        # Passos de preenchimento sempre "seguem": x >= -inf ou missing
+        step_feature = np.zeros((n_leaves, depth), dtype=np.int64)
+        step_threshold = np.full((n_leaves, depth), -np.inf, dtype=np.float32)
+        step_left = np.zeros((n_leaves, depth), dtype=bool)
+        step_missing = np.ones((n_leaves, depth), dtype=bool)
+        step_slot = np.full((n_leaves, depth), -1, dtype=np.int64)
+        slot_feature = np.zeros((n_leaves, depth), dtype=np.int64)
+        z = np.ones((n_leaves, depth))
+        m_leaf = np.zeros(n_leaves, dtype=np.int64)
+        leaf_value = np.zeros(n_leaves)
+        
+        for i, (leaf, path) in enumerate(paths):
+            slots = {}
+            leaf_value[i] = value[leaf]
+            for s, (node, child) in enumerate(path):
+                f = int(feature[node])
+                k = slots.setdefault(f, len(slots))
+                slot_feature[i, k] = f
+                z[i, k] *= cover[child] / cover[node]
+                step_feature[i, s] = f
+                step_threshold[i, s] = threshold[node]
+                step_left[i, s] = child == left[node]
+                step_missing[i, s] = child == default[node]
+                step_slot[i, s] = k
+            m_leaf[i] = len(slots)
+        
+        # Tabela por padrão de o das features do caminho: (folha, 2^m, m)
+        max_m = int(m_leaf.max())
+        slot_table = np.zeros((n_leaves, 1 << max_m, max_m))
+        for m in range(1, max_m + 1):
+            rows = np.flatnonzero(m_leaf == m)
+            if rows.size:
+                slot_table[rows, :1 << m, :m] = _leaf_tables(z[rows, :m], leaf_value[rows], m)
+        
+        # Reindexa pelo padrão de passos seguidos (bit s = passo s), que é o que
+        # a avaliação calcula direto; o_k exige seguir todos os passos da feature k
+        leaves = np.arange(n_leaves)
+        table = np.zeros((n_leaves, 1 << depth, max_m))
+        for steps in range(1 << depth):
+            pattern = (1 << m_leaf) - 1
+            for s in range(depth):
+                if not (steps >> s) & 1:
+                    failed = step_slot[:, s] >= 0
+                    pattern = np.where(failed, pattern & ~(1 << np.maximum(step_slot[:, s], 0)), pattern)
+            table[:, steps] = slot_table[leaves, pattern]
+        
+        # Feature de cada coluna (folha, feature do caminho); colunas vazias vão
+        # para um bin extra descartado na soma
+        valid = np.arange(max_m)[None, :] < m_leaf[:, None]
+        column_feature = np.where(valid, slot_feature[:, :max_m], n_features).ravel()
+        
+        return {
+            "step_feature": step_feature,
+            "step_threshold": step_threshold,
+            "step_left": step_left,
+            "step_missing": step_missing,
+            "row_offset": leaves * (1 << depth),
+            "table": table.reshape(n_leaves * (1 << depth), max_m).astype(np.float32),
+            "column_feature": column_feature
+        }
+    
+    def save(self, path):
+        """
+        Grava as tabelas pré-calculadas em um .npz sem pickle (bundle nativo do modelo)
+        """
+        arrays = {"n_features": np.array(self.n_features), "n_outputs": np.array(self.n_outputs)}
+        for c, group in enumerate(self._groups):
+            for name, arr in (group or {}).items():
+                arrays[f"{c}/{name}"] = arr
+        np.savez(path, **arrays)
+    
+    @classmethod
+    def load(cls, source) -> "TreeShapExplainer":
+        """
+        Carrega tabelas gravadas por `save`, sem refazer o pré-cálculo
+        
+        Args:
+            source: Caminho ou arquivo binário do .npz
+        """
+        explainer = cls.__new__(cls)
+        with np.load(source, allow_pickle=False) as data:
+            explainer.n_features = int(data["n_features"])
+            explainer.n_outputs = int(data["n_outputs"])
+            groups: List[Optional[dict]] = [None] * explainer.n_outputs
+            for key in data.files:
+                c, _, name = key.partition("/")
+                if name:
+                    if groups[int(c)] is None:
+                        groups[int(c)] = {}
+                    groups[int(c)][name] = data[key]
+        explainer._groups = groups
+        return explainer
+    
+    def contributions(self, X: np.ndarray, outputs: np.ndarray) -> np.ndarray:
+        """
+        Contribuições SHAP por feature para a saída indicada de cada amostra
+        
+        Args:
+            X: Matriz (n, n_features) na entrada do modelo (NaN = missing)
+            outputs: Índice da classe a explicar por amostra (no binário, a
+                classe 0 recebe as contribuições da margem com sinal trocado)
+        
+        Returns:
+            Matriz (n, n_features) com as contribuições na escala da margem
+        """
+        X = np.asarray(X, dtype=np.float32)
+        outputs = np.asarray(outputs, dtype=np.int64)
+        phi = np.zeros((X.shape[0], self.n_features))
+        
+        # Binário: uma única margem (classe 1); a classe 0 é a margem com sinal trocado
+        sign = np.ones(X.shape[0])
+        if self.n_outputs == 1:
+            sign = np.where(outputs == 0, -1.0, 1.0)
+            outputs = np.zeros_like(outputs)
+        
+        for c in np.unique(outputs):
+            group = self._groups[int(c)] if 0 <= int(c) < len(self._groups) else None
+            if group is None:
+                continue
+            rows_c = np.flatnonzero(outputs == c)
+            for start in range(0, rows_c.size, CHUNK_ROWS):
+                rows = rows_c[start:start + CHUNK_ROWS]
+                phi[rows] = self._explain_rows(X[rows], group, self.n_features)
+        return phi * sign[:, None]
+    
+    @staticmethod
+    def _explain_rows(Xc: np.ndarray, group, n_features: int) -> np.ndarray:
+        """
+        Contribuições (amostras, n_features) de um bloco de amostras
+        """
+        n = Xc.shape[0]
+        
+        # Segue o passo: x < thr à esquerda, x >= thr à direita, NaN pelo default
+        x = Xc[:, group["step_feature"]]
+        thr = group["step_threshold"]
+        follows = np.where(np.isnan(x), group["step_missing"], (x < thr) == group["step_left"])
+        steps = np.packbits(follows, axis=2, bitorder="little")[:, :, 0]
+        
+        values = group["table"][group["row_offset"] + steps]
+        
+        # Soma por feature com bincount: acumula em float64 na ordem das colunas,
+        # então o resultado de uma linha não depende do tamanho do lote
+        bins = n_features + 1
+        index = np.arange(n)[:, None] * bins + group["column_feature"]
+        out = np.bincount(index.ravel(), weights=values.ravel(), minlength=n * bins)
+        return out.reshape(n, bins)[:, :n_features]
+
+
+def _leaf_tables(z: np.ndarray, v: np.ndarray, m: int) -> np.ndarray:
+    """
+    Contribuições de folhas com m features distintas para os 2^m padrões de o
+    
+    Args:
+        z: Frações de cobertura (folhas, m)
+        v: Valor das folhas (folhas,)
+        m: Número de features distintas no caminho
+    
+    Returns:
+        Array (folhas, 2^m, m)
+    """
+    n_leaves = z.shape[0]
+    weights = np.array([factorial(s) * factorial(m - s - 1) / factorial(m) for s in range(m)])
+    out = np.zeros((n_leaves, 1 << m, m))
+    
+    for pattern in range(1 << m):
+        o = [(pattern >> k) & 1 for k in range(m)]
+        for j in range(m):
+            # Features que seguem (A) entram ou não em S; as demais (B) sempre com z
+            coeffs = np.ones((n_leaves, 1))
+            fixed = np.ones(n_leaves)
+            for k in range(m):
+                if k == j:
+                    continue
+                if o[k]:
+                    # (x + z_k): coeficiente de x^s = subconjuntos S com s elementos
+                    shifted = np.zeros((n_leaves, coeffs.shape[1] + 1))
+                    shifted[:, 1:] += coeffs
+                    shifted[:, :-1] += coeffs * z[:, k:k + 1]
+                    coeffs = shifted
+                else:
+                    fixed = fixed * z[:, k]
+            total = coeffs @ weights[:coeffs.shape[1]]
+            out[:, pattern, j] = v * (o[j] - z[:, j]) * fixed * total
+    return out
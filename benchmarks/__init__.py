@@ -0,0 +1,3 @@
+"""
+Scripts de benchmark da API (executar a partir da raiz: python -m benchmarks.<script>)
+"""
@@ -0,0 +1,98 @@
+"""
+Benchmark do cache colunar da base CSV (pd.read_csv vs cache memory-mapped)
+
+Gera bases sintéticas em 1x/10x/100x o tamanho do df_Base_final.csv
+(repetindo as linhas como novos anos, com nomes distintos por cópia) e mede:
+
+- csv: pd.read_csv (o que cada startup fazia)
+- build: primeira carga com cache ausente (parsing + gravação do cache)
+- cache: carga com o cache válido (sem parsing; colunas memory-mapped)
+- cache+scan: carga e uma passada completa nas colunas (páginas tocadas)
+- restamp: CSV com mtime novo e mesmo conteúdo (SHA-256, sem rebuild)
+
+Uso:
+    python -m benchmarks.bench_data_cache [--scales 1 10 100] [--repeat 5]
+"""
+import argparse
+import logging
+import os
+import pathlib
+import shutil
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from app.config import DEFAULT_CSV
+from app.utils.columnar_cache import load_data_cache, read_csv_cached
+
+logging.disable(logging.INFO)
+
+
+def _synthetic_csv(base: pd.DataFrame, scale: int, path: pathlib.Path) -> int:
+    copies = []
+    for k in range(scale):
+        part = base.copy()
+        if k:
+            part["NOME"] = part["NOME"] + f" #{k}"
+            part["ANO"] = part["ANO"] + k
+        copies.append(part)
+    pd.concat(copies, ignore_index=True).to_csv(path, index=False)
+    return path.stat().st_size
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def _scan(df: pd.DataFrame):
+    for name in df.columns:
+        col = df[name]
+        col.sum() if col.dtype.kind in "iufb" else col.nunique()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=5, help="medições por etapa (mediana)")
+    args = parser.parse_args()
+    
+    base = pd.read_csv(os.environ.get("DF_CSV_PATH", str(DEFAULT_CSV)))
+    print(f"{'escala':>6} {'linhas':>8} {'CSV':>9} {'cache':>9} | {'csv':>9} {'build':>9} "
+          f"{'cache':>9} {'cache+scan':>11} {'restamp':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            csv_path = pathlib.Path(tmp) / f"base_{scale}x.csv"
+            size = _synthetic_csv(base, scale, csv_path)
+            cache_dir = pathlib.Path(tmp) / f"cache_{scale}x"
+            
+            t_csv = _median_ms(lambda: pd.read_csv(csv_path), args.repeat)
+            
+            def build():
+                shutil.rmtree(cache_dir, ignore_errors=True)
+                read_csv_cached(csv_path, cache_dir)
+            t_build = _median_ms(build, args.repeat)
+            
+            t_cache = _median_ms(lambda: load_data_cache(csv_path, cache_dir), args.repeat)
+            t_scan = _median_ms(lambda: _scan(load_data_cache(csv_path, cache_dir)), args.repeat)
+            
+            def restamp():
+                os.utime(csv_path)
+                assert load_data_cache(csv_path, cache_dir) is not None
+            t_restamp = _median_ms(restamp, args.repeat)
+            
+            rows = len(load_data_cache(csv_path, cache_dir))
+            cache_size = sum(f.stat().st_size for f in cache_dir.iterdir())
+            print(f"{scale:>5}x {rows:>8} {size / 1e6:7.1f}MB {cache_size / 1e6:7.1f}MB | "
+                  f"{t_csv:6.1f} ms {t_build:6.1f} ms {t_cache:6.1f} ms {t_scan:8.1f} ms "
+                  f"{t_restamp:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
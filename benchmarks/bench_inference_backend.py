@@ -0,0 +1,100 @@
+"""
+Benchmark dos backends de inferência: sklearn (predict_proba), Booster (inplace_predict)
+e NumPy (árvores compiladas)
+
+Mede o tempo por chamada para diferentes tamanhos de lote (1 linha = /predict,
+lotes maiores = micro-batches e /predict/batch), confere a paridade das
+probabilidades e compara o cold start (import + carga do modelo) de um
+processo novo com o joblib/xgboost e com o bundle NumPy.
+
+Uso:
+    python -m benchmarks.bench_inference_backend [--n 2000]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+from app.compile_model import compile_model
+from app.config import DEFAULT_MODEL
+from app.services.inference_backend import BoosterBackend, NumpyTreeBackend, SklearnBackend
+from app.services.model_service import ModelService
+from app.utils.tree_ensemble import TreeEnsemble
+
+warnings.filterwarnings("ignore")
+
+
+def _time_us(fn, n):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def _model_path():
+    return os.environ.get("MODEL_JOBLIB_PATH", str(DEFAULT_MODEL))
+
+
+def _cold_start_s(backend, env_extra, repeats=3):
+    code = (
+        "from app.services.model_service import ModelService\n"
+        f"ModelService(backend={backend!r}).load_model()\n"
+    )
+    env = dict(os.environ, **env_extra)
+    best = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=2000, help="iterações por medição (1 linha)")
+    args = parser.parse_args()
+    
+    model_service = ModelService()
+    model_service.load_model()
+    model = model_service.model_pipeline
+    
+    sklearn_backend = SklearnBackend(model)
+    booster_backend = BoosterBackend.from_model(model)
+    if booster_backend is None:
+        raise SystemExit("model is not a supported XGBoost classifier")
+    
+    bundle = os.path.join(tempfile.mkdtemp(), "model.trees.npz")
+    compile_model(str(_model_path()), bundle)
+    numpy_backend = NumpyTreeBackend(TreeEnsemble.load(bundle))
+    
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 10, size=(3000, len(model_service.features_list)))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    
+    expected = sklearn_backend.predict_proba(X)
+    print(f"booster idêntico ao predict_proba: {np.array_equal(expected, booster_backend.predict_proba(X))}")
+    print(f"numpy, max |diff|: {np.abs(expected - numpy_backend.predict_proba(X)).max():.2e}")
+    
+    print(f"\n{'linhas':>7} {'sklearn (us)':>13} {'booster (us)':>13} {'numpy (us)':>11}")
+    for rows in (1, 8, 64, 512, 3000):
+        n = max(5, args.n // rows)
+        Xb = X[:rows]
+        t_sk = _time_us(lambda: sklearn_backend.predict_proba(Xb), n)
+        t_bo = _time_us(lambda: booster_backend.predict_proba(Xb), n)
+        t_np = _time_us(lambda: numpy_backend.predict_proba(Xb), n)
+        print(f"{rows:>7} {t_sk:>13.1f} {t_bo:>13.1f} {t_np:>11.1f}")
+    
+    print("\n== cold start (processo novo: import + load_model) ==")
+    print(f"joblib + xgboost : {_cold_start_s('auto', {}):6.2f} s")
+    print(f"bundle NumPy     : {_cold_start_s('numpy', {'MODEL_TREES_PATH': bundle}):6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark da serialização das respostas JSON
+
+Compara, sobre payloads grandes já montados, o custo de transformar a
+resposta em bytes:
+
+- jsonable_encoder + JSONResponse (rotas que devolviam dict ao FastAPI)
+- sanitize_for_json + JSONResponse (rotas que devolviam JSONResponse)
+- FastJSONResponse (passada única, NumPy nativo e NaN/Inf -> null)
+
+Payloads: /students/lookup com os históricos de todos os estudantes da base
+(repetidos `--repeat` vezes) e /predict/batch sobre a base inteira.
+
+Uso:
+    python -m benchmarks.bench_json_response [--n 20] [--repeat 3]
+"""
+import argparse
+import time
+import warnings
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.services.model_service import ModelService
+from app.services.prediction_service import PredictionService
+from app.services.student_service import StudentService
+from app.utils.helpers import sanitize_for_json
+from app.utils.json_response import FastJSONResponse, orjson
+from benchmarks.bench_light_responses import _base_records
+
+warnings.filterwarnings("ignore")
+
+MODES = [
+    ("jsonable_encoder + JSONResponse", lambda c: JSONResponse(content=jsonable_encoder(c))),
+    ("sanitize_for_json + JSONResponse", lambda c: JSONResponse(content=sanitize_for_json(c))),
+    ("FastJSONResponse", lambda c: FastJSONResponse(content=c))
+]
+
+
+def _cpu_ms(fn, n):
+    fn()
+    t0 = time.process_time()
+    for _ in range(n):
+        fn()
+    return (time.process_time() - t0) / n * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=20, help="serializações por medição")
+    parser.add_argument("--repeat", type=int, default=3, help="cópias da lista de nomes no lookup")
+    args = parser.parse_args()
+    
+    model_service = ModelService()
+    model_service.initialize()
+    student_service = StudentService(model_service)
+    ps = PredictionService(model_service, cache_size=0)
+    
+    names = list(model_service.df_base["NOME"].dropna().unique()) * args.repeat
+    payloads = [
+        (f"/students/lookup ({len(names)} nomes)", student_service.lookup_students(names)),
+        ("/predict/batch (base inteira)", ps.predict_batch(_base_records(model_service)))
+    ]
+    
+    print(f"orjson: {'sim' if orjson is not None else 'não (fallback json da stdlib)'}")
+    for label, payload in payloads:
+        print(f"\n== {label} ==")
+        baseline = None
+        size = 0
+        for mode, render in MODES:
+            ms = _cpu_ms(lambda: render(payload), args.n)
+            size = len(render(payload).body)
+            baseline = baseline or ms
+            print(f"{mode:<34}: {ms:8.2f} ms  ({baseline / ms:5.1f}x)")
+        print(f"{'tamanho da resposta':<34}: {size / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark das respostas leves (`explain=false` / `fields=`) do /predict
+
+Mede o CPU por requisição de PredictionService.predict_score com a resposta
+completa (drivers TreeSHAP, sugestões, input_features e sanitização
+recursiva) e com as respostas leves, além do /predict/batch sobre a base
+inteira nos mesmos modos. O cache de respostas fica desligado para medir o
+custo real de cada chamada.
+
+Uso:
+    python -m benchmarks.bench_light_responses [--n 2000]
+"""
+import argparse
+import math
+import time
+import warnings
+
+from app.models import StudentMetrics
+from app.services.model_service import ModelService
+from app.services.prediction_service import PredictionService
+
+warnings.filterwarnings("ignore")
+
+PAYLOAD = {
+    "IAN": 5.0, "IDA": 7.0, "IEG": 8.0, "IAA": 6.5, "IPS": 7.5,
+    "IPP": 6.0, "IPV": 8.0, "FASE": 1, "DEFA": 0.0, "NOME": "Aluno-1"
+}
+
+MODES = [
+    ("completa", None, True),
+    ("explain=false", None, False),
+    ("fields=prediction,probabilities,risk_score", "prediction,probabilities,risk_score", True)
+]
+
+
+def _cpu_us(fn, n):
+    fn()
+    t0 = time.process_time()
+    for _ in range(n):
+        fn()
+    return (time.process_time() - t0) / n * 1e6
+
+
+def _base_records(model_service):
+    cols = ["IAN", "IDA", "IEG", "IAA", "IPS", "IPP", "IPV", "FASE", "DEFA", "NOME"]
+    records = []
+    for r in model_service.df_base[cols].to_dict(orient="records"):
+        r = {k: (None if isinstance(v, float) and math.isnan(v) else v) for k, v in r.items()}
+        if r["FASE"] is not None:
+            r["FASE"] = int(r["FASE"])
+        records.append(StudentMetrics(**r))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=2000, help="requisições por medição")
+    args = parser.parse_args()
+    
+    model_service = ModelService()
+    model_service.initialize()
+    ps = PredictionService(model_service, cache_size=0)
+    metrics = StudentMetrics(**PAYLOAD)
+    
+    print("== /predict (CPU por requisição) ==")
+    baseline = None
+    for label, fields, explain in MODES:
+        selected = ps.resolve_fields(fields, explain)
+        us = _cpu_us(lambda: ps.predict_score(metrics, fields=selected), args.n)
+        baseline = baseline or us
+        print(f"{label:<45}: {us:9.1f} us  ({1 - us / baseline:6.1%} menos)")
+    
+    records = _base_records(model_service)
+    print(f"\n== /predict/batch ({len(records)} linhas, CPU por lote) ==")
+    baseline = None
+    for label, fields, explain in MODES:
+        selected = ps.resolve_fields(fields, explain)
+        ms = _cpu_us(lambda: ps.predict_batch(records, fields=selected), 3) / 1000.0
+        baseline = baseline or ms
+        print(f"{label:<45}: {ms:9.1f} ms  ({1 - ms / baseline:6.1%} menos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark do micro-batching de PredictionService.predict_score_async
+
+Dispara `--concurrency` requisições simultâneas (em ondas, `--n` no total)
+com e sem o MicroBatcher e reporta vazão, latência por requisição e o
+tamanho médio dos lotes formados, para diferentes janelas.
+
+Uso:
+    python -m benchmarks.bench_micro_batching [--n 2000] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import time
+import warnings
+
+import numpy as np
+
+from app.models import StudentMetrics
+from app.services.model_service import ModelService
+from app.services.prediction_service import PredictionService
+
+warnings.filterwarnings("ignore")
+
+
+def _payloads(n):
+    rng = np.random.default_rng(0)
+    return [
+        StudentMetrics(
+            IAN=float(rng.uniform(2, 10)), IDA=float(rng.uniform(0, 10)),
+            IEG=float(rng.uniform(0, 10)), IAA=float(rng.uniform(0, 10)),
+            IPS=float(rng.uniform(0, 10)), IPP=float(rng.uniform(0, 10)),
+            IPV=float(rng.uniform(0, 10)), FASE=int(rng.integers(0, 8)),
+            DEFA=float(rng.integers(-3, 3))
+        )
+        for _ in range(n)
+    ]
+
+
+async def _run(ps, payloads, concurrency):
+    latencies = []
+    
+    async def one(m):
+        t0 = time.perf_counter()
+        await ps.predict_score_async(m)
+        latencies.append(time.perf_counter() - t0)
+    
+    t0 = time.perf_counter()
+    for i in range(0, len(payloads), concurrency):
+        await asyncio.gather(*(one(m) for m in payloads[i:i + concurrency]))
+    elapsed = time.perf_counter() - t0
+    return elapsed, np.array(latencies) * 1000.0
+
+
+def _report(label, ps, payloads, concurrency):
+    asyncio.run(_run(ps, payloads[:concurrency], concurrency))  # aquecimento
+    elapsed, lat = asyncio.run(_run(ps, payloads, concurrency))
+    stats = ps.micro_batching_stats()
+    avg_batch = stats.get("avg_batch_size") or 1.0
+    print(f"{label:<26}: {len(payloads) / elapsed:8.0f} req/s | "
+          f"p50 {np.percentile(lat, 50):7.2f} ms | p99 {np.percentile(lat, 99):7.2f} ms | "
+          f"lote médio {avg_batch:6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=2000, help="requisições por medição")
+    parser.add_argument("--concurrency", type=int, default=64, help="requisições simultâneas")
+    args = parser.parse_args()
+    
+    model_service = ModelService()
+    model_service.initialize()
+    payloads = _payloads(args.n)
+    
+    _report("sem micro-batching", PredictionService(model_service), payloads, args.concurrency)
+    for window_ms in (0.5, 2.0, 5.0):
+        ps = PredictionService(model_service, micro_batch=True,
+                               micro_batch_window_ms=window_ms, micro_batch_max_size=64)
+        _report(f"micro-batch {window_ms:.1f} ms/64", ps, payloads, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
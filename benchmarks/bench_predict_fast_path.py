@@ -0,0 +1,97 @@
+"""
+Benchmark do caminho rápido (sem pandas) de PredictionService.predict_score
+
+Compara, por requisição, o caminho legado com DataFrame (prepare_features +
+predict_proba + predict + to_dict) com o caminho rápido (vetor NumPy
+preenchido a partir do layout resolvido + uma única inferência).
+
+Para isolar o overhead fora do modelo, o modelo real é trocado por um stub
+de custo constante; a seção "modelo real" mostra o tempo total com XGBoost.
+
+Uso:
+    python -m benchmarks.bench_predict_fast_path [--n 2000]
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+
+from app.models import StudentMetrics
+from app.services.model_service import ModelService
+from app.services.prediction_service import PredictionService
+
+warnings.filterwarnings("ignore")
+
+PAYLOAD = {
+    "IAN": 5.0, "IDA": 7.0, "IEG": 8.0, "IAA": 6.5, "IPS": 7.5,
+    "IPP": 6.0, "IPV": 8.0, "FASE": 1, "DEFA": 0.0
+}
+
+
+class _StubModel:
+    """Modelo de custo ~zero: isola o overhead do serviço"""
+    
+    _probs = np.array([[0.1, 0.6, 0.2, 0.1]])
+    
+    def predict_proba(self, X):
+        return self._probs
+    
+    def predict(self, X):
+        return np.array([1])
+
+
+def _legacy(ps, input_data):
+    df_pred = ps.prepare_features(dict(input_data))
+    probs, pred_idx = ps.make_prediction(df_pred)
+    df_pred.iloc[0].to_dict()
+    df_pred.to_dict(orient="records")
+    return probs, pred_idx
+
+
+def _fast(ps, input_data):
+    artifact = ps.model_service.artifact
+    row, needs_impute = ps.prepare_row(input_data, artifact)
+    probs, pred_idx = ps.make_prediction_row(row, needs_impute, artifact)
+    row[0].tolist()
+    return probs, pred_idx
+
+
+def _time_us(fn, n):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=2000, help="iterações por medição")
+    args = parser.parse_args()
+    
+    model_service = ModelService()
+    model_service.initialize()
+    ps = PredictionService(model_service)
+    metrics = StudentMetrics(**PAYLOAD)
+    input_data = metrics.model_dump()
+    
+    real_model = model_service.model_pipeline
+    model_us = _time_us(lambda: real_model.predict_proba(np.array([[5.0, 7.0, 8.0, 6.5, 7.5, 6.0, 8.0, 1.0, np.nan, 0.86]])), args.n // 4)
+    
+    print("== modelo real (XGBoost) ==")
+    print(f"predict_proba isolado         : {model_us:10.1f} us")
+    print(f"legado (DataFrame, 2 chamadas): {_time_us(lambda: _legacy(ps, input_data), args.n // 4):10.1f} us")
+    print(f"rápido (NumPy, 1 chamada)     : {_time_us(lambda: _fast(ps, input_data), args.n // 4):10.1f} us")
+    print(f"predict_score completo        : {_time_us(lambda: ps.predict_score(metrics), args.n // 4):10.1f} us")
+    
+    model_service.model_pipeline = _StubModel()
+    print("\n== overhead fora do modelo (stub) ==")
+    print(f"legado (DataFrame)            : {_time_us(lambda: _legacy(ps, input_data), args.n):10.1f} us")
+    print(f"rápido (NumPy)                : {_time_us(lambda: _fast(ps, input_data), args.n):10.1f} us")
+    print(f"predict_score completo        : {_time_us(lambda: ps.predict_score(metrics), args.n):10.1f} us")
+    model_service.model_pipeline = real_model
+
+
+if __name__ == "__main__":
+    main()
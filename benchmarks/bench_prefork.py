@@ -0,0 +1,110 @@
+"""
+Benchmark de startup e memória: uvicorn --workers N vs servidor pre-fork (app.server)
+
+Sobe cada servidor com N workers, mede o tempo até todos os workers
+reportarem "Application startup complete" e soma PSS/USS de todos os
+processos (master + workers) a partir de /proc/<pid>/smaps_rollup (Linux).
+
+PSS divide as páginas compartilhadas entre os processos que as usam, então
+PSS/worker mostra o custo real de memória de cada worker adicional.
+
+Uso:
+    python -m benchmarks.bench_prefork [--workers 1 2 4] [--port 8765]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+READY = b"Application startup complete"
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _tree(pid):
+    pids = [pid]
+    for child in _children(pid):
+        pids.extend(_tree(child))
+    return pids
+
+
+def _memory_kb(pid):
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":"):
+                    fields[parts[0][:-1]] = int(parts[1]) if parts[1].isdigit() else 0
+    except OSError:
+        return 0, 0
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return fields.get("Pss", 0), uss
+
+
+def _measure(cmd, workers, timeout=120.0):
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+    ready = 0
+    try:
+        while ready < workers:
+            line = proc.stdout.readline()
+            if not line:
+                raise RuntimeError(f"server exited early: {' '.join(cmd)}")
+            if READY in line:
+                ready += 1
+            if time.perf_counter() - t0 > timeout:
+                raise RuntimeError("timeout waiting for workers")
+        startup = time.perf_counter() - t0
+        time.sleep(1.0)
+        
+        pids = _tree(proc.pid)
+        pss = uss = 0
+        for pid in pids:
+            p, u = _memory_kb(pid)
+            pss += p
+            uss += u
+        return startup, len(pids), pss / 1024.0, uss / 1024.0
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("requires Linux /proc/<pid>/smaps_rollup")
+    
+    print(f"{'servidor':<10} {'workers':>7} {'startup (s)':>12} {'procs':>6} "
+          f"{'PSS total (MB)':>15} {'PSS/worker (MB)':>16} {'USS total (MB)':>15}")
+    for n in args.workers:
+        servers = {
+            "uvicorn": [sys.executable, "-m", "uvicorn", "app.main:app",
+                        "--port", str(args.port), "--workers", str(n)],
+            "pre-fork": [sys.executable, "-m", "app.server",
+                         "--port", str(args.port), "--workers", str(n)],
+        }
+        for label, cmd in servers.items():
+            startup, procs, pss, uss = _measure(cmd, n)
+            print(f"{label:<10} {n:>7} {startup:>12.2f} {procs:>6} "
+                  f"{pss:>15.1f} {pss / n:>16.1f} {uss:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark da avaliação em sombra no /predict
+
+Mede a latência de PredictionService.predict_score (explain=false, cache
+desligado) sem sombra e com uma versão candidata escorada em sombra em
+frações crescentes do tráfego. A candidata é o próprio modelo padrão
+registrado com outro nome, então a concordância esperada é 100%.
+
+O escore em sombra roda no executor próprio: no caminho de requisição só
+entram o sorteio da amostra e o enfileiramento. Em máquinas com poucos
+núcleos a thread de sombra ainda disputa CPU (e o GIL) com as requisições.
+
+Uso:
+    python -m benchmarks.bench_shadow [--n 2000] [--rates 0 0.1 1.0]
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+
+from app.config import DEFAULT_MODEL
+from app.services.model_service import ModelService
+from app.services.prediction_service import PredictionService
+from benchmarks.bench_light_responses import _base_records
+
+warnings.filterwarnings("ignore")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n", type=int, default=2000, help="requisições por medição")
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.0, 0.1, 1.0])
+    args = parser.parse_args()
+    
+    model_service = ModelService()
+    model_service.initialize()
+    model_service.load_version("candidato", str(DEFAULT_MODEL))
+    records = _base_records(model_service)
+    
+    for rate in args.rates:
+        ps = PredictionService(model_service, cache_size=0, shadow_version="candidato",
+                               shadow_sample_rate=rate)
+        fields = ps.resolve_fields(explain=False)
+        ps.predict_score(records[0], fields=fields)
+        
+        latencies = np.empty(args.n)
+        t_start = time.perf_counter()
+        for i in range(args.n):
+            t0 = time.perf_counter()
+            ps.predict_score(records[i % len(records)], fields=fields)
+            latencies[i] = time.perf_counter() - t0
+        elapsed = time.perf_counter() - t_start
+        ps.shadow.pool.shutdown(wait=True)
+        
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        shadow = ps.shadow.stats()
+        print(f"sombra {rate:4.0%}: p50 {p50:6.3f} ms | p99 {p99:6.3f} ms | "
+              f"{args.n / elapsed:7.0f} req/s | comparadas {shadow['compared']:>5} "
+              f"| concordância {shadow['agreement_rate']}")
+        ps.executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark de startup: joblib vs bundle nativo do XGBoost (UBJSON e JSON)
+
+Cada medição roda em um interpretador novo (sem módulos nem arquivos em
+cache do processo) e reporta:
+
+- import: imports do app (ModelService, PredictionService, schemas)
+- xgboost: import do xgboost (que importa sklearn/scipy), pago por todos
+  os formatos e medido à parte para isolar o custo do formato
+- dados: leitura do CSV e índices (igual em todos os formatos)
+- artefato: carga do modelo + estatísticas das features
+- 1ª predição: primeira chamada a predict_score (backend, TreeSHAP)
+
+Os bundles nativos são gerados em um diretório temporário com
+app.convert_model (com verificação de paridade).
+
+Uso:
+    python -m benchmarks.bench_startup [--repeat 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+FORMATS = ["joblib", "ubj", "json"]
+STEPS = ["import", "xgboost", "dados", "artefato", "1ª predição"]
+
+
+def _child():
+    t0 = time.perf_counter()
+    from app.models import StudentMetrics
+    from app.services.model_service import ModelService
+    from app.services.prediction_service import PredictionService
+    t_import = time.perf_counter() - t0
+    
+    t0 = time.perf_counter()
+    import xgboost  # noqa: F401
+    t_xgboost = time.perf_counter() - t0
+    
+    t0 = time.perf_counter()
+    model_service = ModelService()
+    model_service.load_data()
+    t_data = time.perf_counter() - t0
+    
+    t0 = time.perf_counter()
+    model_service.load_model()
+    if model_service.feature_medians is None:
+        model_service.compute_feature_statistics()
+    t_artifact = time.perf_counter() - t0
+    
+    t0 = time.perf_counter()
+    ps = PredictionService(model_service, cache_size=0)
+    ps.predict_score(StudentMetrics(IAN=5.0, IDA=6.0, IEG=7.0, FASE=2, DEFA=0.0))
+    t_first = time.perf_counter() - t0
+    
+    print(json.dumps({
+        "import": t_import, "xgboost": t_xgboost, "dados": t_data, "artefato": t_artifact, "1ª predição": t_first,
+        "source": model_service.artifact.source, "sklearn": "sklearn" in sys.modules
+    }))
+
+
+def _run(env):
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3, help="medições por formato (mediana)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        _child()
+        return
+    
+    from app.config import DEFAULT_MODEL
+    from app.convert_model import convert_model
+    
+    model_path = os.environ.get("MODEL_JOBLIB_PATH", str(DEFAULT_MODEL))
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONWARNINGS="ignore")
+        envs = {"joblib": dict(env, MODEL_FORMAT="joblib")}
+        for fmt in ("ubj", "json"):
+            sidecar = os.path.join(tmp, f"{fmt}.bundle.json")
+            convert_model(model_path, sidecar, fmt)
+            envs[fmt] = dict(env, MODEL_FORMAT="auto", MODEL_NATIVE_PATH=sidecar)
+        
+        print(f"\n{'formato':<8}" + "".join(f"{s:>14}" for s in STEPS) + f"{'total':>10}")
+        for fmt in FORMATS:
+            runs = [_run(envs[fmt]) for _ in range(args.repeat)]
+            medians = [statistics.median(r[s] for r in runs) * 1000 for s in STEPS]
+            print(f"{fmt:<8}" + "".join(f"{m:11.0f} ms" for m in medians)
+                  + f"{sum(medians):7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark da tabela de decisão das sugestões (acao_sugerida / suggested_messages)
+
+Compara, para lotes sintéticos com DEFA, risco, label e nome variados, a
+avaliação linha a linha (`SuggestionTable.suggest`, usada pelo /predict) com a
+avaliação em lote (`SuggestionTable.evaluate`, usada pelo /predict/batch).
+
+Uso:
+    python -m benchmarks.bench_suggestions [--sizes 1000 10000 100000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.config import DEFA_LARGE_THRESHOLD
+from app.utils.suggestion_table import SuggestionTable
+
+LABELS = ["Quartzo", "Ágata", "Ametista", "Topázio"]
+
+
+def _batch(n, seed=0):
+    rng = np.random.default_rng(seed)
+    defa = rng.integers(-4, 5, n)
+    risk = rng.random(n)
+    labels = [LABELS[i] for i in rng.integers(0, len(LABELS), n)]
+    names = [None if i % 3 == 0 else f"Aluno-{i}" for i in range(n)]
+    return defa, risk, labels, names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+    
+    t0 = time.perf_counter()
+    table = SuggestionTable(defa_threshold=DEFA_LARGE_THRESHOLD)
+    print(f"compilação da tabela: {(time.perf_counter() - t0) * 1000:.2f} ms "
+          f"({table.table.size} chaves, {len(table.rules)} regras)")
+    
+    for n in args.sizes:
+        defa, risk, labels, names = _batch(n)
+        defa_list, risk_list = defa.tolist(), risk.tolist()
+        
+        t0 = time.process_time()
+        rows = [table.suggest(defa_list[i], risk_list[i], labels[i], names[i]) for i in range(n)]
+        per_row = time.process_time() - t0
+        
+        t0 = time.process_time()
+        batch = table.evaluate(defa, risk, labels, names)
+        vectorized = time.process_time() - t0
+        
+        assert batch == rows
+        print(f"n={n:>7}: linha a linha {per_row * 1000:8.1f} ms | lote {vectorized * 1000:8.1f} ms "
+              f"({per_row / vectorized:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
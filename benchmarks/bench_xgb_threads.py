@@ -0,0 +1,106 @@
+"""
+Benchmark de threads do XGBoost × workers (oversubscription)
+
+Para cada combinação (threads, workers), sobe `workers` processos que fazem
+inferências de uma linha (como o /predict) em paralelo durante `--seconds`
+e reporta a vazão agregada e a latência p50/p99 por chamada. Em seguida
+mede o escore em lote da base inteira (como /predict/batch e a tabela de
+risco) para cada contagem de threads, para escolher XGB_NTHREAD e
+XGB_BATCH_NTHREAD.
+
+Uso:
+    python -m benchmarks.bench_xgb_threads [--threads 1 2 4] [--workers 1 2 4] [--seconds 3]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import time
+import warnings
+
+import numpy as np
+
+warnings.filterwarnings("ignore")
+
+
+def _load(nthread):
+    from app.services.model_service import ModelService
+    
+    service = ModelService(nthread=nthread, batch_nthread=nthread)
+    service.load_model()
+    return service.model_pipeline
+
+
+def _rows(n):
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 10, size=(n, 10))
+    X[:, 7] = rng.integers(0, 8, size=n)
+    X[:, 8] = np.nan
+    return X
+
+
+def _worker(nthread, seconds, ready, out):
+    model = _load(nthread)
+    X = _rows(256)
+    model.predict_proba(X[:1])
+    # Todos os workers começam juntos, após carregar o modelo
+    ready.wait()
+    
+    lat = []
+    i = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        model.predict_proba(X[i % 256:i % 256 + 1])
+        lat.append(time.perf_counter() - t0)
+        i += 1
+    out.put(lat)
+
+
+def _sweep_single_row(threads, workers, seconds):
+    ctx = mp.get_context("spawn")
+    ready = ctx.Barrier(workers)
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(threads, seconds, ready, out)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    lats = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    lat = np.concatenate([np.asarray(x) for x in lats]) * 1000.0
+    return len(lat) / seconds, np.percentile(lat, 50), np.percentile(lat, 99)
+
+
+def _bulk(threads, n_rows, repeats=5):
+    model = _load(threads)
+    X = _rows(n_rows)
+    model.predict_proba(X)
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        model.predict_proba(X)
+    return (time.perf_counter() - t0) / repeats * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--bulk-rows", type=int, default=3000)
+    args = parser.parse_args()
+    
+    print(f"CPUs: {os.cpu_count()}")
+    print("\n== inferência de uma linha (por chamada) ==")
+    print(f"{'threads':>7} {'workers':>7} {'req/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    for t in args.threads:
+        for w in args.workers:
+            rps, p50, p99 = _sweep_single_row(t, w, args.seconds)
+            print(f"{t:>7} {w:>7} {rps:>10.0f} {p50:>10.3f} {p99:>10.3f}")
+    
+    print(f"\n== escore em lote ({args.bulk_rows} linhas, 1 processo) ==")
+    print(f"{'threads':>7} {'ms/lote':>10}")
+    for t in args.threads:
+        print(f"{t:>7} {_bulk(t, args.bulk_rows):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ from app.main import app
 from app.services.model_service import ModelService
 from app.services.student_service import StudentService
 from app.services.prediction_service import PredictionService
+from app.services.risk_service import RiskService
+from app.services.reload_service import ModelReloader
 import pytest
 
 @pytest.fixture
@@ -24,8 +26,17 @@ def client():
         
         prediction_service = PredictionService(model_service)
         app.state.prediction_service = prediction_service
+        
+        app.state.risk_service = RiskService(
+            model_service, prediction_service, student_service
+        )
+        app.state.model_reloader = ModelReloader(
+            model_service, app.state.risk_service, watch_interval=0
+        )
     
+    # O startup carrega os serviços em background (MODEL_LOAD_MODE)
     with TestClient(app) as c:
+        app.state.service_loader.wait()
         yield c
 
 def test_health_check(client):
@@ -35,6 +46,111 @@ def test_health_check(client):
     assert data["status"] == "ok"
     assert data["model_loaded"] is True
     assert data["data_loaded"] is True
+    assert "enabled" in data["prediction_cache"]
+
+def test_health_not_blocked_by_busy_inference_executor(client):
+    """
+    Testa que /health responde com o executor de inferência saturado
+    (rotas leves não entram na fila atrás de predições)
+    """
+    import threading
+    
+    prediction_service = app.state.prediction_service
+    release = threading.Event()
+    blockers = [
+        prediction_service.executor.pool.submit(release.wait, 10)
+        for _ in range(prediction_service.executor.max_workers)
+    ]
+    try:
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["executors"]["inference"]["workers"] >= 1
+    finally:
+        release.set()
+        for f in blockers:
+            f.result()
+
+def test_startup_reuses_preloaded_model_service():
+    """
+    Testa que o startup reaproveita o ModelService carregado pelo master do
+    servidor pre-fork (app.server) em vez de recarregar modelo e base
+    """
+    preloaded = ModelService()
+    preloaded.initialize()
+    app.state.preloaded_model_service = preloaded
+    try:
+        with TestClient(app) as c:
+            assert app.state.model_service is preloaded
+            assert c.get("/health").json()["model_loaded"] is True
+    finally:
+        del app.state.preloaded_model_service
+
+def test_health_liveness_while_services_load(client):
+    """
+    Testa que /health responde enquanto os serviços carregam, que as demais
+    rotas respondem 503 até a carga terminar e que uma carga com erro é
+    reportada no /health
+    """
+    import threading
+    
+    loader = app.state.service_loader
+    release = threading.Event()
+    payload = {"IAN": 5.0, "IDA": 6.0, "IEG": 7.0, "FASE": 2, "DEFA": 0.0}
+    
+    loader.start(lambda: release.wait(10))
+    try:
+        health = client.get("/health")
+        assert health.status_code == 200
+        assert health.json()["status"] == "starting"
+        assert client.get("/health/ready").status_code == 503
+        
+        response = client.post("/predict", json=payload)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+    finally:
+        release.set()
+    assert loader.wait(10)
+    assert client.get("/health/ready").json()["ready"] is True
+    assert client.get("/health").json()["startup"]["status"] == "ready"
+    assert client.post("/predict", json=payload).status_code == 200
+    
+    def failing_load():
+        raise RuntimeError("model file missing")
+    
+    loader.start(failing_load)
+    try:
+        assert loader.wait(10) is False
+        health = client.get("/health")
+        assert health.status_code == 503
+        assert health.json()["startup"]["error"] == "RuntimeError: model file missing"
+    finally:
+        loader.start(lambda: None, background=False)
+
+def test_app_import_time_budget():
+    """
+    Testa o orçamento de tempo de import de app.main (-X importtime): os
+    serviços e suas dependências pesadas só são importados no startup
+    """
+    import re
+    import subprocess
+    import sys
+    
+    budget_ms = 800
+    heavy = ["pandas", "numpy", "joblib", "xgboost", "sklearn", "scipy"]
+    code = (
+        "import sys, app.main; "
+        f"print(','.join(m for m in {heavy!r} if m in sys.modules))"
+    )
+    timings = []
+    for _ in range(3):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True, text=True, check=True
+        )
+        assert result.stdout.strip() == "", f"app.main importou: {result.stdout.strip()}"
+        match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| app\.main$", result.stderr, re.M)
+        timings.append(int(match.group(1)) / 1000)
+    assert min(timings) < budget_ms, f"import de app.main: {min(timings):.0f} ms (orçamento {budget_ms} ms)"
 
 def test_search_student_success(client):
     """
@@ -113,3 +229,281 @@ def test_predict_invalid(client):
     # API pode aceitar (200) com valores None ou rejeitar (422)
     assert response.status_code in [200, 422], \
         f"Esperado 200 ou 422 para campos faltando, recebido {response.status_code}"
+
+def test_predict_batch_matches_single(client):
+    """
+    Testa que /predict/batch retorna, na ordem de entrada, o mesmo
+    resultado que chamadas individuais a /predict
+    """
+    payloads = [
+        {"IAN": 5.0, "IDA": 7.0, "IEG": 8.0, "IAA": 6.5, "IPS": 7.5,
+         "IPP": 6.0, "IPV": 8.0, "FASE": 1, "DEFA": 0.0},
+        {"IAN": 0.0, "IDA": 0.0, "IEG": 0.0, "IAA": 0.0, "IPS": 0.0,
+         "IPP": 0.0, "IPV": 0.0, "FASE": 1, "DEFA": -3.0},
+        {"IAN": 10.0, "IDA": 9.0, "IEG": 9.5, "IAA": 9.0, "IPS": 8.0,
+         "IPP": 8.0, "IPV": 9.0, "FASE": 4, "DEFA": 2.0, "NOME": "Aluno-1"},
+        {"IAN": 5.0},
+    ]
+    
+    response = client.post("/predict/batch", json=payloads)
+    assert response.status_code == 200
+    data = response.json()
+    
+    assert data["count"] == len(payloads)
+    assert len(data["results"]) == len(payloads)
+    
+    for payload, result in zip(payloads, data["results"]):
+        single = client.post("/predict", json=payload).json()
+        assert result["prediction"] == single["prediction"]
+        assert result["risk_score"] == single["risk_score"]
+        assert result["risk_tier"] == single["risk_tier"]
+        assert result["acao_sugerida"] == single["acao_sugerida"]
+        assert result["top_drivers"] == single["top_drivers"]
+        assert result["input_features"] == single["input_features"]
+        for classe, prob in single["probabilities"].items():
+            assert abs(result["probabilities"][classe] - prob) < 1e-6
+
+def test_predict_light_responses(client):
+    """
+    Testa explain=false e fields= em /predict e /predict/batch: só os campos
+    pedidos voltam, com os mesmos valores da resposta completa
+    """
+    payload = {"IAN": 5.0, "IDA": 7.0, "IEG": 8.0, "IAA": 6.5, "IPS": 7.5,
+               "IPP": 6.0, "IPV": 8.0, "FASE": 1, "DEFA": 0.0}
+    full = client.post("/predict", json=payload).json()
+    
+    light = client.post("/predict", params={"explain": "false"}, json=payload).json()
+    assert set(light) == {"prediction", "prediction_index", "probabilities", "risk_score",
+                          "risk_tier", "defa_int", "model_version"}
+    assert all(light[k] == full[k] for k in light)
+    
+    fields = {"fields": "prediction,probabilities,risk_score"}
+    only = client.post("/predict", params=fields, json=payload).json()
+    assert only == {k: full[k] for k in ("prediction", "probabilities", "risk_score")}
+    
+    batch = client.post("/predict/batch", params=fields, json=[payload, payload]).json()
+    assert batch["results"] == [only, only]
+    
+    response = client.post("/predict", params={"fields": "prediction,nope"}, json=payload)
+    assert response.status_code == 422
+
+def test_predict_batch_empty(client):
+    response = client.post("/predict/batch", json=[])
+    assert response.status_code == 200
+    assert response.json()["results"] == []
+
+def test_student_risk_from_materialized_table(client):
+    """
+    Testa que /students/{name}/risk responde da tabela pré-calculada com
+    o mesmo resultado de /predict para as métricas do registro
+    """
+    response = client.get("/students/Aluno-1/risk")
+    assert response.status_code == 200
+    data = response.json()
+    
+    assert data["nome"] == "Aluno-1"
+    assert data["model_version"] == client.get("/health").json()["model_version"]
+    assert len(data["historico"]) >= 1
+    
+    historico = client.get("/students/Aluno-1").json()["historico"]
+    for registro, risco in zip(historico, data["historico"]):
+        payload = {k: v for k, v in registro.items() if k != "ANO"}
+        payload["FASE"] = int(payload["FASE"])
+        single = client.post("/predict", json=payload).json()
+        assert risco["prediction"] == single["prediction"]
+        assert risco["risk_score"] == single["risk_score"]
+        assert risco["risk_tier"] == single["risk_tier"]
+    
+    assert client.get("/health").json()["risk_table"]["materialized"] is True
+
+def test_student_risk_not_found(client):
+    response = client.get("/students/StudentThatDoesnotExistSearchXYZ/risk")
+    assert response.status_code == 404
+
+def test_top_interventions_ranking(client):
+    """
+    Testa o ranking de intervenção: ordenado por Prob_Quartzo e respeitando filtros
+    """
+    response = client.get("/interventions/top", params={"n": 10})
+    assert response.status_code == 200
+    data = response.json()
+    
+    assert data["count"] == 10
+    probs = [s["Prob_Quartzo"] for s in data["students"]]
+    assert probs == sorted(probs, reverse=True)
+    assert [s["rank"] for s in data["students"]] == list(range(1, 11))
+    
+    response = client.get("/interventions/top", params={"n": 5, "fase": 2, "ano": 2024})
+    data = response.json()
+    assert data["filters"] == {"fase": 2, "ano": 24}
+    assert all(s["FASE"] == 2 and s["ANO"] == 24 for s in data["students"])
+    
+    # O topo filtrado nunca supera o topo global
+    top_global = client.get("/interventions/top", params={"n": 1}).json()["students"][0]
+    assert data["students"][0]["Prob_Quartzo"] <= top_global["Prob_Quartzo"]
+
+def test_top_interventions_one_row_per_student(client):
+    """
+    Testa que o ranking traz cada aluno uma vez, com o registro do ANO mais recente
+    """
+    df = app.state.model_service.df_base
+    latest = df.groupby("NOME")["ANO"].max()
+    
+    students = client.get("/interventions/top", params={"n": 10000}).json()["students"]
+    names = [s["NOME"] for s in students]
+    assert len(names) == len(set(names)) == len(latest)
+    assert all(s["ANO"] == latest[s["NOME"]] for s in students)
+    
+    # Com filtro de FASE: o mais recente dentre os registros daquela fase
+    fase = int(df["FASE"].iloc[0])
+    latest_in_fase = df[df["FASE"] == fase].groupby("NOME")["ANO"].max()
+    students = client.get("/interventions/top", params={"n": 10000, "fase": fase}).json()["students"]
+    assert sorted(s["NOME"] for s in students) == sorted(latest_in_fase.index)
+    assert all(s["ANO"] == latest_in_fase[s["NOME"]] for s in students)
+    
+    # Deduplicação pré-calculada nos índices da tabela (não por requisição)
+    indexes = app.state.risk_service.current_state().indexes
+    assert len(indexes["ALL"][None]) == len(latest)
+    assert len(indexes["FASE"][fase]) == len(latest_in_fase)
+
+def test_top_interventions_unknown_filter(client):
+    response = client.get("/interventions/top", params={"fase": 99})
+    assert response.status_code == 200
+    assert response.json()["students"] == []
+
+def test_search_student_case_insensitive(client):
+    exact = client.get("/students/Aluno-1").json()
+    assert exact["nome"] == "Aluno-1"
+    assert client.get("/students/ALUNO-1").json() == exact
+
+def test_search_student_regex_input_is_literal(client):
+    response = client.get("/students/" + "(a+)+$")
+    assert response.status_code == 404
+
+def test_fuzzy_search_students(client):
+    response = client.get("/students/search", params={"q": "ALUNO-12", "k": 5})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["results"][0] == {"nome": "Aluno-12", "score": 1.0, "registros": data["results"][0]["registros"]}
+    assert len(data["results"]) <= 5
+    
+    # Erro de digitação ainda encontra o aluno
+    typo = client.get("/students/search", params={"q": "Alumo-12"}).json()
+    assert "Aluno-12" in [r["nome"] for r in typo["results"]]
+    scores = [r["score"] for r in typo["results"]]
+    assert scores == sorted(scores, reverse=True)
+
+def test_lookup_students_bulk(client):
+    names = ["Aluno-1", "aluno-2", "StudentThatDoesnotExistSearchXYZ", "Aluno-1"]
+    response = client.post("/students/lookup", json={"names": names})
+    assert response.status_code == 200
+    data = response.json()
+    
+    assert data["count"] == 4
+    assert data["found"] == 3
+    assert data["not_found"] == ["StudentThatDoesnotExistSearchXYZ"]
+    assert [r["query"] for r in data["results"]] == names
+    assert data["results"][2] == {
+        "query": names[2], "found": False, "nome": None, "historico": []
+    }
+    
+    single = client.get("/students/Aluno-2").json()
+    assert data["results"][1]["nome"] == single["nome"]
+    assert data["results"][1]["historico"] == single["historico"]
+
+def test_fast_json_response_numpy_and_nan(monkeypatch):
+    """
+    Testa a FastJSONResponse: NumPy serializado direto e NaN/Inf -> null,
+    com orjson e no fallback para o json da stdlib
+    """
+    import json
+    import numpy as np
+    from app.utils import json_response
+    
+    content = {
+        "nan": float("nan"), "inf": np.float32("inf"), "int": np.int64(3),
+        "array": np.array([1.5, np.nan]), "strided": np.arange(4)[::2],
+        "nested": [{"x": np.float64("-inf"), "nome": "João"}]
+    }
+    expected = {
+        "nan": None, "inf": None, "int": 3, "array": [1.5, None], "strided": [0, 2],
+        "nested": [{"x": None, "nome": "João"}]
+    }
+    response = json_response.FastJSONResponse(content=content)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == expected
+    
+    monkeypatch.setattr(json_response, "orjson", None)
+    assert json.loads(json_response.FastJSONResponse(content=content).body) == expected
+
+def test_admin_model_reload(client, monkeypatch):
+    """
+    Testa a recarga do modelo pelo endpoint /admin: desabilitado sem token,
+    401 com token errado, caminho restrito a models/ e troca do snapshot
+    """
+    from app.config import DEFAULT_MODEL
+    from app.routes import admin
+    
+    assert client.post("/admin/model/reload").status_code == 404
+    
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "segredo")
+    assert client.post("/admin/model/reload", headers={"X-Admin-Token": "x"}).status_code == 401
+    
+    headers = {"X-Admin-Token": "segredo"}
+    response = client.post("/admin/model/reload", params={"path": "../app/main.py"}, headers=headers)
+    assert response.status_code == 400
+    
+    model_service = app.state.model_service
+    before = model_service.artifact
+    response = client.post("/admin/model/reload", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["model_version"] == before.version
+    assert model_service.artifact is not before
+    
+    status = client.get("/admin/model", headers=headers).json()
+    assert status["reloads"] >= 1
+    assert client.get("/health").json()["model_reload"]["failures"] == 0
+    
+    # Erro inesperado ao carregar uma versão -> 500 limpo
+    def broken(name, model_path):
+        raise RuntimeError("corrupted")
+    monkeypatch.setattr(model_service, "load_version", broken)
+    response = client.post("/admin/models/v2", params={"path": DEFAULT_MODEL.name}, headers=headers)
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Model version load failed: corrupted"
+    
+    # Pre-fork com vários workers: só leitura pelo /admin (cada worker tem seu estado)
+    monkeypatch.setattr(app.state, "server_workers", 2, raising=False)
+    assert client.post("/admin/model/reload", headers=headers).status_code == 409
+    assert client.put("/admin/shadow", headers=headers).status_code == 409
+    assert client.get("/admin/model", headers=headers).status_code == 200
+
+def test_server_respawn_backoff():
+    """
+    Testa a espera antes de recriar workers que morrem logo após o fork
+    """
+    from app import server
+    
+    assert server.respawn_delay(0) == 0.0
+    assert server.respawn_delay(1) == server.RESPAWN_BASE_DELAY
+    assert server.respawn_delay(2) == 2 * server.RESPAWN_BASE_DELAY
+    assert server.respawn_delay(100) == server.RESPAWN_MAX_DELAY
+
+def test_predict_model_version_selection(client):
+    """
+    Testa a seleção da versão do modelo por header/query no /predict
+    """
+    payload = {"IAN": 5.0, "IDA": 6.0, "IEG": 7.0, "FASE": 2}
+    version = app.state.model_service.model_version
+    
+    response = client.post("/predict", json=payload, headers={"X-Model-Version": version})
+    assert response.status_code == 200
+    assert response.json()["model_version"] == version
+    
+    response = client.post("/predict", json=payload, params={"model_version": "inexistente"},
+                           headers={"X-Model-Version": version})
+    assert response.status_code == 404
+    
+    health = client.get("/health").json()
+    assert health["model_versions"][0] == version
+    assert health["shadow"] == {"enabled": False}
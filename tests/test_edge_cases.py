@@ -17,6 +17,7 @@ import pytest
 def client():
     """Fixture para cliente de teste FastAPI"""
     with TestClient(app) as c:
+        app.state.service_loader.wait()
         yield c
 
 
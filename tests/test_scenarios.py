@@ -19,6 +19,7 @@ import pytest
 def client():
     """Fixture para cliente de teste FastAPI"""
     with TestClient(app) as c:
+        app.state.service_loader.wait()
         yield c
 
 
@@ -179,6 +180,24 @@ def validate_risk_tier_consistency(data: dict):
                 f"risk_score < 0.25 deve ter tier 'Baixo', recebido: {risk_tier}"
 
 
+def risk_contributions(payload: dict) -> list:
+    """
+    Contribuições exatas (TreeSHAP) de cada feature para a classe de risco (Quartzo)
+    
+    Args:
+        payload: Métricas do aluno
+    
+    Returns:
+        Lista (feature, contribuição) em ordem crescente de contribuição
+        (negativa = reduz o risco)
+    """
+    model_service = app.state.model_service
+    artifact = model_service.artifact
+    X, _ = app.state.prediction_service.prepare_features_batch([payload], artifact)
+    contributions = model_service.explainer_for(artifact).contributions(X, [artifact.quartzo_idx])[0]
+    return sorted(zip(artifact.features, contributions.tolist()), key=lambda fc: fc[1])
+
+
 # ============================================================================
 # Cenários de Teste
 # ============================================================================
@@ -367,10 +386,15 @@ def test_scenario_4_student_in_recovery(client):
     assert data["risk_score"] <= 0.6, \
         f"Aluno em recuperação deve ter risk_score moderado/baixo (<= 0.6), recebido: {data['risk_score']}"
     
-    # Verificar se top_drivers inclui IEG ou IPV
-    drivers = [d.get("feature", "") for d in data["top_drivers"]]
-    assert "IEG" in drivers or "IPV" in drivers, \
-        f"top_drivers deveria incluir IEG ou IPV, recebido: {drivers}"
+    # Engajamento e ponto de virada altos são o que mais afasta o aluno da classe de risco
+    contributions = risk_contributions(payload)
+    strongest = contributions[:2]
+    assert {f for f, _ in strongest} == {"IEG", "IPV"} and all(c < 0 for _, c in strongest), \
+        f"IEG e IPV deveriam ser as contribuições que mais reduzem o risco, recebido: {contributions}"
+    
+    # top_drivers é o prefixo da explicação completa da classe predita
+    full = client.post("/predict", params={"top_k": 10}, json=payload).json()["top_drivers"]
+    assert data["top_drivers"] == full[:len(data["top_drivers"])]
 
 
 def test_scenario_5_student_in_decline(client):
@@ -414,10 +438,18 @@ def test_scenario_5_student_in_decline(client):
     assert data["risk_tier"] in ["Moderado", "Alto", "Crítico", "Baixo"], \
         f"risk_tier inesperado: {data['risk_tier']}"
     
-    # Verificar se top_drivers inclui IEG como fator de risco
-    drivers = [d.get("feature", "") for d in data["top_drivers"]]
-    assert "IEG" in drivers, \
-        f"top_drivers deveria incluir IEG como fator de risco, recebido: {drivers}"
+    # Baixo engajamento (e ponto de virada baixo) é o que mais aproxima o aluno da classe de risco
+    contributions = risk_contributions(payload)
+    strongest = contributions[-2:]
+    assert {f for f, _ in strongest} == {"IEG", "IPV"} and all(c > 0 for _, c in strongest), \
+        f"IEG e IPV deveriam ser as contribuições que mais aumentam o risco, recebido: {contributions}"
+    
+    # Na classe predita (não de risco) o IEG baixo também pesa contra
+    full = client.post("/predict", params={"top_k": 10}, json=payload).json()["top_drivers"]
+    ieg = next(d for d in full if d["feature"] == "IEG")
+    if data["prediction"] != "Quartzo":
+        assert ieg["contribution"] < 0, f"IEG baixo deveria afastar da classe predita, recebido: {ieg}"
+    assert data["top_drivers"] == full[:len(data["top_drivers"])]
 
 
 def test_scenario_6_critical_risk(client):
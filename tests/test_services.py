@@ -0,0 +1,795 @@
+"""
+Testes unitários dos serviços (sem passar pela camada HTTP)
+"""
+
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from app.models import StudentMetrics
+from app.services.model_service import ModelService
+from app.services.prediction_service import PredictionService
+from app.services.risk_service import RiskService
+from app.services.student_service import StudentService
+
+
+@pytest.fixture(scope="module")
+def model_service():
+    """ModelService inicializado com os artefatos padrão do repositório"""
+    service = ModelService()
+    service.initialize()
+    return service
+
+
+# ============================================================================
+# Artefato pré-compilado do modelo
+# ============================================================================
+
+def test_artifact_precompiled_metadata(model_service):
+    """
+    Testa que o artefato resolve classe 'quartzo', pesos e labels no carregamento
+    """
+    artifact = model_service.artifact
+    
+    assert artifact.features == tuple(model_service.features_list)
+    assert artifact.n_classes == len(artifact.class_labels)
+    assert artifact.class_labels[artifact.quartzo_idx].lower() == "quartzo"
+    
+    # Pesos one-hot na classe quartzo
+    expected = np.zeros(artifact.n_classes)
+    expected[artifact.quartzo_idx] = 1.0
+    assert np.array_equal(artifact.risk_weights, expected)
+    
+    # Estatísticas alinhadas às features
+    assert artifact.medians.shape == artifact.importances.shape == (len(artifact.features),)
+
+
+def test_artifact_is_immutable(model_service):
+    artifact = model_service.artifact
+    
+    with pytest.raises(Exception):
+        artifact.quartzo_idx = 0
+    with pytest.raises(ValueError):
+        artifact.risk_weights[0] = 0.5
+
+
+def test_risk_score_recomputes_weights_for_other_class_count(model_service):
+    """
+    Testa que o score de risco continua usando a classe 'quartzo' quando o
+    vetor de probabilidades não tem o número de classes do artefato
+    """
+    service = PredictionService(model_service)
+    probs = np.zeros(model_service.artifact.n_classes + 1)
+    probs[model_service.artifact.quartzo_idx] = 0.2
+    probs[-1] = 0.8
+    
+    assert service.calculate_risk_score(probs) == pytest.approx(0.2)
+
+
+# ============================================================================
+# Threads do XGBoost
+# ============================================================================
+
+def test_xgb_threads_request_and_batch_models():
+    """
+    Testa que load_model aplica XGB_NTHREAD e que o escore em lote usa uma
+    cópia do modelo com XGB_BATCH_NTHREAD, refeita quando o modelo muda
+    """
+    service = ModelService(nthread=1, batch_nthread=2)
+    service.load_model()
+    
+    assert service.model_pipeline.n_jobs == 1
+    batch_model = service.batch_model
+    assert batch_model is not service.model_pipeline
+    assert batch_model.n_jobs == 2
+    assert service.batch_model is batch_model
+    
+    # Mesmas probabilidades com qualquer número de threads
+    X = np.array([[5.0, 7.0, 8.0, 6.5, 7.5, 6.0, 8.0, 1.0, np.nan, 0.86]])
+    assert np.array_equal(batch_model.predict_proba(X), service.model_pipeline.predict_proba(X))
+    
+    service.load_model()
+    assert service.batch_model is not batch_model
+    
+    # Sem configuração distinta, o lote usa o próprio modelo
+    service.batch_nthread = 0
+    assert service.batch_model is service.model_pipeline
+
+
+# ============================================================================
+# Backend de inferência
+# ============================================================================
+
+def test_booster_backend_matches_predict_proba(model_service):
+    """
+    Testa que o backend Booster (inplace_predict) é escolhido para o XGBoost e
+    reproduz exatamente o predict_proba do modelo
+    """
+    from app.services.inference_backend import SklearnBackend
+    
+    assert model_service.backend_name == "booster"
+    
+    X = model_service.df_base[list(model_service.features_list)[:-2]].to_numpy(dtype=float)
+    X = np.column_stack([X, np.full(len(X), np.nan), X[:, 1] / (X[:, 2] + 0.1)])
+    expected = SklearnBackend(model_service.model_pipeline).predict_proba(X)
+    
+    assert np.array_equal(model_service.backend.predict_proba(X), expected)
+    assert np.array_equal(model_service.batch_backend.predict_proba(X), expected)
+
+
+def test_booster_backend_respects_early_stopping():
+    """
+    Testa que o backend Booster usa só as árvores até a best_iteration, como o
+    predict_proba de um modelo treinado com early stopping
+    """
+    import xgboost as xgb
+    from app.services.inference_backend import BoosterBackend
+    
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 5)).astype(np.float32)
+    y = rng.integers(0, 4, size=400)
+    model = xgb.XGBClassifier(
+        n_estimators=50, learning_rate=0.5, max_depth=4, early_stopping_rounds=3,
+        objective="multi:softprob", n_jobs=1
+    )
+    model.fit(X[:300], y[:300], eval_set=[(X[300:], y[300:])], verbose=False)
+    assert model.best_iteration < model.get_booster().num_boosted_rounds() - 1
+    
+    backend = BoosterBackend.from_model(model)
+    assert backend.iteration_range == (0, model.best_iteration + 1)
+    assert np.array_equal(backend.predict_proba(X), model.predict_proba(X))
+
+
+def test_backend_follows_model_and_preference():
+    service = ModelService(backend="sklearn")
+    service.load_model()
+    assert service.backend_name == "sklearn"
+    
+    # Modelos sem Booster usam predict_proba
+    service.backend_preference = "auto"
+    service.model_pipeline = _CountingModel(service.model_pipeline)
+    assert service.backend_name == "sklearn"
+
+
+# ============================================================================
+# Avaliador NumPy compilado (sem xgboost em runtime)
+# ============================================================================
+
+@pytest.fixture(scope="module")
+def tree_bundle(tmp_path_factory):
+    """Bundle .npz compilado do modelo padrão (com verificação de paridade)"""
+    from app.compile_model import compile_model
+    from app.config import DEFAULT_MODEL
+    
+    out = tmp_path_factory.mktemp("trees") / "model.trees.npz"
+    return compile_model(str(DEFAULT_MODEL), str(out))
+
+
+def test_tree_ensemble_matches_xgboost(model_service, tree_bundle):
+    from app.utils.tree_ensemble import TreeEnsemble
+    
+    ensemble = TreeEnsemble.load(tree_bundle)
+    booster = model_service.model_pipeline.get_booster()
+    
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 10, size=(2000, ensemble.n_features_in_)).astype(np.float32)
+    X[rng.random(X.shape) < 0.2] = np.nan
+    
+    # Margens idênticas (mesma acumulação float32); probabilidades dentro de 1e-6
+    assert np.array_equal(ensemble.predict_margin(X), booster.inplace_predict(X, predict_type="margin"))
+    assert np.abs(ensemble.predict_proba(X) - model_service.model_pipeline.predict_proba(X)).max() <= 1e-6
+
+
+def test_numpy_backend_runtime_does_not_import_xgboost(tree_bundle):
+    import subprocess
+    import sys
+    
+    code = (
+        "import sys\n"
+        "from app.services.model_service import ModelService\n"
+        "from app.services.prediction_service import PredictionService\n"
+        "from app.models import StudentMetrics\n"
+        "ms = ModelService(backend='numpy'); ms.initialize()\n"
+        "r = PredictionService(ms).predict_score(StudentMetrics(IAN=5.0, IDA=7.0, IEG=8.0, FASE=1))\n"
+        "assert ms.backend_name == 'numpy' and r['prediction'] != 'unknown'\n"
+        "assert 'xgboost' not in sys.modules and 'sklearn' not in sys.modules\n"
+    )
+    env = dict(os.environ, MODEL_TREES_PATH=tree_bundle)
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+
+# ============================================================================
+# Cache colunar da base CSV
+# ============================================================================
+
+def test_data_cache_matches_csv_and_rebuilds_on_change(tmp_path, monkeypatch, model_service):
+    import json
+    import pandas as pd
+    from app.utils import columnar_cache
+    
+    csv_path = tmp_path / "base.csv"
+    df = model_service.df_base.head(200).copy()
+    df.loc[3, "NOME"] = np.nan
+    df.to_csv(csv_path, index=False)
+    cache_dir = tmp_path / "cache"
+    expected = pd.read_csv(csv_path)
+    
+    def assert_same_values(left, right):
+        # Mesmos valores do read_csv; numéricas no dtype compacto do cache
+        pd.testing.assert_frame_equal(left, right, check_dtype=False)
+    
+    # Primeira carga grava o cache; a segunda não faz parsing
+    assert_same_values(columnar_cache.read_csv_cached(csv_path, cache_dir), expected)
+    manifest = json.loads((cache_dir / "manifest.json").read_text())
+    stored = {c["name"]: c["stored"] for c in manifest["columns"]}
+    assert stored["ANO"] == stored["DEFA"] == "int8" and stored["IAN"] == "float32"
+    
+    # Colunas numéricas são o próprio arquivo mapeado, no dtype compacto (sem cópia)
+    def file_backed(values):
+        while values is not None:
+            if isinstance(values, np.memmap) and values.filename is not None:
+                return True
+            values = values.base
+        return False
+    
+    loaded = columnar_cache.load_data_cache(csv_path, cache_dir)
+    assert all(file_backed(loaded[c].to_numpy()) for c in ("ANO", "DEFA", "IAN", "IDA"))
+    assert loaded["ANO"].dtype == np.int8 and loaded["IAN"].dtype == np.float32
+    
+    def no_parse(*args, **kwargs):
+        raise AssertionError("CSV parsed with a valid cache")
+    
+    with monkeypatch.context() as m:
+        m.setattr(columnar_cache.pd, "read_csv", no_parse)
+        assert_same_values(columnar_cache.read_csv_cached(csv_path, cache_dir), expected)
+        
+        # Mesmo conteúdo com mtime novo: confere o hash e só atualiza o manifesto
+        os.utime(csv_path, ns=(1, 1))
+        assert_same_values(columnar_cache.read_csv_cached(csv_path, cache_dir), expected)
+    assert json.loads((cache_dir / "manifest.json").read_text())["source"]["mtime_ns"] == 1
+    
+    # CSV alterado -> cache reconstruído
+    df.head(150).to_csv(csv_path, index=False)
+    assert len(columnar_cache.read_csv_cached(csv_path, cache_dir)) == 150
+    assert json.loads((cache_dir / "manifest.json").read_text())["rows"] == 150
+    
+    # Coluna corrompida -> volta para o CSV e reconstrói
+    (cache_dir / "c001.npy").write_bytes(b"corrupted")
+    assert columnar_cache.load_data_cache(csv_path, cache_dir) is None
+    assert_same_values(columnar_cache.read_csv_cached(csv_path, cache_dir), pd.read_csv(csv_path))
+    assert columnar_cache.load_data_cache(csv_path, cache_dir) is not None
+
+
+# ============================================================================
+# Bundle nativo do XGBoost (carga rápida no boot)
+# ============================================================================
+
+def test_native_bundle_loads_model_stats_and_shap(tmp_path, monkeypatch):
+    import json
+    from app.config import DEFAULT_MODEL
+    from app.convert_model import convert_model
+    
+    sidecar = convert_model(str(DEFAULT_MODEL), str(tmp_path / "model.bundle.json"))
+    monkeypatch.setenv("MODEL_NATIVE_PATH", sidecar)
+    
+    reference = ModelService(model_format="joblib")
+    reference.initialize()
+    native = ModelService()
+    native.initialize()
+    
+    # Modelo, metadados e estatísticas do bundle; TreeSHAP sem pré-cálculo no boot
+    assert type(native.model_pipeline).__name__ == "XGBClassifier"
+    assert native.model_version == reference.model_version
+    assert "explainer" in native.artifact.derived
+    assert native.feature_medians.equals(reference.feature_medians)
+    
+    metrics = StudentMetrics(IAN=5.0, IDA=6.0, IEG=7.0, FASE=2, DEFA=-1.0)
+    assert PredictionService(native).predict_score(metrics) == PredictionService(reference).predict_score(metrics)
+    
+    assert json.loads(open(sidecar).read())["data_source"] == reference.data_source
+    
+    # Outro CSV -> estatísticas recalculadas da df_base, não as do bundle
+    df = reference.df_base.copy()
+    df["IAN"] = df["IAN"] + 1
+    csv_path = tmp_path / "base.csv"
+    df.to_csv(csv_path, index=False)
+    monkeypatch.setenv("DF_CSV_PATH", str(csv_path))
+    changed = ModelService()
+    changed.initialize(with_versions=False)
+    assert "explainer" in changed.artifact.derived
+    assert changed.feature_medians["IAN"] == reference.feature_medians["IAN"] + 1
+    
+    # Hash do modelo não confere -> volta para o joblib
+    meta = json.loads(open(sidecar).read())
+    meta["model_sha256"] = "0" * 64
+    open(sidecar, "w").write(json.dumps(meta))
+    assert native.read_native_model(str(DEFAULT_MODEL)) is None
+
+
+# ============================================================================
+# Drivers (TreeSHAP exato)
+# ============================================================================
+
+def test_tree_shap_matches_xgboost_pred_contribs(model_service):
+    import xgboost as xgb
+    
+    rng = np.random.default_rng(1)
+    X = rng.uniform(0, 10, size=(500, 10)).astype(np.float32)
+    X[:, 7] = rng.integers(0, 8, size=500)
+    X[rng.random(X.shape) < 0.15] = np.nan
+    
+    booster = model_service.model_pipeline.get_booster()
+    pred = model_service.model_pipeline.predict_proba(X).argmax(axis=1)
+    expected = booster.predict(xgb.DMatrix(X, missing=np.nan), pred_contribs=True)
+    expected = expected[np.arange(len(X)), pred, :-1]
+    
+    assert np.abs(model_service.explainer.contributions(X, pred) - expected).max() <= 1e-5
+
+
+def test_shap_drivers_top_k_and_cache(model_service):
+    service = PredictionService(model_service, cache_size=8)
+    metrics = StudentMetrics(IAN=5.0, IDA=5.0, IEG=8.5, IAA=7.0, IPS=6.0,
+                             IPP=5.0, IPV=9.0, FASE=4, DEFA=0.0)
+    
+    default = service.predict_score(metrics)["top_drivers"]
+    full = service.predict_score(metrics, top_k=5)["top_drivers"]
+    
+    assert len(default) == 2 and len(full) == 5
+    assert full[:2] == default
+    assert all(d["score"] == abs(d["contribution"]) for d in full)
+    assert [d["score"] for d in full] == sorted((d["score"] for d in full), reverse=True)
+    # top_k faz parte da chave do cache
+    assert service.cache_stats()["size"] == 2
+    
+    batch = service.predict_batch([metrics, metrics], top_k=5)["results"]
+    assert all(r["top_drivers"] == full for r in batch)
+
+
+def test_heuristic_drivers_method():
+    from app.utils.helpers import estimate_top_drivers_batch
+    
+    service = ModelService(drivers_method="heuristic")
+    service.initialize()
+    assert service.explainer is None
+    
+    metrics = StudentMetrics(IAN=5.0, IDA=7.0, IEG=8.0, FASE=1)
+    result = PredictionService(service).predict_score(metrics)
+    X = np.array([[result["input_features"][f] for f in service.artifact.features]], dtype=float)
+    assert result["top_drivers"] == estimate_top_drivers_batch(X, service.artifact.features, service)[0]
+
+
+# ============================================================================
+# Cache de predições
+# ============================================================================
+
+class _CountingModel:
+    """Envolve o modelo real contando as chamadas de inferência"""
+    
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+    
+    def predict_proba(self, X):
+        self.calls += 1
+        return self.model.predict_proba(X)
+
+
+@pytest.fixture
+def cached_service():
+    """PredictionService com cache habilitado e modelo instrumentado"""
+    service = ModelService()
+    service.initialize()
+    service.model_pipeline = _CountingModel(service.model_pipeline)
+    return PredictionService(service, cache_size=2)
+
+
+def test_cache_hit_skips_inference(cached_service):
+    metrics = StudentMetrics(IAN=5.0, IDA=7.0, IEG=8.0, IAA=6.5, IPS=7.5,
+                             IPP=6.0, IPV=8.0, FASE=1, DEFA=0.0)
+    model = cached_service.model_service.model_pipeline
+    
+    first = cached_service.predict_score(metrics)
+    second = cached_service.predict_score(metrics)
+    
+    assert first == second
+    assert model.calls == 1
+    assert cached_service.cache_stats()["hits"] == 1
+    assert cached_service.cache_stats()["misses"] == 1
+    
+    # NOME faz parte da chave (entra nas mensagens)
+    cached_service.predict_score(metrics.model_copy(update={"NOME": "Aluno-1"}))
+    assert model.calls == 2
+
+
+def test_cache_eviction_and_invalidation_on_reload(cached_service):
+    model_service = cached_service.model_service
+    model = model_service.model_pipeline
+    payloads = [StudentMetrics(IAN=float(i), IDA=5.0, IEG=5.0, FASE=1) for i in range(3)]
+    
+    for metrics in payloads:
+        cached_service.predict_score(metrics)
+    
+    stats = cached_service.cache_stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    
+    # Recompilar o artefato (como ao recarregar o modelo) invalida o cache
+    model_service.compile_artifact()
+    cached_service.predict_score(payloads[-1])
+    assert cached_service.cache_stats()["invalidations"] == 1
+    assert model.calls == 4
+
+
+# ============================================================================
+# Micro-batching do /predict
+# ============================================================================
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    """
+    Testa que requisições concorrentes viram uma única inferência e que a
+    resposta é idêntica à do caminho síncrono
+    """
+    service = ModelService()
+    service.initialize()
+    model = _CountingModel(service.model_pipeline)
+    service.model_pipeline = model
+    batched = PredictionService(service, micro_batch=True, micro_batch_window_ms=50,
+                                micro_batch_max_size=64)
+    
+    payloads = [StudentMetrics(IAN=float(i % 10), IDA=6.0 + i % 3, IEG=7.0, IAA=6.5, IPS=7.5,
+                               IPP=6.0, IPV=8.0, FASE=i % 8, DEFA=float(i % 3 - 1))
+                for i in range(10)]
+    payloads.append(StudentMetrics(IDA=5.0, FASE=2))  # caminho com imputação
+    
+    async def run_all():
+        return await asyncio.gather(*(batched.predict_score_async(m) for m in payloads))
+    
+    results = asyncio.run(run_all())
+    
+    # Um lote: uma chamada direta + uma com imputação
+    assert model.calls == 2
+    stats = batched.micro_batching_stats()
+    assert stats["batches"] == 1
+    assert stats["max_batch_size"] == len(payloads)
+    assert stats["queue_depth"] == 0
+    
+    plain = PredictionService(service)
+    assert results == [plain.predict_score(m) for m in payloads]
+
+
+def test_micro_batcher_dispatches_batches_concurrently():
+    """
+    Testa que lotes rodam em paralelo até max_in_flight e que o erro de um
+    item falha só aquele item
+    """
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services.micro_batcher import MicroBatcher
+    
+    both_running = threading.Barrier(2, timeout=5)
+    
+    def process(items, artifact):
+        # Os dois primeiros lotes só terminam se estiverem em execução ao mesmo tempo
+        if items[0] < 2:
+            both_running.wait()
+        return [ValueError(i) if i == 3 else i * 10 for i in items]
+    
+    with ThreadPoolExecutor(2) as pool:
+        batcher = MicroBatcher(process, window_ms=0, max_size=1, executor=pool, max_in_flight=2)
+        
+        async def run_all():
+            return await asyncio.gather(
+                *(batcher.submit(i, "v1") for i in range(4)), return_exceptions=True
+            )
+        
+        results = asyncio.run(run_all())
+    
+    assert results[:3] == [0, 10, 20]
+    assert isinstance(results[3], ValueError)
+    stats = batcher.stats()
+    assert stats["batches"] == 4
+    assert stats["max_in_flight_seen"] == 2
+    assert stats["in_flight"] == 0
+
+
+# ============================================================================
+# Tabela de risco materializada
+# ============================================================================
+
+def test_risk_table_recomputed_on_model_change(model_service):
+    prediction_service = PredictionService(model_service)
+    risk_service = RiskService(
+        model_service, prediction_service, StudentService(model_service)
+    )
+    
+    table = risk_service.get_table()
+    assert len(table) == len(model_service.df_base)
+    assert {"prediction", "risk_score", "risk_tier"} <= set(table.columns)
+    assert risk_service.get_table() is table
+    
+    # Novo artefato (modelo recarregado) -> tabela recalculada
+    model_service.compile_artifact()
+    assert risk_service.stats()["stale"] is True
+    assert risk_service.get_table() is not table
+    assert risk_service.stats()["stale"] is False
+
+
+# ============================================================================
+# Recarga do modelo sem reinício
+# ============================================================================
+
+def test_reload_swaps_snapshot_and_prewarms_risk_table(monkeypatch):
+    from app.services.reload_service import ModelReloader
+    
+    service = ModelService()
+    service.initialize()
+    prediction_service = PredictionService(service, cache_size=0)
+    risk_service = RiskService(service, prediction_service, StudentService(service))
+    risk_service.get_table()
+    reloader = ModelReloader(service, risk_service, watch_interval=0)
+    
+    metrics = StudentMetrics(IAN=5.0, IDA=6.0, IEG=7.0, FASE=2, DEFA=0.0)
+    before = prediction_service.predict_score(metrics)
+    in_flight = service.artifact
+    
+    result = reloader.reload()
+    assert result["model_version"] == in_flight.version
+    assert service.artifact is not in_flight
+    assert reloader.stats()["reloads"] == 1
+    
+    # Requisição que começou antes da troca termina com o snapshot anterior
+    X, needs_impute = prediction_service.prepare_features_batch([metrics.model_dump()], in_flight)
+    assert np.allclose(
+        prediction_service.make_prediction_batch(X, needs_impute, in_flight),
+        prediction_service.make_prediction_batch(X, needs_impute, service.artifact)
+    )
+    assert prediction_service.predict_score(metrics) == before
+    
+    # Tabela de risco calculada antes da troca: promovida sem nova inferência
+    monkeypatch.setattr(risk_service, "materialize", lambda: pytest.fail("materialized"))
+    assert risk_service.current_state().artifact is service.artifact
+
+
+def test_reload_rejects_invalid_model_and_keeps_current(tmp_path):
+    import joblib
+    from app.services.reload_service import ModelReloader
+    
+    service = ModelService()
+    service.initialize()
+    current = service.artifact
+    reloader = ModelReloader(service, watch_interval=0)
+    
+    broken = tmp_path / "broken.pkl"
+    joblib.dump({"modelo": current.model, "features": ["X1", "X2"], "versao": "broken"}, broken)
+    with pytest.raises(ValueError):
+        reloader.reload(str(broken))
+    with pytest.raises(FileNotFoundError):
+        reloader.reload(str(tmp_path / "missing.pkl"))
+    
+    assert service.artifact is current
+    stats = reloader.stats()
+    assert stats["failures"] == 2 and stats["reloads"] == 0
+    assert stats["last_error"].startswith("FileNotFoundError")
+
+
+# ============================================================================
+# Versões do modelo e avaliação em sombra
+# ============================================================================
+
+def test_model_versions_selection_and_shadow_scoring():
+    from fastapi import HTTPException
+    from app.config import DEFAULT_MODEL
+    
+    service = ModelService()
+    service.initialize()
+    published = service.model_version
+    candidate = service.load_version("candidato", str(DEFAULT_MODEL))
+    assert service.version_names() == [published, "candidato"]
+    with pytest.raises(ValueError):
+        service.register_version(candidate, published)
+    
+    ps = PredictionService(service, cache_size=8, shadow_version="candidato", shadow_sample_rate=1.0)
+    metrics = StudentMetrics(IAN=5.0, IDA=6.0, IEG=7.0, FASE=2, DEFA=0.0)
+    served = ps.predict_score(metrics)
+    pinned = ps.predict_score(metrics, artifact=ps.resolve_artifact("candidato"))
+    assert served["model_version"] == published
+    assert pinned["model_version"] == "candidato"
+    assert pinned["probabilities"] == served["probabilities"]
+    # Versões não publicadas não entram no cache
+    assert ps.cache_stats()["size"] == 1
+    with pytest.raises(HTTPException) as exc:
+        ps.resolve_artifact("inexistente")
+    assert exc.value.status_code == 404
+    
+    # Só a requisição servida pela versão publicada vai para a sombra
+    ps.shadow.pool.shutdown(wait=True)
+    shadow = ps.shadow.stats()
+    assert shadow["sampled"] == 1 and shadow["compared"] == 1
+    assert shadow["agreement_rate"] == 1.0
+    assert shadow["mean_risk_abs_diff"] == 0.0
+    latency = ps.latency_stats()
+    assert latency[published]["count"] == 1
+    assert latency["candidato"]["count"] == 2
+    
+    previous = service.promote("candidato")
+    assert service.model_version == "candidato"
+    assert service.get_version(published) is previous
+
+
+def test_risk_score_uses_class_order_of_the_scoring_version():
+    """
+    Testa que risk_score, sombra e tabela de risco usam os pesos da versão
+    que produziu as probabilidades (ordem das classes diferente da publicada)
+    """
+    from app.services.model_service import LOADED_FIELDS, build_artifact
+    
+    service = ModelService()
+    service.initialize()
+    current = service.artifact
+    mapa = dict(current.mapa_classes_inv)
+    quartzo, agata = current.quartzo_idx, current.class_names.index("Ágata")
+    mapa[quartzo], mapa[agata] = mapa[agata], mapa[quartzo]
+    fields = {f: getattr(current, f) for f in LOADED_FIELDS}
+    swapped = service.register_version(
+        build_artifact(**{**fields, "mapa_classes_inv": mapa}, derived=current.derived), "trocado"
+    )
+    assert swapped.quartzo_idx == agata
+    
+    ps = PredictionService(service, cache_size=0, shadow_version="trocado", shadow_sample_rate=1.0)
+    metrics = StudentMetrics(IAN=5.0, IDA=6.0, IEG=7.0, FASE=2, DEFA=0.0)
+    served = ps.predict_score(metrics)
+    pinned = ps.predict_score(metrics, artifact=swapped)
+    assert served["risk_score"] == pytest.approx(served["probabilities"]["Quartzo"], abs=1e-4)
+    assert pinned["risk_score"] == pytest.approx(pinned["probabilities"]["Quartzo"], abs=1e-4)
+    assert pinned["risk_score"] != served["risk_score"]
+    
+    batch = ps.predict_batch([metrics], artifact=swapped)
+    assert batch["results"][0]["risk_score"] == pytest.approx(pinned["risk_score"], abs=1e-4)
+    
+    ps.shadow.pool.shutdown(wait=True)
+    assert ps.shadow.stats()["mean_risk_abs_diff"] == pytest.approx(
+        abs(served["risk_score"] - pinned["risk_score"]), abs=1e-3
+    )
+    
+    # Tabela pré-calculada para a candidata antes da troca usa os pesos dela
+    risk_service = RiskService(service, ps, StudentService(service))
+    risk_service.get_table()
+    state = risk_service.prepare(swapped)
+    assert np.allclose(state.table["risk_score"], state.table["prob_Quartzo"])
+
+
+# ============================================================================
+# Índice de nomes
+# ============================================================================
+
+def test_name_index_exact_and_substring():
+    from app.utils.name_index import NameIndex
+    
+    index = NameIndex(["João Silva", "Maria", "joao silva", "Ana Maria", None, "Mário"])
+    
+    # Match exato ignora acentos, caixa e espaços extras
+    assert index.lookup_exact("  JOAO   silva ").tolist() == [0, 2]
+    
+    # Substring literal, posições na ordem da base
+    assert index.lookup_substring("maria").tolist() == [1, 3]
+    assert index.lookup_substring("ari").tolist() == [1, 3, 5]
+    assert index.lookup("mari").tolist() == [1, 3, 5]
+    assert len(index.lookup("pedro")) == 0
+
+
+def test_name_index_treats_input_literally():
+    from app.utils.name_index import NameIndex
+    
+    index = NameIndex(["Aluno-1", "Aluno-10", "A.luno"])
+    
+    assert index.lookup(".luno").tolist() == [2]
+    assert len(index.lookup("(a+)+$")) == 0
+    assert len(index.lookup("   ")) == 0
+
+
+def test_suffix_array_matches_sorted_suffixes():
+    import random
+    from app.utils.name_index import NameIndex, suffix_array
+    
+    rng = random.Random(0)
+    for _ in range(200):
+        text = "".join(rng.choice("ab\x00") for _ in range(rng.randint(0, 40)))
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        assert suffix_array(codes).tolist() == sorted(range(len(text)), key=lambda i: text[i:])
+    
+    # Substring igual à busca linear, inclusive no fim de um nome e entre nomes
+    names = ["".join(rng.choice("abc ") for _ in range(rng.randint(1, 12))) for _ in range(200)]
+    index = NameIndex(names)
+    for query in ["a", "ab", "ca", "bca", "cc a", "abcab"]:
+        expected = [i for i, key in enumerate(index.keys) if query in key]
+        assert index.matching_key_ids(query).tolist() == expected
+
+
+def test_name_index_fuzzy_ranking():
+    from app.utils.name_index import NameIndex
+    
+    index = NameIndex(["João Silva", "Maria Souza", "Joana Lima", "Mário Andrade"])
+    
+    results = index.search_fuzzy("joao", k=2, min_score=0.0)
+    assert [index.display_names[i] for i, _ in results] == ["João Silva", "Joana Lima"]
+    assert results[0][1] > results[1][1]
+    assert len(index.search_fuzzy("joao", k=2)) == 1
+    
+    # Erro de digitação
+    assert index.display_names[index.search_fuzzy("maira souza", k=1)[0][0]] == "Maria Souza"
+    assert index.search_fuzzy("xyzw") == []
+
+
+def test_student_histories_grouped_and_sorted_by_ano():
+    import pandas as pd
+    from app.utils.name_index import NameIndex
+    from app.utils.student_history import StudentHistories
+    
+    df = pd.DataFrame({
+        "NOME": ["Ana", "Bia", "ana", "Ana"],
+        "ANO": [24, 22, 22, 23],
+        "FASE": [3.0, 1.0, 1.0, np.nan],
+        "IAN": [5.0, 6.0, 7.0, 8.0],
+    })
+    index = NameIndex(df["NOME"].tolist())
+    histories = StudentHistories(df, index)
+    
+    historico = histories.history(index.lookup_keys("ANA")[0])
+    assert [h["ANO"] for h in historico] == [22, 23, 24]
+    assert historico[1]["FASE"] is None
+    assert historico[0]["IDA"] is None  # coluna ausente -> null
+    assert historico[0]["IAN"] == 7.0
+
+
+# ============================================================================
+# Tabela de decisão das sugestões
+# ============================================================================
+
+def test_suggestion_table_rules():
+    from app.utils.suggestion_table import SuggestionTable
+    
+    table = SuggestionTable(defa_threshold=2)
+    
+    grave = table.suggest(-2, 0.1, "Quartzo")
+    assert grave["suggested_action"] == "Recuperação Intensiva (grave)"
+    assert grave["suggested_messages"]["family"].startswith("Detectamos defasagem grave (DEFA=-2).")
+    
+    review = table.suggest(1, 0.8, "Ágata", "Ana")
+    assert review["suggested_action"] == "Enriquecimento Curricular (moderado) + Revisão"
+    assert review["suggested_messages"]["family"] == (
+        "Ana está ligeiramente adiantado (DEFA=1). Sugerimos atividades de extensão."
+        " (Nota: modelo indica risco; revisar caso.)"
+    )
+    assert table.suggest(3, 0.1, "Ágata")["suggested_messages"]["family"].startswith("O aluno está adiantado")
+    
+    assert table.suggest(0, 0.8, "Topázio")["suggested_action"] == "Intervenção Psicopedagógica"
+    assert table.suggest(0, 0.6, "Topázio")["suggested_action"] == "Acompanhamento Intensivo"
+    assert table.suggest(0, 0.3, " topazio ")["suggested_action"] == "Enriquecimento Curricular"
+    assert table.suggest(0, 0.3, "Quartzo")["suggested_action"] == "Monitoramento e Micro-intervenção"
+    assert table.suggest(0, None, "Topázio")["suggested_action"] == "Monitoramento"
+    
+    with pytest.raises(ValueError):
+        SuggestionTable(rules=[{"defa": "zero", "action": "", "family": "", "professor": ""}])
+
+
+def test_suggestion_table_batch_matches_single():
+    import itertools
+    from app.utils.suggestion_table import SuggestionTable
+    
+    table = SuggestionTable(defa_threshold=2)
+    combos = list(itertools.product(
+        range(-4, 5),
+        [0.0, 0.25, 0.5, 0.74, 0.75, 1.0, float("nan")],
+        ["Quartzo", "Topázio", "unknown"],
+        [None, "Ana"]
+    ))
+    defa, risk, labels, names = (list(c) for c in zip(*combos))
+    
+    batch = table.evaluate(np.array(defa), np.array(risk), labels, names)
+    assert batch == [table.suggest(*c) for c in combos]
+    
+    no_model = table.evaluate(np.array(defa), None, labels, names)
+    assert no_model == [table.suggest(d, None, l, n) for d, l, n in zip(defa, labels, names)]